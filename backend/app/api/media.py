@@ -0,0 +1,63 @@
+import os
+import stat
+from pathlib import PurePosixPath
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..services.storage import MEDIA_PREFIX, media_path
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+}
+# Media files get a unique name when written and are never rewritten, so
+# browsers and CDNs may keep them for good. Playlists are revalidated.
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@router.api_route("/media/{path:path}", methods=["GET", "HEAD"])
+async def get_media(path: str, request: Request):
+    """
+    Files under STORAGE_DIR. FileResponse streams straight from disk and
+    answers Range requests (206, multipart for several ranges), so players
+    can seek and fetch HLS segments without the whole file being read.
+    """
+    # Hidden files are outputs still being written
+    if any(part.startswith(".") for part in PurePosixPath(path).parts):
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        file_path = media_path(MEDIA_PREFIX + path)
+        stat_result = await run_in_threadpool(os.stat, file_path)
+    except (ValueError, OSError):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    cache_control = REVALIDATE if file_path.suffix == ".m3u8" else IMMUTABLE
+    response = FileResponse(
+        file_path,
+        stat_result=stat_result,
+        media_type=MEDIA_TYPES.get(file_path.suffix),
+        headers={"Cache-Control": cache_control},
+    )
+    # The ETag is derived from size and mtime (set by FileResponse)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, response.headers["etag"]):
+        return Response(status_code=304, headers={
+            "ETag": response.headers["etag"],
+            "Cache-Control": cache_control,
+        })
+    return response
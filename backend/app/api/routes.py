@@ -1,110 +1,90 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, BackgroundTasks, HTTPException, Body
 from ..db.models import Project, ProjectStatus
-from ..db.database import get_database
-from ..graph.workflow import app as graph_app
+from ..db.job_queue import job_queue
+from ..db.repository import PROJECT_PROJECTION, SCENE_LIST_PROJECTION, projects, scenes, serialize
+from ..graph.nodes import combine_project
+from ..services.admission import Overloaded, admission
+from ..services.chat import chat_service
 from ..services.socket_manager import manager
-from ..db.models import PyObjectId
-from bson import ObjectId
+from ..services.scheduler import scheduler
+from ..services.video_service import get_video_service
+from ..services.manim_pool import manim_pool
+from ..services.derivatives import derivative_service
+from ..services.packaging import packaging_service
 from typing import List
 
 router = APIRouter()
 
-async def run_graph(project_id: str, prompt: str):
-    initial_state = {
-        "project_id": project_id,
-        "user_prompt": prompt,
-        "scenes": [],
-        "status": "creating",
-        "error": None
-    }
-    
-    # We can subscribe to graph events if we want granular updates here, 
-    # or just let nodes update DB and we can poll or nodes broadcast.
-    # Better: Nodes broadcast via manager. 
-    # Since nodes are in a different module, we might need to inject manager or import it there.
-    # For now, let's just run it.
-    async for event in graph_app.astream(initial_state):
-        # We can broadcast intermediate state if needed
-        # event contains the update from the node
-        pass
-        
-    await manager.broadcast({"type": "project_complete", "project_id": project_id}, project_id)
+def _too_busy(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many projects in progress, please retry later",
+        headers={"Retry-After": str(e.retry_after)},
+    )
 
 @router.post("/projects")
-async def create_project(payload: dict, background_tasks: BackgroundTasks):
+async def create_project(payload: dict):
     prompt = payload.get("prompt")
     if not prompt:
         raise HTTPException(status_code=400, detail="Prompt is required")
-        
-    db = await get_database()
-    new_project = Project(user_prompt=prompt)
-    project_dump = new_project.model_dump(by_alias=True)
-    if project_dump.get("_id") is None:
-        del project_dump["_id"]
-    result = await db.projects.insert_one(project_dump)
-    project_id = str(result.inserted_id)
-    
-    background_tasks.add_task(run_graph, project_id, prompt)
-    
+
+    try:
+        async with admission.admit():
+            project_id = await projects.create(Project(user_prompt=prompt))
+            await job_queue.enqueue("run_graph", project_id, {"prompt": prompt})
+    except Overloaded as e:
+        raise _too_busy(e)
+
+    # Over capacity: the project waits in the queue; updates follow over the WebSocket
+    queue = await admission.queue_status(project_id)
+    if queue:
+        return {"project_id": project_id, "status": "queued", **queue}
     return {"project_id": project_id, "status": "created"}
 
 @router.get("/projects/{project_id}")
-async def get_project(project_id: str):
-    db = await get_database()
+async def get_project(project_id: str, scene_offset: int = 0, scene_limit: int = 100):
+    project = await projects.get(project_id, PROJECT_PROJECTION)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
     try:
-        project = await db.projects.find_one({"_id": project_id})
-        if not project:
-             # Try ObjectId if stored as ObjectId
-            project = await db.projects.find_one({"_id": ObjectId(project_id)})
-            
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-            
-        scenes = await db.scenes.find({"project_id": project_id}).to_list(length=100)
-        
-        # Convert _id to string
-        if "_id" in project:
-            project["id"] = str(project["_id"])
-            del project["_id"]
-            
-        for s in scenes:
-            if "_id" in s:
-                s["id"] = str(s["_id"])
-                del s["_id"]
-        
-        return {"project": project, "scenes": scenes}
+        project_scenes = await scenes.list_for_project(
+            project_id, SCENE_LIST_PROJECTION, offset=scene_offset, limit=scene_limit
+        )
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
+    next_offset = scene_offset + len(project_scenes) if len(project_scenes) == scene_limit else None
+    return {
+        "project": serialize(project),
+        "scenes": [serialize(s) for s in project_scenes],
+        "next_scene_offset": next_offset,
+    }
+
 @router.put("/projects/{project_id}/reorder")
-async def reorder_scenes(project_id: str, scene_ids: List[str] = Body(...)):
-    db = await get_database()
+async def reorder_scenes(project_id: str, background_tasks: BackgroundTasks, scene_ids: List[str] = Body(...)):
+    project = await projects.get(project_id, {"final_video_url": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
     try:
-        # Validate project exists
-        project = await db.projects.find_one({"_id": ObjectId(project_id)})
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-
-        # Update indices for each scene
-        for index, scene_id in enumerate(scene_ids):
-            await db.scenes.update_one(
-                {"_id": ObjectId(scene_id), "project_id": project_id},
-                {"$set": {"index": index}}
-            )
-            
+        await scenes.reorder(project_id, scene_ids)
+
         # Fetch updated scenes to broadcast
-        updated_scenes = await db.scenes.find({"project_id": project_id}).to_list(length=100)
-        for s in updated_scenes:
-            if "_id" in s:
-                s["id"] = str(s["_id"])
-                del s["_id"]
+        updated_scenes = [
+            serialize(s) for s in await scenes.list_for_project(project_id, SCENE_LIST_PROJECTION)
+        ]
                 
         # Broadcast update
         await manager.broadcast({
             "type": "scenes_reordered",
             "scenes": updated_scenes
         }, project_id)
+
+        # Stream-copy concat, so re-combining in the new order is quick
+        if project.get("final_video_url"):
+            background_tasks.add_task(combine_project, project_id)
         
         return {"status": "success", "scenes": updated_scenes}
         
@@ -112,13 +92,98 @@ async def reorder_scenes(project_id: str, scene_ids: List[str] = Body(...)):
         print(f"Reorder error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/projects/{project_id}/scenes/{scene_id}/regenerate")
+async def regenerate_scene(project_id: str, scene_id: str):
+    scene = await scenes.get(scene_id, project_id, {"_id": 1})
+    if not scene:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    try:
+        async with admission.admit():
+            # The running job may be generating this very scene
+            if await job_queue.has_active(project_id):
+                raise HTTPException(status_code=409, detail="Project is still generating")
+            job_id = await job_queue.enqueue("regenerate_scene", project_id, {"scene_id": scene_id})
+    except Overloaded as e:
+        raise _too_busy(e)
+
+    await manager.broadcast({
+        "type": "scene_update",
+        "scene_id": scene_id,
+        "status": "rendering",
+        "progress_message": "Queued for regeneration...",
+    }, project_id)
+
+    return {"status": "queued", "job_id": job_id}
+
+@router.post("/projects/{project_id}/replan")
+async def replan_project(project_id: str, payload: dict):
+    """
+    Re-plan a project with an edited prompt. Scenes that come out the same
+    keep their clips; only new or changed scenes are generated.
+    """
+    prompt = payload.get("prompt")
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Prompt is required")
+    project = await projects.get(project_id, {"_id": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        async with admission.admit():
+            if await job_queue.has_active(project_id):
+                raise HTTPException(status_code=409, detail="Project is still generating")
+            await projects.update(project_id, {"user_prompt": prompt})
+            job_id = await job_queue.enqueue("replan", project_id, {"prompt": prompt})
+    except Overloaded as e:
+        raise _too_busy(e)
+    return {"status": "queued", "job_id": job_id}
+
+@router.get("/projects/{project_id}/chat")
+async def get_project_chat(project_id: str):
+    project = await projects.get(project_id, {"_id": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return {"project_id": project_id, "messages": await chat_service.history(project_id)}
+
+@router.get("/projects/{project_id}/timings")
+async def get_project_timings(project_id: str):
+    project = await projects.get(project_id, {"timings": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return {"project_id": project_id, "timings": project.get("timings", [])}
+
+def collect_stats() -> dict:
+    stats = {
+        "scheduler": scheduler.stats(),
+        "websockets": manager.stats(),
+        "manim_pool": manim_pool.stats(),
+        "derivatives": derivative_service.stats(),
+        "packaging": packaging_service.stats(),
+        "admission": admission.stats(),
+        "chat": chat_service.stats(),
+    }
+    # Stats must not build the video service (and fail without an API key)
+    if get_video_service.cache_info().currsize:
+        stats["video_jobs"] = get_video_service().jobs.stats()
+        stats["video_cache"] = get_video_service().cache.stats()
+    return stats
+
+@router.get("/stats")
+async def get_stats():
+    return collect_stats()
+
 @router.websocket("/ws/{project_id}")
 async def websocket_endpoint(websocket: WebSocket, project_id: str):
     await manager.connect(websocket, project_id)
+    queue = await admission.queue_status(project_id)
+    if queue:
+        # For this client only; the reporting replica keeps everyone updated
+        manager.send(websocket, project_id, {"type": "queue_update", "project_id": project_id, **queue})
     try:
         while True:
-            data = await websocket.receive_text()
-            # We can handle incoming messages (chat) here
-            # await manager.broadcast({"message": data}, project_id)
+            # Chat: replies are streamed back through the broadcast, so
+            # every viewer of the project sees the conversation
+            chat_service.handle(project_id, await websocket.receive_text())
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, project_id)
@@ -1,14 +1,116 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Cursor Video Platform"
     MONGODB_URL: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "cursor_video"
-    OPENAI_API_KEY: str
+    # Only needed once a service that calls OpenAI is first used
+    OPENAI_API_KEY: str = ""
+    # Point at an OpenAI-compatible server (e.g. benchmarks/fake_openai.py)
+    OPENAI_BASE_URL: Optional[str] = None
     OPENAI_VIDEO_MODEL: str = "sora-2"
     STORAGE_DIR: str = "storage"
 
+    # Content-addressed cache of generated clips, shared across projects
+    VIDEO_CACHE_ENABLED: bool = True
+    VIDEO_CACHE_MAX_BYTES: int = 5 * 1024 ** 3
+
+    # Shared Sora job poller (seconds)
+    VIDEO_POLL_MIN_INTERVAL: float = 1.0
+    VIDEO_POLL_MAX_INTERVAL: float = 20.0
+    VIDEO_POLL_QUEUED_INTERVAL: float = 10.0
+    VIDEO_POLL_BACKOFF: float = 1.5
+    VIDEO_POLL_JITTER: float = 0.2
+    VIDEO_POLL_MAX_CONCURRENCY: int = 16
+
+    VIDEO_DOWNLOAD_CHUNK_BYTES: int = 1024 * 1024
+
+    # Scenes longer than one clip are split into consecutive segments of at
+    # most VIDEO_SEGMENT_MAX_SECONDS (4, 8 or 12), generated concurrently
+    # and joined. Off: one clip of at most 12s per scene.
+    VIDEO_SPLIT_LONG_SCENES: bool = False
+    VIDEO_SEGMENT_MAX_SECONDS: int = 12
+
+    # Per-scene retries of transient failures, with exponential backoff (seconds)
+    SCENE_MAX_ATTEMPTS: int = 3
+    SCENE_RETRY_BASE_DELAY: float = 5.0
+    SCENE_RETRY_MAX_DELAY: float = 60.0
+
+    # Process-wide provider limits for scene generation
+    VIDEO_SUBMIT_RATE: float = 1.0
+    VIDEO_SUBMIT_BURST: int = 4
+    VIDEO_MAX_CONCURRENT_JOBS: int = 8
+
+    # Durable job queue and workers (seconds unless noted)
+    RUN_EMBEDDED_WORKER: bool = True
+    WORKER_CONCURRENCY: int = 4
+    WORKER_POLL_INTERVAL: float = 1.0
+    JOB_VISIBILITY_TIMEOUT: float = 120.0
+    JOB_HEARTBEAT_INTERVAL: float = 30.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 10.0
+
+    # Admission control for new projects (0 disables a cap). Over a cap,
+    # "queue" accepts the project and starts it later, "reject" answers 429
+    ADMISSION_MODE: str = "queue"
+    ADMISSION_MAX_ACTIVE_PROJECTS: int = 16
+    ADMISSION_MAX_PENDING_SCENES: int = 200
+    ADMISSION_MAX_QUEUED_PROJECTS: int = 100
+    ADMISSION_REPORT_INTERVAL: float = 5.0
+    # Project run time assumed for start estimates until some have finished
+    ADMISSION_DEFAULT_PROJECT_SECONDS: float = 600.0
+
+    # Persist LangGraph state in Mongo so interrupted projects resume
+    GRAPH_CHECKPOINTING: bool = True
+
+    # Per-connection WebSocket outbound queue
+    WS_MAX_PENDING_MESSAGES: int = 256
+    WS_SEND_TIMEOUT: float = 10.0
+
+    # "memory" (single process) or "mongo" (change streams, needs a replica set)
+    BROADCAST_BACKEND: str = "memory"
+    BROADCAST_EVENT_TTL_SECONDS: int = 300
+
+    # Chat-driven scene edits over the project WebSocket. Reply tokens are
+    # batched into one message per CHAT_TOKEN_FLUSH_INTERVAL (seconds); the
+    # first is sent as soon as it arrives
+    CHAT_MODEL: str = "gpt-4o"
+    CHAT_HISTORY_MESSAGES: int = 20
+    CHAT_MAX_MESSAGE_CHARS: int = 4000
+    CHAT_TOKEN_FLUSH_INTERVAL: float = 0.05
+
+    # Manim rendering: "pool" keeps warm worker processes, "subprocess"
+    # runs the manim CLI per render
+    MANIM_RENDER_MODE: str = "pool"
+    MANIM_WORKERS_PER_CORE: float = 0.5
+    MANIM_MAX_RENDERS_PER_WORKER: int = 50
+    MANIM_RENDER_TIMEOUT: float = 600.0
+    MANIM_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    # Debug aid: keep work dirs of failed renders (successful ones are always removed)
+    MANIM_KEEP_FAILED_RENDERS: bool = False
+    MANIM_WORKDIR_TTL: float = 3600.0
+    MANIM_CLEANUP_INTERVAL: float = 600.0
+    # Progressive rendering: fast preview first, then a final re-render
+    MANIM_PREVIEW_QUALITY: str = "-ql"
+    MANIM_FINAL_QUALITY: str = "-qh"
+
+    # ffmpeg thumbnail/preview/proxy processes per CPU core
+    DERIVATIVES_PROCESSES_PER_CORE: float = 1.0
+
+    # HLS packaging (fMP4 bitrate ladder) of scene clips and final videos
+    HLS_ENABLED: bool = True
+    HLS_SEGMENT_SECONDS: int = 4
+    PACKAGING_PROCESSES_PER_CORE: float = 0.5
+
+    # Image generation: shared HTTP client and on-disk asset cache
+    IMAGE_API_URL: str = "https://api.openai.com/v1/images/generations"
+    IMAGE_MAX_CONCURRENCY: int = 4
+    IMAGE_CACHE_MAX_BYTES: int = 1024 ** 3
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+
     class Config:
         env_file = ".env"
 
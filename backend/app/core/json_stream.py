@@ -0,0 +1,56 @@
+import json
+from typing import List
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for a streamed top-level JSON array of objects.
+
+    Text is fed in arbitrary chunks; `feed` returns each object of the array
+    as soon as its closing brace arrives. Anything before the opening `[`
+    (such as a markdown code fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = None
+
+    def feed(self, text: str) -> List[dict]:
+        self._buffer += text
+        items = []
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._depth > 0
+            elif char in "[{":
+                self._depth += 1
+                if char == "{" and self._depth == 2:
+                    self._start = self._pos
+            elif char in "]}" and self._depth > 0:
+                self._depth -= 1
+                if char == "}" and self._depth == 1 and self._start is not None:
+                    try:
+                        items.append(json.loads(self._buffer[self._start:self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._start = None
+            self._pos += 1
+
+        # Drop text that can no longer be part of an unfinished object
+        keep_from = self._start if self._start is not None else self._pos
+        self._buffer = self._buffer[keep_from:]
+        self._pos -= keep_from
+        if self._start is not None:
+            self._start = 0
+        return items
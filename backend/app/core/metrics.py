@@ -0,0 +1,154 @@
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Seconds; spans both sub-second Mongo writes and multi-minute Sora jobs
+STAGE_BUCKETS = (0.005, 0.025, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+STAGE_SECONDS = Histogram(
+    "video_platform_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "video_platform_stage_errors_total", "Pipeline stages that raised", ["stage"]
+)
+BROADCAST_MESSAGES = Counter(
+    "video_platform_broadcast_messages_total", "WebSocket broadcasts by message type", ["type"]
+)
+
+# Project trace writes are fire-and-forget; keep the tasks referenced
+_trace_tasks = set()
+
+
+def summarize(values: Iterable[float]) -> Dict[str, Optional[float]]:
+    """Count, p50, p99 and max of a sample, for stats endpoints."""
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0, "p50": None, "p99": None, "max": None}
+    return {
+        "count": len(ordered),
+        "p50": ordered[int(0.5 * (len(ordered) - 1))],
+        "p99": ordered[int(0.99 * (len(ordered) - 1))],
+        "max": ordered[-1],
+    }
+
+
+def observe(stage: str, seconds: float, project_id: Optional[str] = None, ok: bool = True,
+            started_at: Optional[datetime] = None, **details):
+    """
+    Record one stage duration in the histogram. With a `project_id`, the
+    span is also appended to that project's `timings` trace in the background.
+    """
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if not ok:
+        STAGE_ERRORS.labels(stage).inc()
+    if project_id:
+        _record_span(project_id, {
+            "stage": stage,
+            "started_at": started_at or datetime.utcnow(),
+            "seconds": round(seconds, 4),
+            "ok": ok,
+            **details,
+        })
+
+
+@contextmanager
+def timed(stage: str, project_id: Optional[str] = None, **details):
+    """Time the block with `observe`; it counts as an error if it raises."""
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, project_id, ok, started_at, **details)
+
+
+def traced(stage: str):
+    """`timed` as a decorator for graph nodes, traced under the state's project."""
+    def decorator(node):
+        @functools.wraps(node)
+        async def wrapper(state):
+            details = {"scene_index": state["index"]} if "index" in state else {}
+            with timed(stage, state.get("project_id"), **details):
+                return await node(state)
+        return wrapper
+    return decorator
+
+
+def _record_span(project_id: str, span: dict):
+    from ..db.repository import projects
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(projects.add_timing(project_id, span))
+    _trace_tasks.add(task)
+    task.add_done_callback(_trace_done)
+
+
+def _trace_done(task: asyncio.Task):
+    _trace_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"Failed to record timing span: {task.exception()}")
+
+
+# Stats dicts keyed by an entity id (e.g. scheduler "queued_by_project")
+# become one gauge family with that id as a label, never one metric per id.
+# Only the last MAX_LABELED_SERIES entries (most recently active) are exported.
+LABELED_STATS = {"_by_project": "project"}
+MAX_LABELED_SERIES = 50
+
+
+class StatsCollector:
+    """Exposes the numeric leaves of a nested stats() dict as Prometheus gauges."""
+
+    def __init__(self, source: Callable[[], dict], prefix: str = "video_platform"):
+        self.source = source
+        self.prefix = prefix
+
+    def collect(self):
+        # A failing source must not break the whole /metrics scrape
+        try:
+            stats = self.source()
+        except Exception as e:
+            print(f"Stats collection failed: {e}")
+            return
+        families: Dict[str, GaugeMetricFamily] = {}
+        for name, labels, value in self._flatten(stats, self.prefix, ()):
+            family = families.get(name)
+            if family is None:
+                family = families[name] = GaugeMetricFamily(
+                    name, name.replace("_", " "), labels=[label for label, _ in labels]
+                )
+            family.add_metric([entity for _, entity in labels], value)
+        yield from families.values()
+
+    def _flatten(self, stats: dict, prefix: str, labels: tuple):
+        for key, value in stats.items():
+            name = f"{prefix}_{key}"
+            label = next((label for suffix, label in LABELED_STATS.items() if key.endswith(suffix)), None)
+            if isinstance(value, dict) and label is not None:
+                for entity, entity_value in list(value.items())[-MAX_LABELED_SERIES:]:
+                    entity_labels = labels + ((label, str(entity)),)
+                    if isinstance(entity_value, dict):
+                        yield from self._flatten(entity_value, name, entity_labels)
+                    elif self._numeric(entity_value):
+                        yield name, entity_labels, entity_value
+            elif isinstance(value, dict):
+                yield from self._flatten(value, name, labels)
+            elif self._numeric(value):
+                yield name, labels, value
+
+    @staticmethod
+    def _numeric(value) -> bool:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -7,6 +7,7 @@ Return a JSON list of objects. Each object must have:
 - `description`: A summary of the scene.
 - `visual_plan`: A DETAILED, step-by-step description of what happens on screen. Mention specific colors (Gold, Blue, Red), object positions (Center, Top Left), animations (Fade in, Morph, Spin), and timing. Make it "pop" with emphasis.
 - `voiceover`: A short script of what might be said (for timing context).
+- `duration`: How many seconds the scene should last. The durations of all scenes should add up to the target total duration given with the request.
 
 **Example JSON:**
 [
@@ -14,7 +15,8 @@ Return a JSON list of objects. Each object must have:
     "title": "Introduction",
     "description": "Intro to Photosynthesis",
     "visual_plan": "1. A lush green leaf appears in the center. 2. It zooms in to show cells. 3. Text 'Photosynthesis' writes in bold white font with a green glow in the center.",
-    "voiceover": "Plants feed themselves through a process called photosynthesis."
+    "voiceover": "Plants feed themselves through a process called photosynthesis.",
+    "duration": 8
   }
 ]
 """
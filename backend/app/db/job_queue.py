@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ..core.config import get_settings
+from .database import get_database
+from .models import Job, JobStatus
+
+settings = get_settings()
+
+
+class JobQueue:
+    """
+    Durable job queue stored in the `jobs` collection.
+
+    A worker claims a job by atomically flipping it to RUNNING with a lease.
+    While it works it extends the lease with heartbeats; if it dies, the
+    lease runs out after JOB_VISIBILITY_TIMEOUT and any worker can claim the
+    job again. Failed jobs are retried until JOB_MAX_ATTEMPTS.
+    """
+
+    async def _collection(self):
+        db = await get_database()
+        return db.jobs
+
+    async def _workers(self):
+        db = await get_database()
+        return db.workers
+
+    async def _leases(self):
+        db = await get_database()
+        return db.leases
+
+    async def ensure_indexes(self):
+        jobs = await self._collection()
+        await jobs.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+        await jobs.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        await jobs.create_index([("project_id", ASCENDING)])
+
+    async def enqueue(self, kind: str, project_id: str, payload: Optional[Dict[str, Any]] = None) -> str:
+        jobs = await self._collection()
+        job = Job(
+            kind=kind,
+            project_id=project_id,
+            payload=payload or {},
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+        )
+        job_dump = job.model_dump(by_alias=True)
+        if job_dump.get("_id") is None:
+            del job_dump["_id"]
+        result = await jobs.insert_one(job_dump)
+        return str(result.inserted_id)
+
+    async def claim(self, worker_id: str, exclude_kinds: Iterable[str] = ()) -> Optional[dict]:
+        """
+        Claim the next available job. Queued jobs of `exclude_kinds` are
+        left for later (admission control); expired leases are always
+        reclaimed, since those jobs were already started once.
+        """
+        jobs = await self._collection()
+        now = datetime.utcnow()
+        queued = {"status": JobStatus.QUEUED, "available_at": {"$lte": now}}
+        exclude_kinds = list(exclude_kinds)
+        if exclude_kinds:
+            queued["kind"] = {"$nin": exclude_kinds}
+        return await jobs.find_one_and_update(
+            {
+                "$or": [
+                    queued,
+                    # Lease ran out: the previous worker is gone. A job that
+                    # used up its attempts this way (it keeps killing its
+                    # worker) is left for fail_exhausted instead
+                    {
+                        "status": JobStatus.RUNNING,
+                        "lease_expires_at": {"$lt": now},
+                        "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+                    },
+                ]
+            },
+            {
+                "$set": {
+                    "status": JobStatus.RUNNING,
+                    "worker_id": worker_id,
+                    "started_at": now,
+                    "heartbeat_at": now,
+                    "lease_expires_at": now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_exhausted(self) -> int:
+        """
+        Mark FAILED the jobs whose lease expired on their last attempt.
+        claim never hands them out again, so without this they would stay
+        RUNNING for good. Returns the number of jobs failed.
+        """
+        jobs = await self._collection()
+        now = datetime.utcnow()
+        result = await jobs.update_many(
+            {
+                "status": JobStatus.RUNNING,
+                "lease_expires_at": {"$lt": now},
+                "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+            },
+            {
+                "$set": {
+                    "status": JobStatus.FAILED,
+                    "last_error": "Lease expired on the last attempt",
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "updated_at": now,
+                }
+            },
+        )
+        return result.modified_count
+
+    async def count(self, kinds: Iterable[str], status: JobStatus) -> int:
+        jobs = await self._collection()
+        return await jobs.count_documents({"kind": {"$in": list(kinds)}, "status": status})
+
+    async def has_active(self, project_id: str) -> bool:
+        """Whether the project has a job queued or running."""
+        jobs = await self._collection()
+        return await jobs.count_documents(
+            {"project_id": project_id, "status": {"$in": [JobStatus.QUEUED, JobStatus.RUNNING]}}, limit=1
+        ) > 0
+
+    async def running_project_ids(self) -> List[str]:
+        jobs = await self._collection()
+        return await jobs.distinct("project_id", {"status": JobStatus.RUNNING})
+
+    async def queued_project_ids(self, kinds: Iterable[str], limit: int = 0) -> List[str]:
+        """Projects with a queued job of one of `kinds`, in the order workers claim them."""
+        jobs = await self._collection()
+        cursor = jobs.find({"kind": {"$in": list(kinds)}, "status": JobStatus.QUEUED}, {"project_id": 1})
+        cursor = cursor.sort("available_at", ASCENDING).limit(limit)
+        return [job["project_id"] async for job in cursor]
+
+    async def recent_durations(self, kinds: Iterable[str], limit: int = 20) -> List[float]:
+        """Run time in seconds of the last `limit` completed jobs of `kinds`."""
+        jobs = await self._collection()
+        cursor = jobs.find(
+            {"kind": {"$in": list(kinds)}, "status": JobStatus.COMPLETE, "started_at": {"$ne": None}},
+            {"started_at": 1, "updated_at": 1},
+        ).sort("updated_at", -1).limit(limit)
+        return [(job["updated_at"] - job["started_at"]).total_seconds() async for job in cursor]
+
+    async def heartbeat(self, job_id, worker_id: str) -> bool:
+        """Extend the lease. Returns False if this worker no longer owns the job."""
+        jobs = await self._collection()
+        now = datetime.utcnow()
+        result = await jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id, "status": JobStatus.RUNNING},
+            {
+                "$set": {
+                    "heartbeat_at": now,
+                    "lease_expires_at": now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT),
+                }
+            },
+        )
+        return result.matched_count == 1
+
+    async def complete(self, job_id, worker_id: str):
+        jobs = await self._collection()
+        await jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id},
+            {"$set": {"status": JobStatus.COMPLETE, "lease_expires_at": None, "updated_at": datetime.utcnow()}},
+        )
+
+    async def fail(self, job_id, worker_id: str, error: str):
+        jobs = await self._collection()
+        job = await jobs.find_one({"_id": ObjectId(job_id), "worker_id": worker_id})
+        if not job:
+            return
+        now = datetime.utcnow()
+        if job.get("attempts", 0) < job.get("max_attempts", settings.JOB_MAX_ATTEMPTS):
+            update = {
+                "status": JobStatus.QUEUED,
+                "available_at": now + timedelta(seconds=settings.JOB_RETRY_DELAY * job.get("attempts", 1)),
+            }
+        else:
+            update = {"status": JobStatus.FAILED}
+        update.update({"last_error": error, "worker_id": None, "lease_expires_at": None, "updated_at": now})
+        await jobs.update_one({"_id": ObjectId(job_id), "worker_id": worker_id}, {"$set": update})
+
+    async def release(self, job_id, worker_id: str):
+        """Hand a job back without counting the attempt, e.g. on shutdown."""
+        jobs = await self._collection()
+        await jobs.update_one(
+            {"_id": ObjectId(job_id), "worker_id": worker_id, "status": JobStatus.RUNNING},
+            {
+                "$set": {
+                    "status": JobStatus.QUEUED,
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "available_at": datetime.utcnow(),
+                },
+                "$inc": {"attempts": -1},
+            },
+        )
+
+    async def register_worker(self, worker_id: str, concurrency: int):
+        """Record a live worker and how many jobs it runs at once; repeat as a heartbeat."""
+        workers = await self._workers()
+        await workers.update_one(
+            {"_id": worker_id},
+            {"$set": {"concurrency": concurrency, "seen_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def unregister_worker(self, worker_id: str):
+        workers = await self._workers()
+        await workers.delete_one({"_id": worker_id})
+
+    async def worker_capacity(self) -> int:
+        """Jobs all live workers together run at once. Workers silent for a
+        visibility timeout are presumed dead, like their job leases."""
+        workers = await self._workers()
+        since = datetime.utcnow() - timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+        cursor = workers.find({"seen_at": {"$gte": since}}, {"concurrency": 1})
+        return sum([worker.get("concurrency", 0) async for worker in cursor])
+
+    async def acquire_lease(self, name: str, owner: str, seconds: float) -> bool:
+        """
+        Take or renew the named lease for `seconds`. Returns False while
+        another owner holds it, so one process at a time does the work.
+        """
+        leases = await self._leases()
+        now = datetime.utcnow()
+        try:
+            await leases.find_one_and_update(
+                {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Held by someone else: the upsert collided with their document
+            return False
+        return True
+
+    async def release_lease(self, name: str, owner: str):
+        """Give up the named lease early, if `owner` still holds it."""
+        leases = await self._leases()
+        await leases.delete_one({"_id": name, "owner": owner})
+
+
+job_queue = JobQueue()
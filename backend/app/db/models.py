@@ -53,6 +53,13 @@ class Project(BaseModel):
     workflow: Workflow = Workflow()
     target_duration: int = 60
     final_video_url: Optional[str] = None
+    # HLS master playlist of final_video_url, once packaged
+    final_hls_url: Optional[str] = None
+    # True while the scene plan is streaming in; scenes stored meanwhile
+    # are an incomplete plan
+    planning: bool = False
+    # Stage timing spans (see core.metrics.timed), for postmortems
+    timings: List[Dict[str, Any]] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -72,10 +79,27 @@ class Scene(BaseModel):
     index: int
     title: str
     description: str
+    visual_plan: Optional[str] = None
+    voiceover: Optional[str] = None
     status: SceneStatus = SceneStatus.PLANNED
     code: Optional[str] = None
+    code_hash: Optional[str] = None
     video_url: Optional[str] = None
+    # Provider (Sora) job id, so a retry resumes the job instead of paying again
+    video_id: Optional[str] = None
+    # Same, per segment ("0", "1", ...) when a long scene is split into several clips
+    segment_video_ids: Dict[str, Optional[str]] = {}
+    error: Optional[str] = None
+    # Why the last regenerate failed; the scene keeps its previous clip
+    regenerate_error: Optional[str] = None
+    # "preview" or "final" for progressively rendered Manim scenes
+    render_quality: Optional[str] = None
     thumbnail_url: Optional[str] = None
+    # Short muted loop and low-bitrate copy of video_url, for tiles and previews
+    preview_url: Optional[str] = None
+    proxy_url: Optional[str] = None
+    # HLS master playlist (fMP4 bitrate ladder) of video_url
+    hls_url: Optional[str] = None
     duration: Optional[float] = None
     logs: List[str] = []
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -83,16 +107,52 @@ class Scene(BaseModel):
     class Config:
         populate_by_name = True
 
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETE = "complete"
+    FAILED = "failed"
+
+class Job(BaseModel):
+    id: Optional[str] = Field(alias="_id", default=None)
+    kind: str
+    project_id: str
+    payload: Dict[str, Any] = {}
+    status: JobStatus = JobStatus.QUEUED
+    attempts: int = 0
+    max_attempts: int = 3
+    worker_id: Optional[str] = None
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    lease_expires_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    # When the current attempt was claimed
+    started_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        populate_by_name = True
+
 class ChatRole(str, Enum):
     USER = "user"
     ASSISTANT = "assistant"
     SYSTEM = "system"
 
+class EditStatus(str, Enum):
+    PROPOSED = "proposed"
+    APPLIED = "applied"
+    DISMISSED = "dismissed"
+
 class ChatMessage(BaseModel):
     id: Optional[str] = Field(alias="_id", default=None)
     project_id: str
     role: ChatRole
     content: str
+    # Scene change proposed by an assistant reply: scene_id, scene_index
+    # and the new field values; applied once the user confirms it
+    edit: Optional[Dict[str, Any]] = None
+    edit_status: Optional[EditStatus] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
@@ -0,0 +1,237 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from ..core.metrics import timed
+from .database import get_database
+from .models import ChatMessage, Project, Scene, SceneStatus
+
+# Listing scenes never needs the (potentially large) render logs or code
+SCENE_LIST_PROJECTION = {"logs": 0, "code": 0}
+# The timing trace is for postmortems, not for API responses
+PROJECT_PROJECTION = {"timings": 0}
+# Bound the per-project trace so long-lived projects stay small
+MAX_TIMING_SPANS = 1000
+
+
+def to_object_id(value: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def serialize(doc: dict) -> dict:
+    """Replace Mongo's `_id` with a string `id` for API responses."""
+    if "_id" in doc:
+        doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+def _dump(model) -> dict:
+    data = model.model_dump(by_alias=True)
+    if data.get("_id") is None:
+        del data["_id"]
+    return data
+
+
+class ProjectRepository:
+    async def _collection(self):
+        db = await get_database()
+        return db.projects
+
+    async def create(self, project: Project) -> str:
+        projects = await self._collection()
+        result = await projects.insert_one(_dump(project))
+        return str(result.inserted_id)
+
+    async def get(self, project_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[dict]:
+        oid = to_object_id(project_id)
+        if oid is None:
+            return None
+        projects = await self._collection()
+        return await projects.find_one({"_id": oid}, projection)
+
+    async def update(self, project_id: str, fields: Dict[str, Any]):
+        projects = await self._collection()
+        with timed("mongo_write"):
+            await projects.update_one(
+                {"_id": ObjectId(project_id)},
+                {"$set": {**fields, "updated_at": datetime.utcnow()}}
+            )
+
+    async def update_if(self, project_id: str, condition: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+        """Compare-and-set: apply `fields` only if the project still matches `condition`."""
+        projects = await self._collection()
+        result = await projects.update_one({"_id": ObjectId(project_id), **condition}, {"$set": fields})
+        return result.matched_count == 1
+
+    async def add_timing(self, project_id: str, span: Dict[str, Any]):
+        projects = await self._collection()
+        await projects.update_one(
+            {"_id": ObjectId(project_id)},
+            {"$push": {"timings": {"$each": [span], "$slice": -MAX_TIMING_SPANS}}}
+        )
+
+
+class SceneRepository:
+    async def _collection(self):
+        db = await get_database()
+        return db.scenes
+
+    async def ensure_indexes(self):
+        scenes = await self._collection()
+        await scenes.create_index([("project_id", ASCENDING), ("index", ASCENDING)])
+
+    async def insert(self, scene: Scene) -> str:
+        scenes = await self._collection()
+        with timed("mongo_write"):
+            result = await scenes.insert_one(_dump(scene))
+        return str(result.inserted_id)
+
+    async def insert_many(self, new_scenes: List[Scene]) -> List[str]:
+        if not new_scenes:
+            return []
+        scenes = await self._collection()
+        with timed("mongo_write"):
+            result = await scenes.insert_many([_dump(s) for s in new_scenes], ordered=True)
+        return [str(oid) for oid in result.inserted_ids]
+
+    async def get(self, scene_id: str, project_id: Optional[str] = None,
+                  projection: Optional[Dict[str, Any]] = None) -> Optional[dict]:
+        oid = to_object_id(scene_id)
+        if oid is None:
+            return None
+        query = {"_id": oid}
+        if project_id is not None:
+            query["project_id"] = project_id
+        scenes = await self._collection()
+        return await scenes.find_one(query, projection)
+
+    async def list_for_project(self, project_id: str, projection: Optional[Dict[str, Any]] = None,
+                               offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        scenes = await self._collection()
+        cursor = scenes.find({"project_id": project_id}, projection).sort("index", ASCENDING).skip(offset)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def count_pending(self, project_ids: List[str]) -> int:
+        """Scenes of these projects still planned or rendering."""
+        if not project_ids:
+            return 0
+        scenes = await self._collection()
+        return await scenes.count_documents({
+            "project_id": {"$in": project_ids},
+            "status": {"$in": [SceneStatus.PLANNED, SceneStatus.RENDERING]},
+        })
+
+    async def count(self, project_id: str) -> int:
+        scenes = await self._collection()
+        return await scenes.count_documents({"project_id": project_id})
+
+    async def update(self, scene_id: str, fields: Dict[str, Any]):
+        scenes = await self._collection()
+        with timed("mongo_write"):
+            await scenes.update_one({"_id": ObjectId(scene_id)}, {"$set": fields})
+
+    async def update_many(self, scene_ids: List[str], fields: Dict[str, Any]):
+        scenes = await self._collection()
+        with timed("mongo_write"):
+            await scenes.update_many({"_id": {"$in": [ObjectId(s) for s in scene_ids]}}, {"$set": fields})
+
+    async def update_each(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Apply different `fields` per scene ({scene_id: fields}) in one round trip."""
+        if not updates:
+            return 0
+        scenes = await self._collection()
+        with timed("mongo_write"):
+            result = await scenes.bulk_write(
+                [UpdateOne({"_id": ObjectId(scene_id)}, {"$set": fields}) for scene_id, fields in updates.items()],
+                ordered=False,
+            )
+        return result.matched_count
+
+    async def delete(self, scene_ids: List[str]) -> int:
+        if not scene_ids:
+            return 0
+        scenes = await self._collection()
+        result = await scenes.delete_many({"_id": {"$in": [ObjectId(s) for s in scene_ids]}})
+        return result.deleted_count
+
+    async def delete_for_project(self, project_id: str) -> int:
+        scenes = await self._collection()
+        result = await scenes.delete_many({"project_id": project_id})
+        return result.deleted_count
+
+    async def update_if(self, scene_id: str, condition: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+        """Compare-and-set: apply `fields` only if the scene still matches `condition`."""
+        scenes = await self._collection()
+        result = await scenes.update_one({"_id": ObjectId(scene_id), **condition}, {"$set": fields})
+        return result.matched_count == 1
+
+    async def reorder(self, project_id: str, scene_ids: List[str]) -> int:
+        """Set `index` from the position in `scene_ids` in one round trip."""
+        operations = []
+        for index, scene_id in enumerate(scene_ids):
+            oid = to_object_id(scene_id)
+            if oid is not None:
+                operations.append(UpdateOne({"_id": oid, "project_id": project_id}, {"$set": {"index": index}}))
+        if not operations:
+            return 0
+        scenes = await self._collection()
+        result = await scenes.bulk_write(operations, ordered=False)
+        return result.matched_count
+
+
+class ChatRepository:
+    async def _collection(self):
+        db = await get_database()
+        return db.chat_messages
+
+    async def ensure_indexes(self):
+        messages = await self._collection()
+        await messages.create_index([("project_id", ASCENDING), ("created_at", ASCENDING)])
+
+    async def insert(self, message: ChatMessage) -> str:
+        messages = await self._collection()
+        with timed("mongo_write"):
+            result = await messages.insert_one(_dump(message))
+        return str(result.inserted_id)
+
+    async def get(self, message_id: str, project_id: str) -> Optional[dict]:
+        oid = to_object_id(message_id)
+        if oid is None:
+            return None
+        messages = await self._collection()
+        return await messages.find_one({"_id": oid, "project_id": project_id})
+
+    async def recent(self, project_id: str, limit: int) -> List[dict]:
+        """The project's last `limit` messages, oldest first."""
+        messages = await self._collection()
+        cursor = messages.find({"project_id": project_id}).sort(
+            [("created_at", DESCENDING), ("_id", DESCENDING)]
+        ).limit(limit)
+        return list(reversed(await cursor.to_list(length=limit)))
+
+    async def update(self, message_id: str, fields: Dict[str, Any]):
+        messages = await self._collection()
+        with timed("mongo_write"):
+            await messages.update_one({"_id": ObjectId(message_id)}, {"$set": fields})
+
+    async def update_if(self, message_id: str, condition: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+        """Compare-and-set: apply `fields` only if the message still matches `condition`."""
+        oid = to_object_id(message_id)
+        if oid is None:
+            return False
+        messages = await self._collection()
+        result = await messages.update_one({"_id": oid, **condition}, {"$set": fields})
+        return result.matched_count == 1
+
+
+projects = ProjectRepository()
+scenes = SceneRepository()
+chat_messages = ChatRepository()
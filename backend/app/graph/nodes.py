@@ -1,88 +1,284 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_core.output_parsers import JsonOutputParser
 from langgraph.types import Send
-from bson import ObjectId
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import random
+import weakref
 
-from ..db.database import get_database
-from ..db.models import Scene, SceneStatus
+from ..db.repository import projects, scenes
+from ..db.models import Scene, SceneStatus, ProjectStatus
 from ..services.socket_manager import manager
-from ..services.video_service import video_service
+from ..services.video_service import get_video_service, is_transient, needs_new_job, segment_durations
+from ..services.compositor import compositor
+from ..services.derivatives import derivative_service
+from ..services.packaging import packaging_service, remove_package
+from ..services.storage import media_path
 from ..core.prompts import SCENE_PLANNING_PROMPT
 from ..core.config import get_settings
+from ..core.json_stream import JsonArrayStream
+from ..core.metrics import timed, traced
+from .replan import match_scenes, scene_key
 from .state import ProjectState, SceneState
 
 settings = get_settings()
 
-planning_llm = ChatOpenAI(model="gpt-4o", api_key=settings.OPENAI_API_KEY)
+# Scene generation started by plan_scenes before the graph dispatched it,
+# keyed by scene_id
+_prestarted: Dict[str, asyncio.Task] = {}
 
+@lru_cache
+def get_planning_llm():
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY must be set")
+    # langchain_openai is by far the slowest import in the app; defer it
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model="gpt-4o", api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+
+def scene_spec_from_doc(doc: dict) -> SceneState:
+    return {
+        "scene_id": str(doc["_id"]),
+        "project_id": doc["project_id"],
+        "index": doc["index"],
+        "title": doc["title"],
+        "description": doc.get("description", ""),
+        "visual_plan": doc.get("visual_plan") or doc.get("description", ""),
+        "voiceover": doc.get("voiceover"),
+        "video_url": doc.get("video_url"),
+        "target_duration_seconds": doc.get("duration"),
+        "status": doc.get("status", SceneStatus.PLANNED.value),
+    }
+
+def _scene_duration(data: dict) -> Optional[float]:
+    try:
+        duration = float(data.get("duration"))
+    except (TypeError, ValueError):
+        return None
+    return duration if duration > 0 else None
+
+# What clients show of a scene's progress
+SCENE_STATE_PROJECTION = {
+    "status": 1, "video_url": 1, "thumbnail_url": 1, "preview_url": 1, "proxy_url": 1, "hls_url": 1,
+}
+
+def _scene_fields(index: int, data: dict) -> dict:
+    """Stored fields of a scene from its planner output."""
+    return {
+        "title": data.get("title") or f"Scene {index + 1}",
+        "description": data.get("description", data.get("visual_plan", "Scene")),
+        "visual_plan": data.get("visual_plan", ""),
+        "voiceover": data.get("voiceover"),
+    }
+
+async def _add_planned_scenes(project_id: str, planned: List[Tuple[int, dict]]) -> List[SceneState]:
+    """Store planner output as PLANNED scenes in one insert; `planned` is (index, data) pairs."""
+    durations = [_scene_duration(data) for _, data in planned]
+    scene_ids = await scenes.insert_many([
+        Scene(
+            project_id=project_id,
+            index=index,
+            status=SceneStatus.PLANNED,
+            duration=duration,
+            **_scene_fields(index, data),
+        )
+        for (index, data), duration in zip(planned, durations)
+    ])
+    return [
+        {
+            "scene_id": scene_id,
+            "project_id": project_id,
+            "index": index,
+            "title": data.get("title") or f"Scene {index + 1}",
+            "description": data.get("description", ""),
+            "visual_plan": data.get("visual_plan", ""),
+            "voiceover": data.get("voiceover"),
+            "target_duration_seconds": duration,
+            "status": "planned",
+        }
+        for scene_id, (index, data), duration in zip(scene_ids, planned, durations)
+    ]
+
+@traced("plan_scenes")
 async def plan_scenes(state: ProjectState):
     print("Planning scenes...")
-    db = await get_database()
     project_id = state["project_id"]
     prompt = state["user_prompt"]
-    
-    try:
-        project = await db.projects.find_one({"_id": ObjectId(project_id)})
-    except Exception:
-        project = None
-    
+
+    project = await projects.get(project_id, {"target_duration": 1, "planning": 1})
     target_duration = (project or {}).get("target_duration", 60)
-    
+
     messages = [
-        SystemMessage(content=SCENE_PLANNING_PROMPT),
-        HumanMessage(content=prompt)
+        ("system", SCENE_PLANNING_PROMPT),
+        ("human", f"{prompt}\n\nTarget total duration: {target_duration} seconds."),
     ]
-    
-    response = await planning_llm.ainvoke(messages)
-    parser = JsonOutputParser()
+
+    existing_scenes = await scenes.list_for_project(project_id)
+    if existing_scenes and state.get("replan"):
+        scene_specs = await _replan_scenes(project_id, messages, target_duration, existing_scenes)
+        return {"scenes": scene_specs, "completed_scenes": []}
+    if existing_scenes and not (project or {}).get("planning"):
+        # Resuming an interrupted run: keep the stored plan instead of
+        # re-planning, continue_to_scenes skips the scenes already READY.
+        print(f"Reusing {len(existing_scenes)} planned scenes for project {project_id}")
+        scene_specs = [scene_spec_from_doc(s) for s in existing_scenes]
+        await manager.broadcast({
+            "type": "scenes_planned",
+            "scenes": scene_specs
+        }, project_id)
+        return {"scenes": scene_specs, "completed_scenes": []}
+    if existing_scenes:
+        # Interrupted while the plan was streaming: start over
+        await scenes.delete_for_project(project_id)
+
+    await projects.update(project_id, {"planning": True})
+
+    # Stream the plan and store each scene as soon as its object is complete.
+    # Scenes whose duration the planner gave start generating right away;
+    # generate_and_render_scene joins them when the graph dispatches them.
+    scene_specs = []
+    stream = JsonArrayStream()
     try:
-        scenes_data = parser.parse(response.content)
-    except:
+        with timed("planning_llm", project_id):
+            async for chunk in get_planning_llm().astream(messages):
+                # Scenes completed by the same chunk are stored together
+                batch = [data for data in stream.feed(chunk.content) if isinstance(data, dict)]
+                if not batch:
+                    continue
+                new_specs = await _add_planned_scenes(
+                    project_id, list(enumerate(batch, start=len(scene_specs)))
+                )
+                scene_specs.extend(new_specs)
+                for spec in new_specs:
+                    await manager.broadcast({"type": "scene_planned", "scene": spec}, project_id)
+                    if spec["target_duration_seconds"] is not None:
+                        _prestarted[spec["scene_id"]] = asyncio.create_task(_generate_scene(dict(spec)))
+    except BaseException:
+        for spec in scene_specs:
+            task = _prestarted.pop(spec["scene_id"], None)
+            if task:
+                task.cancel()
+        raise
+
+    if not scene_specs:
         print("Failed to parse JSON, using dummy scene")
-        scenes_data = [{"title": "Scene 1", "description": prompt, "visual_plan": "Show text", "voiceover": "Hello"}]
+        scene_specs.extend(await _add_planned_scenes(project_id, [(0, {
+            "title": "Scene 1", "description": prompt, "visual_plan": "Show text", "voiceover": "Hello"
+        })]))
 
-    num_scenes = max(len(scenes_data), 1)
-    per_scene_duration = float(target_duration) / float(num_scenes)
+    await _fill_missing_durations(scene_specs, target_duration)
 
-    # Save scenes to DB
-    scene_specs = []
-    for i, s in enumerate(scenes_data):
-        new_scene = Scene(
-            project_id=project_id,
-            index=i,
-            title=s["title"],
-            description=s.get("description", s.get("visual_plan", "Scene")),
-            status=SceneStatus.PLANNED,
-            duration=per_scene_duration,
-        )
-        scene_dump = new_scene.model_dump(by_alias=True)
-        if scene_dump.get("_id") is None:
-            del scene_dump["_id"]
-        result = await db.scenes.insert_one(scene_dump)
-        
-        scene_specs.append({
-            "scene_id": str(result.inserted_id),
-            "project_id": project_id,
-            "index": i,
-            "title": s["title"],
-            "description": s.get("description", ""),
-            "visual_plan": s.get("visual_plan", ""),
-            "voiceover": s.get("voiceover"),
-            "target_duration_seconds": per_scene_duration,
-            "status": "planned",
-            "retry_count": 0,
-            "last_error": None
-        })
-    
+    await projects.update(project_id, {"planning": False})
+
+    # Scenes started while the plan streamed may be rendering or done by
+    # now; send their current state so clients don't reset them to planned
+    current = {
+        str(doc["_id"]): {key: value for key, value in doc.items() if key != "_id"}
+        for doc in await scenes.list_for_project(project_id, SCENE_STATE_PROJECTION)
+    }
     await manager.broadcast({
         "type": "scenes_planned",
-        "scenes": scene_specs
+        "scenes": [{**spec, **current.get(spec["scene_id"], {})} for spec in scene_specs]
     }, project_id)
     
     return {"scenes": scene_specs, "completed_scenes": []}
 
+async def _fill_missing_durations(scene_specs: List[SceneState], target_duration: float):
+    # Fallback when the planner left durations out: those scenes split what
+    # is left of the target evenly, which needs the final scene count.
+    missing = [s for s in scene_specs if s["target_duration_seconds"] is None]
+    if missing:
+        remaining = float(target_duration) - sum(
+            s["target_duration_seconds"] for s in scene_specs if s["target_duration_seconds"] is not None
+        )
+        if remaining <= 0:
+            remaining = float(target_duration) * len(missing) / len(scene_specs)
+        per_scene_duration = remaining / len(missing)
+        for s in missing:
+            s["target_duration_seconds"] = per_scene_duration
+        await scenes.update_many([s["scene_id"] for s in missing], {"duration": per_scene_duration})
+
+async def _replan_scenes(project_id: str, messages: list, target_duration: float,
+                         existing_scenes: List[dict]) -> List[SceneState]:
+    """
+    Plan the project again and diff the result against its stored scenes
+    (see replan.match_scenes). Unchanged scenes keep their clip and only
+    move to their new position; changed scenes are reset to PLANNED in
+    place and new ones inserted, so continue_to_scenes dispatches only
+    those. Scenes no longer in the plan are deleted.
+    """
+    stream = JsonArrayStream()
+    planned = []
+    with timed("planning_llm", project_id):
+        async for chunk in get_planning_llm().astream(messages):
+            planned.extend(data for data in stream.feed(chunk.content) if isinstance(data, dict))
+    if not planned:
+        # Keep the current plan rather than replacing it with nothing
+        raise ValueError("Re-planning returned no scenes")
+
+    matches = match_scenes(existing_scenes, [_scene_fields(i, data) for i, data in enumerate(planned)])
+    specs_by_index: Dict[int, SceneState] = {}
+    updates: Dict[str, dict] = {}
+    added = []
+    counts = {"kept": 0, "changed": 0, "added": 0}
+    for index, (data, stored) in enumerate(zip(planned, matches)):
+        fields = _scene_fields(index, data)
+        if stored is None:
+            added.append((index, data))
+            counts["added"] += 1
+            continue
+
+        scene_id = str(stored["_id"])
+        if scene_key(stored) == scene_key(fields):
+            # Same clip content: only the position and voiceover may differ
+            update = {"index": index, "voiceover": fields["voiceover"]}
+            counts["kept"] += 1
+        else:
+            update = {
+                **fields,
+                "index": index,
+                "duration": _scene_duration(data),
+                "status": SceneStatus.PLANNED,
+                "video_url": None,
+                "video_id": None,
+                "segment_video_ids": {},
+                "error": None,
+                "thumbnail_url": None,
+                "preview_url": None,
+                "proxy_url": None,
+                "hls_url": None,
+            }
+            counts["changed"] += 1
+        updates[scene_id] = update
+        specs_by_index[index] = scene_spec_from_doc({**stored, **update})
+
+    # One bulk update for the kept and changed scenes, one insert for the new ones
+    await scenes.update_each(updates)
+    for spec in await _add_planned_scenes(project_id, added):
+        specs_by_index[spec["index"]] = spec
+    scene_specs = [specs_by_index[index] for index in range(len(planned))]
+
+    matched_ids = {str(stored["_id"]) for stored in matches if stored is not None}
+    removed = [str(doc["_id"]) for doc in existing_scenes if str(doc["_id"]) not in matched_ids]
+    counts["removed"] = await scenes.delete(removed)
+    await _fill_missing_durations(scene_specs, target_duration)
+    print(f"Re-planned project {project_id}: {counts}")
+
+    await manager.broadcast({
+        "type": "scenes_planned",
+        "scenes": scene_specs,
+        "replan": counts,
+    }, project_id)
+    return scene_specs
+
 async def generate_and_render_scene(state: SceneState):
+    task = _prestarted.pop(state["scene_id"], None)
+    if task is not None:
+        # Already started while the plan was streaming
+        return await task
+    return await _generate_scene(state)
+
+@traced("generate_and_render_scene")
+async def _generate_scene(state: SceneState):
     scene_id = state["scene_id"]
     project_id = state["project_id"]
     index = state["index"]
@@ -91,11 +287,31 @@ async def generate_and_render_scene(state: SceneState):
     visual_plan = state.get("visual_plan", description)
     voiceover = state.get("voiceover")
     target_duration_seconds = state.get("target_duration_seconds")
-    retry_count = state.get("retry_count", 0)
-    last_error = state.get("last_error")
-    
-    print(f"Processing scene {scene_id} (Attempt {retry_count + 1})...")
     
+    regenerate = state.get("regenerate", False)
+
+    existing = await scenes.get(
+        scene_id, projection={"status": 1, "video_url": 1, "video_id": 1, "segment_video_ids": 1}
+    )
+    if not regenerate:
+        # A resumed run may re-dispatch a scene that finished before the
+        # interruption; never pay for it twice.
+        if existing and existing.get("status") == SceneStatus.READY and existing.get("video_url"):
+            print(f"Scene {scene_id} already ready, skipping")
+            return {
+                "completed_scenes": [{
+                    "scene_id": scene_id,
+                    "status": SceneStatus.READY.value,
+                    "video_url": existing["video_url"]
+                }]
+            }
+
+    # A job submitted by an interrupted earlier run is resumed, not resubmitted
+    video_id = None if regenerate else (existing or {}).get("video_id")
+    segment_video_ids = {} if regenerate else dict((existing or {}).get("segment_video_ids") or {})
+    # Segments that finished in an earlier attempt are not generated again
+    finished_segments = {}
+
     status = SceneStatus.ERROR
     video_url = None
     error_message = None
@@ -109,71 +325,203 @@ async def generate_and_render_scene(state: SceneState):
             "progress_message": msg,
         }, project_id)
 
-    try:
-        if target_duration_seconds is None:
-            db = await get_database()
-            try:
-                project = await db.projects.find_one({"_id": ObjectId(project_id)})
-            except Exception:
-                project = None
-            target_duration = (project or {}).get("target_duration", 60)
-            scene_count = await db.scenes.count_documents({"project_id": project_id}) or 1
-            target_duration_seconds = float(target_duration) / float(scene_count)
-        
-        db = await get_database()
-        await db.scenes.update_one(
-            {"_id": ObjectId(scene_id)},
-            {"$set": {"status": SceneStatus.RENDERING}}
-        )
-        
-        await on_progress("Starting generation...")
-        
-        video_url = await video_service.generate_video(
-            project_id=project_id,
-            scene_index=index,
-            title=title,
-            description=description,
-            visual_plan=visual_plan,
-            voiceover=voiceover,
-            target_duration_seconds=target_duration_seconds,
-            on_progress=on_progress
-        )
-        status = SceneStatus.READY
+    async def on_submitted(new_video_id: str):
+        nonlocal video_id
+        video_id = new_video_id
+        await scenes.update(scene_id, {"video_id": new_video_id})
 
-    except Exception as e:
-        print(f"Video generation failed: {e}")
-        error_message = str(e)
-        status = SceneStatus.ERROR
-
-    if status == SceneStatus.ERROR and retry_count < 2:
-        print(f"Retrying scene {scene_id}...")
-        return Send("generate_and_render_scene", {
-            **state,
-            "retry_count": retry_count + 1,
-            "last_error": error_message,
-            "target_duration_seconds": target_duration_seconds,
-        })
+    async def on_segment_submitted(segment: str, new_video_id: Optional[str]):
+        segment_video_ids[segment] = new_video_id
+        await scenes.update(scene_id, {f"segment_video_ids.{segment}": new_video_id})
+
+    if target_duration_seconds is None:
+        project = await projects.get(project_id, {"target_duration": 1})
+        target_duration = (project or {}).get("target_duration", 60)
+        scene_count = await scenes.count(project_id) or 1
+        target_duration_seconds = float(target_duration) / float(scene_count)
+
+    await scenes.update(scene_id, {
+        "status": SceneStatus.RENDERING,
+        # Jobs of an earlier split may not line up with the new segments
+        **({"segment_video_ids": {}} if regenerate else {}),
+    })
+
+    segmented = settings.VIDEO_SPLIT_LONG_SCENES and len(segment_durations(target_duration_seconds)) > 1
+    request = dict(
+        project_id=project_id,
+        scene_index=index,
+        title=title,
+        description=description,
+        visual_plan=visual_plan,
+        voiceover=voiceover,
+        target_duration_seconds=target_duration_seconds,
+        on_progress=on_progress,
+        priority=state.get("priority", False),
+        use_cache=not regenerate,
+    )
+
+    for attempt in range(settings.SCENE_MAX_ATTEMPTS):
+        print(f"Processing scene {scene_id} (Attempt {attempt + 1})...")
+        try:
+            resuming = any(segment_video_ids.values()) if segmented else video_id is not None
+            await on_progress("Resuming generation job..." if resuming else "Starting generation...")
+
+            if segmented:
+                video_url = await get_video_service().generate_segmented_video(
+                    **request,
+                    video_ids=segment_video_ids,
+                    on_submitted=on_segment_submitted,
+                    finished=finished_segments,
+                )
+            else:
+                video_url = await get_video_service().generate_video(
+                    **request,
+                    video_id=video_id,
+                    on_submitted=on_submitted,
+                )
+            status = SceneStatus.READY
+            error_message = None
+            break
+        except Exception as e:
+            print(f"Video generation failed: {e}")
+            error_message = str(e)
+
+            if video_id and needs_new_job(e):
+                video_id = None
+                await scenes.update(scene_id, {"video_id": None})
+            if not is_transient(e) or attempt + 1 >= settings.SCENE_MAX_ATTEMPTS:
+                break
+
+            # Exponential backoff with jitter; a failed poll or download
+            # resumes the same job on the next attempt
+            delay = min(settings.SCENE_RETRY_BASE_DELAY * 2 ** attempt, settings.SCENE_RETRY_MAX_DELAY)
+            delay *= random.uniform(0.5, 1.0)
+            await on_progress(f"Retrying in {delay:.0f}s...")
+            await asyncio.sleep(delay)
 
-    db = await get_database()
-    await db.scenes.update_one(
-        {"_id": ObjectId(scene_id)},
-        {"$set": {"video_url": video_url, "status": status, "duration": target_duration_seconds}}
+    previous_url = (existing or {}).get("video_url")
+    keep_previous = bool(
+        status == SceneStatus.ERROR and regenerate
+        and (existing or {}).get("status") == SceneStatus.READY and previous_url
     )
+    regenerate_error = None
+    if status == SceneStatus.READY:
+        await scenes.update(scene_id, {
+            "video_url": video_url,
+            # Made from the previous clip, if any; recreated below
+            "thumbnail_url": None,
+            "preview_url": None,
+            "proxy_url": None,
+            "hls_url": None,
+            "status": status,
+            "duration": target_duration_seconds,
+            "error": None,
+            "regenerate_error": None,
+        })
+    elif keep_previous:
+        # A failed regenerate leaves the finished clip (and its renditions)
+        # in place: the scene stays READY and the final video is untouched
+        status = SceneStatus.READY
+        video_url = previous_url
+        regenerate_error = error_message
+        await scenes.update(scene_id, {"status": status, "regenerate_error": regenerate_error})
+    else:
+        await scenes.update(scene_id, {"status": status, "error": error_message})
     
-    await manager.broadcast({
+    update = {
         "type": "scene_update",
         "scene_id": scene_id,
         "status": status,
-        "video_url": video_url
-    }, project_id)
+        "video_url": video_url,
+        "regenerate_error": regenerate_error,
+    }
+    if status == SceneStatus.READY and not keep_previous:
+        update.update(thumbnail_url=None, preview_url=None, proxy_url=None, hls_url=None)
+    await manager.broadcast(update, project_id)
+
+    if status == SceneStatus.READY and not keep_previous:
+        # Run while the remaining scenes generate; both broadcast their own update
+        derivative_service.schedule(project_id, scene_id, video_url)
+        packaging_service.schedule_scene(project_id, scene_id, video_url)
     
     return {
         "completed_scenes": [{
             "scene_id": scene_id,
-            "status": status,
+            "status": status.value,
             "video_url": video_url
         }]
     }
 
 def continue_to_scenes(state: ProjectState):
-    return [Send("generate_and_render_scene", s) for s in state["scenes"]]
+    pending = [
+        Send("generate_and_render_scene", s)
+        for s in state["scenes"]
+        if s.get("status") != SceneStatus.READY
+    ]
+    # Nothing left to generate (e.g. a resumed run): go straight to combining
+    return pending or ["combine_scenes"]
+
+_combine_locks = weakref.WeakValueDictionary()
+
+async def combine_project(project_id: str) -> ProjectStatus:
+    """
+    Join the project's READY scene clips in `index` order into
+    `final_video_url`. Uses stream copy, so it is cheap enough to rerun
+    after every reorder or single-scene regeneration.
+    """
+    lock = _combine_locks.get(project_id)
+    if lock is None:
+        lock = _combine_locks[project_id] = asyncio.Lock()
+    async with lock:
+        project = await projects.get(project_id, {"final_video_url": 1})
+        await projects.update(project_id, {"status": ProjectStatus.COMBINING})
+        await manager.broadcast({
+            "type": "project_update",
+            "project_id": project_id,
+            "status": ProjectStatus.COMBINING,
+        }, project_id)
+
+        project_scenes = await scenes.list_for_project(project_id, {"index": 1, "status": 1, "video_url": 1})
+        video_urls = [
+            s["video_url"] for s in project_scenes
+            if s.get("status") == SceneStatus.READY and s.get("video_url")
+        ]
+
+        final_video_url = None
+        status = ProjectStatus.ERROR
+        try:
+            if video_urls:
+                final_video_url = await compositor.concat(project_id, video_urls)
+                # Partial output is still useful, but flag the project if any scene failed
+                status = ProjectStatus.READY if len(video_urls) == len(project_scenes) else ProjectStatus.ERROR
+        except Exception as e:
+            print(f"Combining project {project_id} failed: {e}")
+
+        previous_url = (project or {}).get("final_video_url")
+        if final_video_url is None:
+            final_video_url = previous_url
+        fields = {"status": status, "final_video_url": final_video_url}
+        if final_video_url != previous_url:
+            fields["final_hls_url"] = None
+        await projects.update(project_id, fields)
+        if previous_url and previous_url != final_video_url:
+            try:
+                media_path(previous_url).unlink(missing_ok=True)
+            except ValueError:
+                pass
+            remove_package(previous_url)
+        if final_video_url and final_video_url != previous_url:
+            packaging_service.schedule_project(project_id, final_video_url)
+
+        await manager.broadcast({
+            "type": "project_update",
+            "project_id": project_id,
+            "status": status,
+            "final_video_url": final_video_url,
+        }, project_id)
+        return status
+
+@traced("combine_scenes")
+async def combine_scenes(state: ProjectState):
+    status = await combine_project(state["project_id"])
+    return {"status": status.value}
@@ -0,0 +1,38 @@
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+# What a scene's clip is generated from; a scene whose key is unchanged
+# keeps its video across a re-plan
+SCENE_KEY_FIELDS = ("title", "description", "visual_plan")
+
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def scene_key(scene: dict) -> tuple:
+    return tuple(_normalize(scene.get(field)) for field in SCENE_KEY_FIELDS)
+
+
+def match_scenes(stored: List[dict], planned: List[dict]) -> List[Optional[dict]]:
+    """
+    For each planned scene, the stored scene it takes over: first one with
+    the same content (its clip is kept), then one with the same title (it
+    is regenerated in place), else None (a new scene). Each stored scene is
+    matched at most once; unmatched ones are no longer part of the plan.
+    """
+    by_key: Dict[tuple, deque] = defaultdict(deque)
+    for doc in stored:
+        by_key[scene_key(doc)].append(doc)
+    matches = [by_key[scene_key(scene)].popleft() if by_key[scene_key(scene)] else None for scene in planned]
+
+    used = {id(doc) for doc in matches if doc is not None}
+    by_title: Dict[str, deque] = defaultdict(deque)
+    for doc in stored:
+        if id(doc) not in used:
+            by_title[_normalize(doc.get("title"))].append(doc)
+    for i, scene in enumerate(planned):
+        candidates = by_title[_normalize(scene.get("title"))]
+        if matches[i] is None and candidates:
+            matches[i] = candidates.popleft()
+    return matches
@@ -0,0 +1,73 @@
+import asyncio
+
+from ..db.repository import scenes
+from ..services.chat import get_chat_llm
+from ..services.socket_manager import manager
+from ..services.video_service import get_video_service
+from .nodes import combine_project, generate_and_render_scene, get_planning_llm, scene_spec_from_doc
+from .workflow import get_graph_app
+
+
+def warm_up():
+    """
+    Build the lazily created services (OpenAI clients, compiled graph).
+    Blocking: run it in a thread so the heavy imports stay off the event loop.
+    """
+    get_video_service()
+    get_planning_llm()
+    get_chat_llm()
+    get_graph_app()
+
+
+async def run_graph(project_id: str, prompt: str, replan: bool = False):
+    """
+    Run the workflow for a project. With `replan`, the project already has
+    scenes: plan_scenes diffs a new plan against them and only new or
+    changed scenes are generated.
+    """
+    config = {"configurable": {"thread_id": project_id}}
+    graph_input = {
+        "project_id": project_id,
+        "user_prompt": prompt,
+        "replan": replan,
+        "scenes": [],
+        "status": "creating",
+        "error": None
+    }
+
+    graph_app = await asyncio.to_thread(get_graph_app)
+    if graph_app.checkpointer:
+        snapshot = await graph_app.aget_state(config)
+        # Only resume the same kind of run, not e.g. an abandoned first run on re-plan
+        same_run = (snapshot.values.get("replan", False) == replan
+                    and snapshot.values.get("user_prompt") == prompt)
+        if snapshot.next and same_run:
+            # Interrupted run: continue from the last checkpoint. Scenes that
+            # finished before the interruption are not dispatched again.
+            print(f"Resuming project {project_id} at {snapshot.next}")
+            graph_input = None
+
+    # Nodes broadcast their own progress via manager, so the events
+    # themselves are not needed here.
+    async for event in graph_app.astream(graph_input, config):
+        pass
+
+    await manager.broadcast({"type": "project_complete", "project_id": project_id}, project_id)
+
+
+async def regenerate_scene(project_id: str, scene_id: str):
+    """Re-render one scene outside the graph, in the scheduler's priority lane."""
+    scene = await scenes.get(scene_id, project_id)
+    if not scene:
+        raise ValueError(f"Scene {scene_id} not found in project {project_id}")
+
+    result = await generate_and_render_scene({
+        **scene_spec_from_doc(scene),
+        "priority": True,
+        "regenerate": True,
+    })
+    # A failed regenerate keeps the previous clip; the final video still matches
+    if result["completed_scenes"][0]["video_url"] == scene.get("video_url"):
+        print(f"Scene {scene_id} unchanged, not recombining project {project_id}")
+        return
+    await combine_project(project_id)
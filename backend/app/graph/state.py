@@ -13,8 +13,8 @@ class SceneState(TypedDict, total=False):
     video_url: Optional[str]
     target_duration_seconds: Optional[float]
     status: str
-    retry_count: int
-    last_error: Optional[str]
+    priority: bool
+    regenerate: bool
 
 class SceneUpdate(TypedDict):
     scene_id: str
@@ -24,6 +24,8 @@ class SceneUpdate(TypedDict):
 class ProjectState(TypedDict):
     project_id: str
     user_prompt: str
+    # Re-plan an existing project, keeping scenes that did not change
+    replan: bool
     scenes: List[SceneState] 
     completed_scenes: Annotated[List[SceneUpdate], operator.add]
     status: str
@@ -1,21 +1,40 @@
+from functools import lru_cache
 from langgraph.graph import StateGraph, START, END
-from .state import ProjectState, SceneState
-from .nodes import plan_scenes, generate_and_render_scene, continue_to_scenes
+from ..core.config import get_settings
+from .state import ProjectState
+from .nodes import plan_scenes, generate_and_render_scene, continue_to_scenes, combine_scenes
 
-workflow = StateGraph(ProjectState)
+settings = get_settings()
 
-workflow.add_node("plan_scenes", plan_scenes)
-workflow.add_node("generate_and_render_scene", generate_and_render_scene)
+def build_workflow() -> StateGraph:
+    workflow = StateGraph(ProjectState)
 
-workflow.add_edge(START, "plan_scenes")
+    workflow.add_node("plan_scenes", plan_scenes)
+    workflow.add_node("generate_and_render_scene", generate_and_render_scene)
+    workflow.add_node("combine_scenes", combine_scenes)
 
-workflow.add_conditional_edges(
-    "plan_scenes",
-    continue_to_scenes,
-    ["generate_and_render_scene"]
-)
+    workflow.add_edge(START, "plan_scenes")
 
-workflow.add_edge("generate_and_render_scene", END)
+    workflow.add_conditional_edges(
+        "plan_scenes",
+        continue_to_scenes,
+        ["generate_and_render_scene", "combine_scenes"]
+    )
 
-app = workflow.compile()
+    # Runs once, after the last scene of the fan-out has finished
+    workflow.add_edge("generate_and_render_scene", "combine_scenes")
+    workflow.add_edge("combine_scenes", END)
+    return workflow
 
+@lru_cache
+def get_graph_app():
+    # Checkpoints are keyed by thread_id = project_id (see runner.run_graph).
+    # The graph is built and compiled on first use, not at import, and
+    # MongoDBSaver creates its indexes on construction.
+    checkpointer = None
+    if settings.GRAPH_CHECKPOINTING:
+        from langgraph.checkpoint.mongodb import MongoDBSaver
+        from pymongo import MongoClient
+
+        checkpointer = MongoDBSaver(MongoClient(settings.MONGODB_URL), db_name=settings.DATABASE_NAME)
+    return build_workflow().compile(checkpointer=checkpointer)
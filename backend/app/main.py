@@ -1,10 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from .core.config import get_settings
+from .core.metrics import StatsCollector
 from .db.database import db
-from .api import routes
+from .db.job_queue import job_queue
+from .db.repository import chat_messages as chat_repository, scenes as scene_repository
+from .api import media, routes
+from .services.admission import admission
+from .services.chat import chat_service
+from .services.socket_manager import manager
+from .services.image_gen import close_image_service
+from .graph.runner import warm_up
+from .worker import Worker
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+import asyncio
 import os
+import shutil
 
 settings = get_settings()
 
@@ -18,23 +29,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create storage dir if not exists
-if not os.path.exists(settings.STORAGE_DIR):
-    os.makedirs(settings.STORAGE_DIR)
-
-# Mount storage for serving videos
-app.mount("/media", StaticFiles(directory=settings.STORAGE_DIR), name="media")
+# Serves STORAGE_DIR (created on startup) under /media, with Range and ETag support
+app.include_router(media.router)
 
 app.include_router(routes.router, prefix="/api")
 
+# Stage histograms come from core.metrics; the services' stats() are exported as gauges
+REGISTRY.register(StatsCollector(routes.collect_stats))
+
 @app.on_event("startup")
 async def startup_db_client():
+    os.makedirs(settings.STORAGE_DIR, exist_ok=True)
     db.connect()
+    await job_queue.ensure_indexes()
+    await scene_repository.ensure_indexes()
+    await chat_repository.ensure_indexes()
+    await manager.start()
+    await admission.start()
+    # Single-process setups run generation in the API; production runs
+    # dedicated `python -m app.worker` processes instead.
+    if settings.RUN_EMBEDDED_WORKER:
+        app.state.worker = Worker()
+        app.state.worker_task = asyncio.create_task(app.state.worker.run())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if settings.RUN_EMBEDDED_WORKER:
+        await app.state.worker.stop()
+        await app.state.worker_task
+    await admission.stop()
+    await chat_service.stop()
+    await manager.stop()
+    await close_image_service()
     db.close()
 
+@app.get("/healthz")
+async def liveness():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness(response: Response):
+    checks = {}
+    try:
+        await asyncio.wait_for(db.client.admin.command("ping"), timeout=2.0)
+        checks["mongodb"] = "ok"
+    except Exception as e:
+        checks["mongodb"] = f"error: {e}"
+    try:
+        await asyncio.to_thread(warm_up)
+        checks["services"] = "ok"
+    except Exception as e:
+        checks["services"] = f"error: {e}"
+    checks["ffmpeg"] = "ok" if shutil.which("ffmpeg") else "error: not on PATH"
+
+    ready = all(check == "ok" for check in checks.values())
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/")
 async def root():
     return {"message": "Cursor Video Platform API"}
@@ -0,0 +1,220 @@
+import asyncio
+import math
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from ..core.config import get_settings
+from ..db.job_queue import job_queue
+from ..db.models import JobStatus
+from ..db.repository import scenes
+from .socket_manager import manager
+
+settings = get_settings()
+
+# Every job kind works on a whole project, so all of them count against
+# the caps: a replan or regenerate renders scenes just like a new project
+PROJECT_JOBS = ("run_graph", "replan", "regenerate_scene")
+# Only the replica holding this lease pushes queue updates
+REPORT_LEASE = "admission_report"
+# Held from the admission check until the job is enqueued
+ENQUEUE_LEASE = "admission_enqueue"
+ENQUEUE_LEASE_SECONDS = 10.0
+
+
+class Overloaded(Exception):
+    """A job refused by admission control; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Over capacity, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps the generation work taken on at once: projects running
+    (ADMISSION_MAX_ACTIVE_PROJECTS) and scenes of running projects still
+    planned or rendering (ADMISSION_MAX_PENDING_SCENES). Load is counted in
+    Mongo, so the caps hold across API replicas and workers.
+
+    Over a cap, new project jobs (see PROJECT_JOBS) are queued (workers
+    only start them once there is room, and each project gets its queue
+    position and estimated start pushed over its WebSocket) or, in
+    "reject" mode, refused with a Retry-After. Jobs are enqueued through
+    admit(), which makes the check and the insert one step.
+    Estimates assume projects start as fast as all live workers together
+    can take them; one replica at a time (holding REPORT_LEASE) sends the
+    queue updates.
+    """
+
+    def __init__(self):
+        self.replica_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.reporting = False
+        self.worker_capacity = 0
+        self.load = {"active_projects": 0, "queued_projects": 0, "pending_scenes": 0}
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self._project_seconds = settings.ADMISSION_DEFAULT_PROJECT_SECONDS
+        self._positions: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _over(value: int, cap: int) -> bool:
+        return cap > 0 and value >= cap
+
+    async def measure(self) -> Dict[str, int]:
+        running = await job_queue.running_project_ids()
+        self.load = {
+            "active_projects": await job_queue.count(PROJECT_JOBS, JobStatus.RUNNING),
+            "queued_projects": await job_queue.count(PROJECT_JOBS, JobStatus.QUEUED),
+            "pending_scenes": await scenes.count_pending(running),
+        }
+        return self.load
+
+    def at_capacity(self, load: Dict[str, int]) -> bool:
+        return (self._over(load["active_projects"], settings.ADMISSION_MAX_ACTIVE_PROJECTS)
+                or self._over(load["pending_scenes"], settings.ADMISSION_MAX_PENDING_SCENES))
+
+    async def can_start_project(self) -> bool:
+        """Whether a worker may start another queued project job now."""
+        return not self.at_capacity(await self.measure())
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Admit one project job, to be enqueued inside the block. The check
+        and the enqueue hold ENQUEUE_LEASE, so concurrent requests on any
+        replica count each other's jobs. Raises Overloaded if refused.
+        """
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + ENQUEUE_LEASE_SECONDS
+        # A crashed holder's lease runs out within the deadline
+        while not await job_queue.acquire_lease(ENQUEUE_LEASE, owner, ENQUEUE_LEASE_SECONDS):
+            if time.monotonic() > deadline:
+                raise Overloaded(1)
+            await asyncio.sleep(0.02)
+        try:
+            retry_after = await self.check()
+            if retry_after is not None:
+                raise Overloaded(retry_after)
+            yield
+        finally:
+            await job_queue.release_lease(ENQUEUE_LEASE, owner)
+
+    async def check(self) -> Optional[int]:
+        """
+        Decide on a new project job. Returns None to accept it, or the
+        number of seconds the client should wait before retrying.
+        """
+        load = await self.measure()
+        full = self._over(load["queued_projects"], settings.ADMISSION_MAX_QUEUED_PROJECTS)
+        if full or (settings.ADMISSION_MODE == "reject" and self.at_capacity(load)):
+            self.rejected += 1
+            await self._refresh_estimates()
+            return max(1, math.ceil(self._project_seconds / self._slots()))
+        if self.at_capacity(load):
+            self.queued += 1
+        else:
+            self.admitted += 1
+        return None
+
+    def _slots(self) -> int:
+        """Projects that can run at once: the jobs all live workers take
+        together, bounded by the active project cap."""
+        # No worker has registered yet (e.g. right after startup): assume one
+        capacity = self.worker_capacity or settings.WORKER_CONCURRENCY
+        if settings.ADMISSION_MAX_ACTIVE_PROJECTS > 0:
+            capacity = min(capacity, settings.ADMISSION_MAX_ACTIVE_PROJECTS)
+        return max(capacity, 1)
+
+    async def _refresh_estimates(self):
+        self.worker_capacity = await job_queue.worker_capacity()
+        durations = await job_queue.recent_durations(PROJECT_JOBS)
+        if durations:
+            self._project_seconds = sum(durations) / len(durations)
+
+    def _estimate(self, position: int, active: int) -> Optional[dict]:
+        """Queue info for the project at 1-based `position`, or None if it starts right away."""
+        slots = self._slots()
+        waiting_for = active + position - slots
+        if waiting_for <= 0 and not self._over(self.load["pending_scenes"], settings.ADMISSION_MAX_PENDING_SCENES):
+            return None
+        # Running projects finish at about `slots` per average project time
+        wait = max(waiting_for, 1) * self._project_seconds / slots
+        return {
+            "queue_position": position,
+            "estimated_wait_seconds": round(wait),
+            "estimated_start_at": datetime.utcnow() + timedelta(seconds=wait),
+        }
+
+    async def queue_status(self, project_id: str) -> Optional[dict]:
+        """Position and estimated start of a queued project; None once it is starting."""
+        queued = await job_queue.queued_project_ids(PROJECT_JOBS)
+        if project_id not in queued:
+            return None
+        await self._refresh_estimates()
+        return self._estimate(queued.index(project_id) + 1, self.load["active_projects"])
+
+    async def report(self):
+        """Push queue updates to projects whose position changed."""
+        load = await self.measure()
+        await self._refresh_estimates()
+        queued = await job_queue.queued_project_ids(PROJECT_JOBS, settings.ADMISSION_MAX_QUEUED_PROJECTS)
+        positions = {}
+        for position, project_id in enumerate(queued, start=1):
+            status = self._estimate(position, load["active_projects"])
+            if status is None:
+                continue
+            positions[project_id] = position
+            if self._positions.get(project_id) != position:
+                await manager.broadcast({"type": "queue_update", "project_id": project_id, **status}, project_id)
+        for project_id in self._positions.keys() - positions.keys():
+            # Left the queue: started (or was removed)
+            await manager.broadcast({"type": "queue_update", "project_id": project_id, "queue_position": 0}, project_id)
+        self._positions = positions
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                # Every replica sees the same queue; only the lease holder
+                # reports it, so clients get each update once
+                self.reporting = await job_queue.acquire_lease(
+                    REPORT_LEASE, self.replica_id, 3 * settings.ADMISSION_REPORT_INTERVAL
+                )
+                if self.reporting:
+                    await self.report()
+                else:
+                    # Start from scratch if the lease comes back to us
+                    self._positions = {}
+            except Exception as e:
+                print(f"Admission report failed: {e}")
+            await asyncio.sleep(settings.ADMISSION_REPORT_INTERVAL)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_active_projects": settings.ADMISSION_MAX_ACTIVE_PROJECTS,
+            "max_pending_scenes": settings.ADMISSION_MAX_PENDING_SCENES,
+            "max_queued_projects": settings.ADMISSION_MAX_QUEUED_PROJECTS,
+            **self.load,
+            "worker_capacity": self.worker_capacity,
+            "reporting": int(self.reporting),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "estimated_project_seconds": round(self._project_seconds),
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,305 @@
+import asyncio
+import json
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set
+
+from ..core.config import get_settings
+from ..core.metrics import observe, summarize
+from ..db.job_queue import job_queue
+from ..db.models import ChatMessage, ChatRole, EditStatus
+from ..db.repository import chat_messages, scenes, serialize
+from .admission import Overloaded, admission
+from .socket_manager import manager
+
+settings = get_settings()
+
+# Everything after the marker is the proposed edit, not shown to the user
+EDIT_MARKER = "<<EDIT>>"
+EDITABLE_FIELDS = ("title", "description", "visual_plan", "voiceover")
+
+CHAT_PROMPT = """You help the user refine a short video made of scenes.
+The current scenes (0-based index) are:
+
+{scenes}
+
+Answer briefly and plainly. If the user asks to change a scene, say in one
+or two sentences what you would change, then on a new line write """ + EDIT_MARKER + """
+followed by a JSON object with "scene_index" and only the fields that change
+among "title", "description", "visual_plan" and "voiceover". Propose changes
+to one scene per reply and write nothing after the JSON. The change is only
+applied once the user confirms it."""
+
+
+@lru_cache
+def get_chat_llm():
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY must be set")
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=settings.CHAT_MODEL,
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        streaming=True,
+    )
+
+
+class ReplyStream:
+    """
+    Splits a streamed reply into the visible text and the edit after
+    EDIT_MARKER. Text that could be the start of the marker is held back
+    until the next chunk shows whether it is.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._sent = 0
+
+    def feed(self, chunk: str) -> str:
+        self.text += chunk
+        marker_at = self.text.find(EDIT_MARKER)
+        if marker_at >= 0:
+            end = marker_at
+        else:
+            end = len(self.text)
+            for size in range(min(len(EDIT_MARKER) - 1, len(self.text)), 0, -1):
+                if EDIT_MARKER.startswith(self.text[-size:]):
+                    end -= size
+                    break
+        return self._advance(max(end, self._sent))
+
+    def finish(self) -> str:
+        marker_at = self.text.find(EDIT_MARKER)
+        return self._advance(marker_at if marker_at >= 0 else len(self.text))
+
+    def _advance(self, end: int) -> str:
+        delta = self.text[self._sent:end]
+        self._sent = end
+        return delta
+
+    @property
+    def visible(self) -> str:
+        marker_at = self.text.find(EDIT_MARKER)
+        return (self.text[:marker_at] if marker_at >= 0 else self.text).strip()
+
+    @property
+    def edit_text(self) -> Optional[str]:
+        marker_at = self.text.find(EDIT_MARKER)
+        return self.text[marker_at + len(EDIT_MARKER):] if marker_at >= 0 else None
+
+
+def parse_edit(text: Optional[str], scene_docs: List[dict]) -> Optional[Dict[str, Any]]:
+    """The proposed edit as {scene_id, scene_index, fields}, or None if unusable."""
+    if not text or "{" not in text:
+        return None
+    try:
+        data = json.loads(text[text.index("{"):text.rindex("}") + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    scene = next((doc for doc in scene_docs if doc["index"] == data.get("scene_index")), None)
+    fields = {
+        field: data[field].strip()
+        for field in EDITABLE_FIELDS
+        if isinstance(data.get(field), str) and data[field].strip()
+    }
+    if scene is None or not fields:
+        return None
+    return {"scene_id": str(scene["_id"]), "scene_index": scene["index"], "fields": fields}
+
+
+def _describe_scenes(scene_docs: List[dict]) -> str:
+    return "\n".join(
+        json.dumps({"index": doc["index"], **{field: doc.get(field) for field in EDITABLE_FIELDS}})
+        for doc in scene_docs
+    ) or "(no scenes yet)"
+
+
+class ChatService:
+    """
+    Chat on the project WebSocket. A user message gets a streamed reply
+    (`chat_token` deltas, then the complete `chat_message`); a reply can
+    propose a change to one scene, which the user confirms with
+    `confirm_edit` to regenerate only that scene. Messages are stored in
+    the `chat_messages` collection.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self.replies = 0
+        self.edits_applied = 0
+        self.errors = 0
+        self._first_token_seconds = deque(maxlen=1000)
+
+    def handle(self, project_id: str, raw: str):
+        """Dispatch one incoming WebSocket message without blocking the receive loop."""
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            data = {"type": "chat_message", "content": raw}
+        if not isinstance(data, dict):
+            return
+        handler = {
+            "chat_message": self.reply,
+            "confirm_edit": self.confirm_edit,
+            "dismiss_edit": self.dismiss_edit,
+        }.get(data.get("type"))
+        if handler is None:
+            return
+        task = asyncio.create_task(self._run(handler, project_id, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, handler, project_id: str, data: dict):
+        try:
+            await handler(project_id, data)
+        except Exception as e:
+            self.errors += 1
+            print(f"Chat error for project {project_id}: {e}")
+            await self._error(project_id, "Something went wrong, please try again.")
+
+    async def _error(self, project_id: str, detail: str):
+        await manager.broadcast({"type": "chat_error", "detail": detail}, project_id)
+
+    async def _publish(self, project_id: str, message: ChatMessage, message_id: str, **extra):
+        await manager.broadcast({
+            "type": "chat_message",
+            "message": {**message.model_dump(exclude={"id"}), "id": message_id, **extra},
+        }, project_id)
+
+    async def history(self, project_id: str) -> List[dict]:
+        docs = await chat_messages.recent(project_id, settings.CHAT_HISTORY_MESSAGES)
+        return [serialize(doc) for doc in docs]
+
+    async def reply(self, project_id: str, data: dict):
+        content = str(data.get("content") or "").strip()
+        if not content:
+            return
+        if len(content) > settings.CHAT_MAX_MESSAGE_CHARS:
+            await self._error(project_id, f"Messages are limited to {settings.CHAT_MAX_MESSAGE_CHARS} characters.")
+            return
+
+        started = time.perf_counter()
+        question = ChatMessage(project_id=project_id, role=ChatRole.USER, content=content)
+        answer = ChatMessage(project_id=project_id, role=ChatRole.ASSISTANT, content="")
+        # Load the context and store both messages in one round of queries,
+        # so the model request goes out as early as possible
+        history, scene_docs, question_id, answer_id = await asyncio.gather(
+            chat_messages.recent(project_id, settings.CHAT_HISTORY_MESSAGES),
+            scenes.list_for_project(project_id, {"index": 1, **{field: 1 for field in EDITABLE_FIELDS}}),
+            chat_messages.insert(question),
+            chat_messages.insert(answer),
+        )
+        await self._publish(project_id, question, question_id)
+        await self._publish(project_id, answer, answer_id, streaming=True)
+
+        prompt = [("system", CHAT_PROMPT.format(scenes=_describe_scenes(scene_docs)))]
+        for doc in history:
+            if str(doc["_id"]) not in (question_id, answer_id) and doc.get("content"):
+                prompt.append(("ai" if doc["role"] == ChatRole.ASSISTANT else "human", doc["content"]))
+        prompt.append(("human", content))
+
+        stream = ReplyStream()
+        pending = ""
+        flushed_at = None
+        ok = False
+        try:
+            # Built on first use; langchain_openai is slow to import
+            llm = await asyncio.to_thread(get_chat_llm)
+            async for chunk in llm.astream(prompt):
+                pending += stream.feed(chunk.content)
+                now = time.perf_counter()
+                if pending and (flushed_at is None or now - flushed_at >= settings.CHAT_TOKEN_FLUSH_INTERVAL):
+                    if flushed_at is None:
+                        self._first_token_seconds.append(now - started)
+                    await manager.broadcast({"type": "chat_token", "message_id": answer_id, "delta": pending}, project_id)
+                    pending = ""
+                    flushed_at = now
+            pending += stream.finish()
+            if pending:
+                await manager.broadcast({"type": "chat_token", "message_id": answer_id, "delta": pending}, project_id)
+            ok = True
+        finally:
+            answer.content = stream.visible
+            answer.edit = parse_edit(stream.edit_text, scene_docs) if ok else None
+            answer.edit_status = EditStatus.PROPOSED if answer.edit else None
+            await chat_messages.update(answer_id, {
+                "content": answer.content,
+                "edit": answer.edit,
+                "edit_status": answer.edit_status,
+            })
+            observe("chat_reply", time.perf_counter() - started, project_id, ok=ok)
+        self.replies += 1
+        await self._publish(project_id, answer, answer_id)
+
+    async def confirm_edit(self, project_id: str, data: dict):
+        message = await chat_messages.get(str(data.get("message_id")), project_id)
+        if not message or message.get("edit_status") != EditStatus.PROPOSED:
+            await self._error(project_id, "There is no pending edit to apply.")
+            return
+        edit = message["edit"]
+        scene_id = edit["scene_id"]
+        try:
+            async with admission.admit():
+                if await job_queue.has_active(project_id):
+                    await self._error(project_id, "The project is still generating; confirm the edit once it finishes.")
+                    return
+                if not await scenes.get(scene_id, project_id, {"_id": 1}):
+                    await chat_messages.update(str(message["_id"]), {"edit_status": EditStatus.DISMISSED})
+                    await self._error(project_id, "That scene no longer exists.")
+                    return
+                # Only the first confirmation applies it
+                if not await chat_messages.update_if(
+                    str(message["_id"]), {"edit_status": EditStatus.PROPOSED}, {"edit_status": EditStatus.APPLIED}
+                ):
+                    return
+
+                await scenes.update(scene_id, edit["fields"])
+                job_id = await job_queue.enqueue("regenerate_scene", project_id, {"scene_id": scene_id})
+        except Overloaded as e:
+            await self._error(project_id, f"Too many projects in progress, please retry in {e.retry_after}s.")
+            return
+        self.edits_applied += 1
+        await manager.broadcast({
+            "type": "scene_update",
+            "scene_id": scene_id,
+            **edit["fields"],
+            "status": "rendering",
+            "progress_message": "Queued for regeneration...",
+        }, project_id)
+        await manager.broadcast({
+            "type": "edit_status",
+            "message_id": str(message["_id"]),
+            "edit_status": EditStatus.APPLIED,
+            "job_id": job_id,
+        }, project_id)
+
+    async def dismiss_edit(self, project_id: str, data: dict):
+        message_id = str(data.get("message_id"))
+        if await chat_messages.update_if(
+            message_id, {"project_id": project_id, "edit_status": EditStatus.PROPOSED},
+            {"edit_status": EditStatus.DISMISSED},
+        ):
+            await manager.broadcast({
+                "type": "edit_status", "message_id": message_id, "edit_status": EditStatus.DISMISSED,
+            }, project_id)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._tasks),
+            "replies": self.replies,
+            "edits_applied": self.edits_applied,
+            "errors": self.errors,
+            "first_token_seconds": summarize(self._first_token_seconds),
+        }
+
+
+chat_service = ChatService()
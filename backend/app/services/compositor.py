@@ -0,0 +1,62 @@
+import asyncio
+import os
+import uuid
+from typing import List
+
+from .storage import media_path, media_url, storage_root
+
+
+async def run_ffmpeg(args: List[str]):
+    """Run ffmpeg quietly with `args`; raises with its stderr on failure."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg failed: {stderr.decode()}")
+
+
+class CompositorService:
+    """Joins scene clips with ffmpeg without re-encoding."""
+
+    async def concat(self, project_id: str, video_urls: List[str], name: str = "final") -> str:
+        """
+        Concatenate clips in the given order with the concat demuxer and
+        stream copy. All clips must share codecs and parameters, which holds
+        for clips from the same video model. Returns the `/media/...` URL.
+        """
+        if not video_urls:
+            raise ValueError("Nothing to concatenate")
+
+        output_dir = storage_root() / project_id
+        output_dir.mkdir(parents=True, exist_ok=True)
+        token = uuid.uuid4().hex
+        list_path = output_dir / f".concat_{token}.txt"
+        tmp_path = output_dir / f".{name}_{token}.part.mp4"
+        final_path = output_dir / f"{name}_{token}.mp4"
+
+        lines = []
+        for url in video_urls:
+            path = str(media_path(url)).replace("'", "'\\''")
+            lines.append(f"file '{path}'")
+        list_path.write_text("\n".join(lines) + "\n")
+
+        try:
+            await run_ffmpeg([
+                "-f", "concat", "-safe", "0",
+                "-i", str(list_path),
+                "-c", "copy",
+                "-movflags", "+faststart",
+                str(tmp_path),
+            ])
+            os.replace(tmp_path, final_path)
+        finally:
+            list_path.unlink(missing_ok=True)
+            tmp_path.unlink(missing_ok=True)
+
+        return media_url(final_path)
+
+
+compositor = CompositorService()
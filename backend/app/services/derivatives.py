@@ -0,0 +1,111 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict
+
+from ..core.config import get_settings
+from ..core.metrics import timed
+from ..db.models import SceneStatus
+from ..db.repository import scenes
+from .compositor import run_ffmpeg
+from .socket_manager import manager
+from .storage import media_path, media_url
+
+settings = get_settings()
+
+# name -> (file suffix, ffmpeg output options)
+DERIVATIVES = {
+    # Representative frame, for tiles and the player poster
+    "thumbnail": (".jpg", ["-vf", "thumbnail,scale=480:-2", "-frames:v", "1", "-q:v", "4"]),
+    # Short, muted, low-fps clip for hover/autoplay tiles
+    "preview": ("_preview.mp4", [
+        "-t", "3", "-an", "-vf", "fps=12,scale=320:-2",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "32", "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+    ]),
+    # Full-length low-bitrate stand-in for the original clip
+    "proxy": ("_proxy.mp4", [
+        "-vf", "scale=-2:'min(480,ih)'",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+        "-maxrate", "600k", "-bufsize", "1200k", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "64k",
+        "-movflags", "+faststart",
+    ]),
+}
+
+
+def concurrency() -> int:
+    return max(1, int((os.cpu_count() or 1) * settings.DERIVATIVES_PROCESSES_PER_CORE))
+
+
+class DerivativeService:
+    """
+    Builds a thumbnail, an animated preview and a low-bitrate proxy for each
+    finished scene clip. Each derivative is one ffmpeg process; a semaphore
+    sized to the machine bounds how many run at once, so this work runs
+    next to the generation of later scenes without starving it.
+    """
+
+    def __init__(self, max_processes: int):
+        self.max_processes = max_processes
+        self._semaphore = asyncio.Semaphore(max_processes)
+        self._tasks = set()
+        self.completed = 0
+        self.failed = 0
+
+    def schedule(self, project_id: str, scene_id: str, video_url: str):
+        """Derive in the background; the scene is updated and broadcast when done."""
+        task = asyncio.create_task(self.process_scene(project_id, scene_id, video_url))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def process_scene(self, project_id: str, scene_id: str, video_url: str):
+        try:
+            with timed("derivatives", project_id, scene_id=scene_id):
+                urls = await self.derive(video_url)
+        except Exception as e:
+            self.failed += 1
+            print(f"Derivatives for scene {scene_id} failed: {e}")
+            return
+        self.completed += 1
+
+        # Skip if the scene was regenerated while this ran
+        if not await scenes.update_if(scene_id, {"video_url": video_url}, urls):
+            return
+        await manager.broadcast({
+            "type": "scene_update",
+            "scene_id": scene_id,
+            "status": SceneStatus.READY,
+            "video_url": video_url,
+            **urls,
+        }, project_id)
+
+    async def derive(self, video_url: str) -> Dict[str, str]:
+        """Create all derivatives of one clip. Returns `<name>_url` -> URL."""
+        source = media_path(video_url)
+        names = list(DERIVATIVES)
+        paths = await asyncio.gather(*(self._derive_one(source, name) for name in names))
+        return {f"{name}_url": media_url(path) for name, path in zip(names, paths)}
+
+    async def _derive_one(self, source: Path, name: str) -> Path:
+        suffix, options = DERIVATIVES[name]
+        output = source.with_name(f"{source.stem}{suffix}")
+        tmp = output.with_name(f".{output.stem}.part{output.suffix}")
+        async with self._semaphore:
+            try:
+                await run_ffmpeg(["-i", str(source), *options, str(tmp)])
+                os.replace(tmp, output)
+            finally:
+                tmp.unlink(missing_ok=True)
+        return output
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_processes": self.max_processes,
+            "in_progress": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+derivative_service = DerivativeService(concurrency())
@@ -1,63 +1,141 @@
+import asyncio
+import importlib.util
 import os
 import uuid
 import httpx
 import aiofiles
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, List, Optional
 from ..core.config import get_settings
+from .media_cache import MediaCache, content_key
 
 settings = get_settings()
 
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+
+
 class ImageGenerationService:
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
+        self.api_url = settings.IMAGE_API_URL
         self.storage_path = Path(settings.STORAGE_DIR).resolve()
-        
-    async def generate_image(self, prompt: str, project_id: str) -> str:
+        # Identical prompts reuse the stored image instead of a new generation
+        self.cache = MediaCache(
+            self.storage_path / "_cache" / "images",
+            max_bytes=settings.IMAGE_CACHE_MAX_BYTES,
+            suffix=".png",
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(settings.IMAGE_MAX_CONCURRENCY)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client for the API and the image CDN, so connections
+        # (and their TLS handshakes) are reused across calls
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=60.0,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def generate_images(self, prompts: List[str], project_id: str) -> List[Optional[str]]:
+        """
+        Batch form of `generate_image`. Identical prompts are generated once,
+        and at most IMAGE_MAX_CONCURRENCY generations run at a time.
+        Returns one path (or None on failure) per prompt, in order.
+        """
+        unique = list(dict.fromkeys(prompts))
+        paths = await asyncio.gather(*(self.generate_image(p, project_id) for p in unique))
+        by_prompt = dict(zip(unique, paths))
+        return [by_prompt[p] for p in prompts]
+
+    async def generate_image(self, prompt: str, project_id: str) -> Optional[str]:
         """
         Generates an image using DALL-E 3 and saves it locally.
         Returns the absolute local path to the image.
         """
-        try:
-            print(f"Generating image for prompt: {prompt[:50]}...")
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.openai.com/v1/images/generations",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "dall-e-3",
-                        "prompt": prompt,
-                        "n": 1,
-                        "size": "1024x1024",
-                        "response_format": "url"
-                    },
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                image_url = data['data'][0]['url']
-                
-                # Download image
-                image_response = await client.get(image_url)
-                image_response.raise_for_status()
-                
-                # Save to storage
-                image_id = str(uuid.uuid4())
-                assets_dir = self.storage_path / project_id / "assets"
-                assets_dir.mkdir(parents=True, exist_ok=True)
-                
-                file_path = assets_dir / f"{image_id}.png"
-                
-                async with aiofiles.open(file_path, 'wb') as f:
-                    await f.write(image_response.content)
-                    
+        assets_dir = self.storage_path / project_id / "assets"
+        file_path = assets_dir / f"{uuid.uuid4()}.png"
+
+        cache_key = content_key(prompt.strip(), IMAGE_MODEL, IMAGE_SIZE)
+        if self.cache.get(cache_key, file_path):
+            return str(file_path)
+
+        # Same prompt already generating: wait for it and reuse its image
+        pending = self._inflight.get(cache_key)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if self.cache.get(cache_key, file_path):
                 return str(file_path)
-                
+
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = done
+        try:
+            async with self._semaphore:
+                print(f"Generating image for prompt: {prompt[:50]}...")
+                await self._generate(prompt, file_path)
+            self.cache.put(cache_key, file_path)
+            return str(file_path)
         except Exception as e:
             print(f"Image generation failed: {e}")
             return None
+        finally:
+            if self._inflight.get(cache_key) is done:
+                del self._inflight[cache_key]
+            done.set_result(None)
+
+    async def _generate(self, prompt: str, file_path: Path):
+        response = await self.client.post(
+            self.api_url,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": IMAGE_MODEL,
+                "prompt": prompt,
+                "n": 1,
+                "size": IMAGE_SIZE,
+                "response_format": "url"
+            },
+        )
+        response.raise_for_status()
+        image_url = response.json()['data'][0]['url']
+
+        # Stream the image to disk rather than holding it in memory
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_suffix(".part")
+        try:
+            async with self.client.stream("GET", image_url) as image_response:
+                image_response.raise_for_status()
+                async with aiofiles.open(tmp_path, 'wb') as f:
+                    async for chunk in image_response.aiter_bytes(settings.VIDEO_DOWNLOAD_CHUNK_BYTES):
+                        await f.write(chunk)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+
+@lru_cache
+def get_image_service() -> ImageGenerationService:
+    return ImageGenerationService()
 
-image_service = ImageGenerationService()
 
+async def close_image_service():
+    # Nothing to close if the service was never built
+    if get_image_service.cache_info().currsize:
+        await get_image_service().close()
@@ -1,23 +1,129 @@
 import asyncio
+import heapq
+import itertools
 import os
+import shutil
+import time
 import uuid
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, List, Optional
 from ..core.config import get_settings
+from ..core.metrics import timed
+from ..db.models import SceneStatus
+from ..db.repository import scenes
+from .manim_pool import manim_pool
+from .media_cache import MediaCache, content_key
+from .socket_manager import manager
 
 settings = get_settings()
 
+# Lower runs first when renders are waiting for a slot
+PREVIEW_PRIORITY = 0
+FINAL_PRIORITY = 10
+
+# Work dir removals run in the background; keep the tasks referenced
+_cleanup_tasks = set()
+
+
+class _PrioritySemaphore:
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+
+    @asynccontextmanager
+    async def acquire(self, priority: int = 0):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Granted just before the cancel landed: pass the slot on
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._value += 1
+
+
 class ManimService:
     def __init__(self):
-        self.semaphore = asyncio.Semaphore(3)  # Limit to 3 concurrent renders
+        self.semaphore = _PrioritySemaphore(manim_pool.size)
         # Use absolute path for storage to avoid confusion with CWD
         self.storage_path = Path(settings.STORAGE_DIR).resolve()
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        # Intermediate render trees live apart from servable project files
+        self.work_path = self.storage_path / "_work"
+        self.cache = MediaCache(
+            self.storage_path / "_cache" / "renders",
+            max_bytes=settings.MANIM_CACHE_MAX_BYTES,
+        )
+        self._sweeper: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._final_renders: Dict[str, asyncio.Task] = {}
+        self._latest_code: Dict[str, str] = {}
+
+    async def render_scene(self, code: str, scene_name: str, project_id: str, quality: str = "-ql",
+                           priority: int = PREVIEW_PRIORITY) -> str:
+        with timed("render_scene", project_id, scene_name=scene_name, quality=quality):
+            return await self._render_scene(code, scene_name, project_id, quality, priority)
+
+    async def _render_scene(self, code: str, scene_name: str, project_id: str, quality: str,
+                            priority: int) -> str:
+        self._ensure_sweeper()
+
+        # Simple heuristic to find class name
+        class_name = "Solution" # Default expectation from prompt
+        for line in code.split("\n"):
+            if line.startswith("class "):
+                class_name = line.split(" ")[1].split("(")[0].strip(":")
+                break
 
-    async def render_scene(self, code: str, scene_name: str, project_id: str) -> str:
-        async with self.semaphore:
+        render_id = str(uuid.uuid4())
+        final_path = self.storage_path / project_id / f"{scene_name}_{render_id}.mp4"
+
+        # Byte-identical code renders to the same video, skip manim entirely
+        cache_key = content_key(code, class_name, quality)
+        if self.cache.get(cache_key, final_path):
+            return f"/media/{project_id}/{final_path.name}"
+
+        # Identical code already rendering: wait for it and reuse its output
+        pending = self._inflight.get(cache_key)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if self.cache.get(cache_key, final_path):
+                return f"/media/{project_id}/{final_path.name}"
+
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = done
+        try:
+            return await self._render(code, class_name, scene_name, project_id, quality, priority,
+                                      render_id, final_path, cache_key)
+        finally:
+            if self._inflight.get(cache_key) is done:
+                del self._inflight[cache_key]
+            done.set_result(None)
+
+    async def _render(self, code: str, class_name: str, scene_name: str, project_id: str, quality: str,
+                      priority: int, render_id: str, final_path: Path, cache_key: str) -> str:
+        async with self.semaphore.acquire(priority):
             # Create unique directory for this render
-            render_id = str(uuid.uuid4())
-            work_dir = self.storage_path / project_id / render_id
+            work_dir = self.work_path / project_id / render_id
             work_dir.mkdir(parents=True, exist_ok=True)
             
             script_path = work_dir / "scene.py"
@@ -27,60 +133,183 @@ class ManimService:
             # Output directory for manim
             media_dir = work_dir / "media"
             
-            # Simple heuristic to find class name
-            class_name = "Solution" # Default expectation from prompt
-            for line in code.split("\n"):
-                if line.startswith("class "):
-                    class_name = line.split(" ")[1].split("(")[0].strip(":")
-                    break
-            
             output_filename = f"{scene_name}.mp4"
-            
-            # We run manim from work_dir, so script path should be just the filename
-            # Use absolute paths for media_dir to be safe
-            
-            cmd = [
-                "manim",
-                "-ql", # Low quality for speed
-                "--media_dir", str(media_dir.resolve()),
-                "-o", output_filename,
-                "scene.py", # Relative to CWD
-                class_name
-            ]
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=str(work_dir.resolve())
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode()
-                # Don't print enormous error logs, just the end usually matters or the whole thing if needed
-                print(f"Manim Error in {work_dir}:\n{error_msg}")
-                raise Exception(f"Manim failed: {error_msg}")
-                
-            # Locate the output file
-            # Manim output structure: media_dir/videos/scene/quality/output_filename
-            video_files = list(media_dir.glob("**/*.mp4"))
-            if not video_files:
-                raise Exception("No video file generated")
+
+            try:
+                if settings.MANIM_RENDER_MODE == "pool":
+                    await manim_pool.render(
+                        code=code,
+                        class_name=class_name,
+                        script_path=str(script_path.resolve()),
+                        media_dir=str(media_dir.resolve()),
+                        output_filename=output_filename,
+                        quality=quality,
+                    )
+                else:
+                    await self._render_subprocess(work_dir, media_dir, output_filename, class_name, quality)
+                    
+                # Locate the output file
+                # Manim output structure: media_dir/videos/scene/quality/output_filename
+                video_files = list(media_dir.glob("**/*.mp4"))
+                if not video_files:
+                    raise Exception("No video file generated")
+                    
+                video_file = video_files[0]
                 
-            video_file = video_files[0]
-            
-            # Move video to project storage root for easy serving
-            final_path = self.storage_path / project_id / f"{scene_name}_{render_id}.mp4"
-            final_path.parent.mkdir(parents=True, exist_ok=True)
-            os.rename(video_file, final_path)
-            
-            # Clean up work dir (optional, maybe keep for debugging)
-            # import shutil
-            # shutil.rmtree(work_dir)
+                # Move video to project storage root for easy serving
+                final_path.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(video_file, final_path)
+            except Exception:
+                if settings.MANIM_KEEP_FAILED_RENDERS:
+                    (work_dir / ".failed").touch()
+                    print(f"Keeping failed render dir {work_dir}")
+                else:
+                    self._remove_later(work_dir)
+                raise
+
+            self._remove_later(work_dir)
+            self.cache.put(cache_key, final_path)
             
             # Return relative URL path
             return f"/media/{project_id}/{final_path.name}"
 
-manim_service = ManimService()
+    async def render_progressive(self, code: str, scene_name: str, project_id: str, scene_id: str) -> str:
+        """
+        Two-phase render for a scene. Renders a fast MANIM_PREVIEW_QUALITY
+        preview, stores it as the scene's `video_url` and broadcasts it, then
+        re-renders at MANIM_FINAL_QUALITY in the background at lower priority.
+        The final render replaces `video_url` only if the scene's code is
+        unchanged. New code for the scene cancels its pending final render.
+        Returns the preview URL.
+        """
+        code_hash = content_key(code)
+        self._latest_code[scene_id] = code_hash
+        previous = self._final_renders.pop(scene_id, None)
+        if previous:
+            previous.cancel()
+
+        preview_url = await self.render_scene(code, scene_name, project_id, settings.MANIM_PREVIEW_QUALITY)
+        if self._latest_code.get(scene_id) != code_hash:
+            # Newer code arrived while this preview rendered
+            return preview_url
+
+        await scenes.update(scene_id, {
+            "code": code,
+            "code_hash": code_hash,
+            "video_url": preview_url,
+            "render_quality": "preview",
+            "status": SceneStatus.READY,
+        })
+        await manager.broadcast({
+            "type": "scene_update",
+            "scene_id": scene_id,
+            "status": SceneStatus.READY,
+            "video_url": preview_url,
+            "render_quality": "preview",
+        }, project_id)
+
+        self._final_renders[scene_id] = asyncio.create_task(
+            self._render_final(code, code_hash, scene_name, project_id, scene_id)
+        )
+        return preview_url
+
+    async def _render_final(self, code: str, code_hash: str, scene_name: str, project_id: str, scene_id: str):
+        try:
+            final_url = await self.render_scene(
+                code, scene_name, project_id, settings.MANIM_FINAL_QUALITY, priority=FINAL_PRIORITY
+            )
+            # Conditional on the code hash, so a newer preview is never overwritten
+            applied = await scenes.update_if(
+                scene_id,
+                {"code_hash": code_hash},
+                {"video_url": final_url, "render_quality": "final"},
+            )
+            if applied:
+                await manager.broadcast({
+                    "type": "scene_update",
+                    "scene_id": scene_id,
+                    "status": SceneStatus.READY,
+                    "video_url": final_url,
+                    "render_quality": "final",
+                }, project_id)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Final render for scene {scene_id} failed, keeping preview: {e}")
+        finally:
+            if self._final_renders.get(scene_id) is asyncio.current_task():
+                del self._final_renders[scene_id]
+                self._latest_code.pop(scene_id, None)
+
+    async def _render_subprocess(self, work_dir: Path, media_dir: Path, output_filename: str,
+                                 class_name: str, quality: str):
+        # We run manim from work_dir, so script path should be just the filename
+        # Use absolute paths for media_dir to be safe
+        cmd = [
+            "manim",
+            quality,
+            "--media_dir", str(media_dir.resolve()),
+            "-o", output_filename,
+            "scene.py", # Relative to CWD
+            class_name
+        ]
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(work_dir.resolve())
+        )
+        
+        stdout, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            error_msg = stderr.decode()
+            # Don't print enormous error logs, just the end usually matters or the whole thing if needed
+            print(f"Manim Error in {work_dir}:\n{error_msg}")
+            raise Exception(f"Manim failed: {error_msg}")
+
+    def _remove_later(self, work_dir: Path):
+        # rmtree of a media/ tree is slow enough to keep off the event loop
+        task = asyncio.create_task(asyncio.to_thread(shutil.rmtree, work_dir, True))
+        _cleanup_tasks.add(task)
+        task.add_done_callback(_cleanup_tasks.discard)
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep_work_dirs)
+            except Exception as e:
+                print(f"Render work dir sweep failed: {e}")
+            await asyncio.sleep(settings.MANIM_CLEANUP_INTERVAL)
+
+    def sweep_work_dirs(self) -> int:
+        """
+        Remove work dirs older than MANIM_WORKDIR_TTL that no render owns any
+        more (e.g. left behind by a crash). Failed renders kept for debugging
+        are marked with a `.failed` file and are left alone.
+        """
+        cutoff = time.time() - settings.MANIM_WORKDIR_TTL
+        removed = 0
+        for work_dir in self.work_path.glob("*/*"):
+            try:
+                if (work_dir / ".failed").exists() or work_dir.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(work_dir, ignore_errors=True)
+            removed += 1
+        for project_dir in self.work_path.glob("*"):
+            try:
+                project_dir.rmdir()
+            except OSError:
+                pass
+        return removed
+
+@lru_cache
+def get_manim_service() -> ManimService:
+    return ManimService()
@@ -0,0 +1,169 @@
+import asyncio
+import multiprocessing
+import os
+import traceback
+from typing import List, Optional
+
+from ..core.config import get_settings
+
+settings = get_settings()
+
+QUALITY_FLAGS = {
+    "-ql": "low_quality",
+    "-qm": "medium_quality",
+    "-qh": "high_quality",
+    "-qk": "fourk_quality",
+}
+
+
+def _render(code: str, class_name: str, script_path: str, media_dir: str, output_filename: str, quality: str):
+    from manim import tempconfig
+
+    namespace = {"__name__": "__manim_scene__", "__file__": script_path}
+    exec(compile(code, script_path, "exec"), namespace)
+    scene_class = namespace[class_name]
+
+    with tempconfig({
+        "input_file": script_path,
+        "media_dir": media_dir,
+        "output_file": output_filename,
+        "quality": QUALITY_FLAGS[quality],
+        "disable_caching": True,
+        "progress_bar": "none",
+        "verbosity": "WARNING",
+    }):
+        scene_class().render()
+
+
+def _worker_main(conn):
+    # Pay for the manim/cairo/numpy import once per worker, not per render
+    import manim  # noqa: F401
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        try:
+            _render(**request)
+            conn.send(("ok", None))
+        except BaseException:
+            conn.send(("error", traceback.format_exc()))
+
+
+class _PoolWorker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.renders = 0
+
+    def retire(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.conn.close()
+
+
+class ManimWorkerPool:
+    """
+    Long-lived manim worker processes that receive scene code over a pipe.
+
+    Workers are started lazily, replaced after MANIM_MAX_RENDERS_PER_WORKER
+    renders (manim leaks memory across scenes), and replaced immediately if
+    they crash or exceed MANIM_RENDER_TIMEOUT.
+    """
+
+    def __init__(self, size: int, max_renders_per_worker: int):
+        self.size = size
+        self.max_renders_per_worker = max_renders_per_worker
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_PoolWorker] = []
+        self.renders = 0
+        self.recycled = 0
+        self.crashed = 0
+
+    def _start(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._spawn()
+
+    def _spawn(self):
+        worker = _PoolWorker(self._context)
+        self._workers.append(worker)
+        self._idle.put_nowait(worker)
+
+    def _replace(self, worker: _PoolWorker, crashed: bool):
+        if crashed:
+            worker.kill()
+            self.crashed += 1
+        else:
+            worker.retire()
+            self.recycled += 1
+        self._workers.remove(worker)
+        self._spawn()
+
+    async def render(self, *, code: str, class_name: str, script_path: str, media_dir: str,
+                     output_filename: str, quality: str = "-ql"):
+        if self._idle is None:
+            self._start()
+
+        worker = await self._idle.get()
+        request = {
+            "code": code,
+            "class_name": class_name,
+            "script_path": script_path,
+            "media_dir": media_dir,
+            "output_filename": output_filename,
+            "quality": quality,
+        }
+        try:
+            worker.conn.send(request)
+            status, detail = await asyncio.wait_for(
+                asyncio.to_thread(worker.conn.recv), timeout=settings.MANIM_RENDER_TIMEOUT
+            )
+        except (EOFError, OSError, asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._replace(worker, crashed=True)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Exception(f"Manim worker failed: {e!r}")
+
+        worker.renders += 1
+        self.renders += 1
+        if worker.renders >= self.max_renders_per_worker:
+            self._replace(worker, crashed=False)
+        else:
+            self._idle.put_nowait(worker)
+
+        if status != "ok":
+            raise Exception(f"Manim failed: {detail}")
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.retire()
+        self._workers = []
+        self._idle = None
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "renders": self.renders,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+        }
+
+
+def pool_size() -> int:
+    return max(1, int((os.cpu_count() or 1) * settings.MANIM_WORKERS_PER_CORE))
+
+
+manim_pool = ManimWorkerPool(pool_size(), settings.MANIM_MAX_RENDERS_PER_WORKER)
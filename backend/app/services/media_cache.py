@@ -0,0 +1,115 @@
+import hashlib
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict
+
+
+def content_key(*parts: str) -> str:
+    """Stable sha256 key over an ordered tuple of strings."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def link_or_copy(source: Path, dest: Path) -> None:
+    # Hard links make a cache hit free and keep the project copy alive if the
+    # cache entry is evicted later. Fall back to a copy across filesystems.
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+
+
+class MediaCache:
+    """
+    Persistent content-addressed file cache with size-bounded LRU eviction.
+
+    Entries are plain files named `<key><suffix>` under `root`. The file mtime
+    is the LRU timestamp, so the cache survives restarts without an index.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, suffix: str = ".mp4"):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load()
+
+    def _load(self):
+        files = []
+        for path in self.root.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, path.name[: -len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def get(self, key: str, dest: Path) -> bool:
+        """Materialize the entry for `key` at `dest`. Returns False on a miss."""
+        path = self._path(key)
+        if key not in self._entries or not path.exists():
+            self._forget(key)
+            self.misses += 1
+            return False
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        link_or_copy(path, dest)
+        os.utime(path)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def put(self, key: str, source: Path) -> None:
+        """Store `source` under `key`, evicting least recently used entries."""
+        path = self._path(key)
+        tmp_path = self.root / f".{key}.{uuid.uuid4().hex}.tmp"
+        link_or_copy(source, tmp_path)
+        os.replace(tmp_path, path)
+
+        self._forget(key)
+        size = path.stat().st_size
+        self._entries[key] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+from ..core.config import get_settings
+from ..core.metrics import timed
+from ..db.models import SceneStatus
+from ..db.repository import projects, scenes
+from .compositor import run_ffmpeg
+from .socket_manager import manager
+from .storage import media_path, media_url
+
+settings = get_settings()
+
+# rendition name -> (short side in pixels, video bitrate in kbit/s); renditions
+# never upscale, so small sources end up with fewer distinct rungs
+HLS_LADDER = {
+    "720p": (720, 2500),
+    "480p": (480, 1000),
+    "360p": (360, 500),
+}
+AUDIO_BITRATE_KBPS = 96
+MASTER_PLAYLIST = "master.m3u8"
+
+
+def concurrency() -> int:
+    return max(1, int((os.cpu_count() or 1) * settings.PACKAGING_PROCESSES_PER_CORE))
+
+
+def package_dir(source: Path) -> Path:
+    """Where the HLS package of a clip lives: next to it, as `<stem>_hls/`."""
+    return source.with_name(f"{source.stem}_hls")
+
+
+def remove_package(video_url: str):
+    try:
+        shutil.rmtree(package_dir(media_path(video_url)), ignore_errors=True)
+    except ValueError:
+        pass
+
+
+class PackagingService:
+    """
+    Packages finished clips as HLS with fMP4 segments: one rendition per
+    rung of HLS_LADDER plus a master playlist. Players start after the first
+    short segment of a low rung and switch bitrate as the link allows, so
+    start time no longer grows with the length of the video. Each rendition
+    is one ffmpeg process; a semaphore bounds how many run at once.
+    """
+
+    def __init__(self, max_processes: int):
+        self.max_processes = max_processes
+        self._semaphore = asyncio.Semaphore(max_processes)
+        self._tasks = set()
+        self.completed = 0
+        self.failed = 0
+
+    def schedule_scene(self, project_id: str, scene_id: str, video_url: str):
+        """Package in the background; the scene is updated and broadcast when done."""
+        self._schedule(self._package_scene(project_id, scene_id, video_url))
+
+    def schedule_project(self, project_id: str, final_video_url: str):
+        """Same for a project's combined video."""
+        self._schedule(self._package_project(project_id, final_video_url))
+
+    def _schedule(self, coro):
+        if not settings.HLS_ENABLED:
+            coro.close()
+            return
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _package_scene(self, project_id: str, scene_id: str, video_url: str):
+        hls_url = await self._package_logged(project_id, video_url, scene_id=scene_id)
+        # Skip if the scene was regenerated while this ran
+        if hls_url is None or not await scenes.update_if(scene_id, {"video_url": video_url}, {"hls_url": hls_url}):
+            return
+        await manager.broadcast({
+            "type": "scene_update",
+            "scene_id": scene_id,
+            "status": SceneStatus.READY,
+            "video_url": video_url,
+            "hls_url": hls_url,
+        }, project_id)
+
+    async def _package_project(self, project_id: str, final_video_url: str):
+        hls_url = await self._package_logged(project_id, final_video_url)
+        # Skip if the project was recombined while this ran
+        if hls_url is None or not await projects.update_if(
+            project_id, {"final_video_url": final_video_url}, {"final_hls_url": hls_url}
+        ):
+            return
+        await manager.broadcast({
+            "type": "project_update",
+            "project_id": project_id,
+            "final_video_url": final_video_url,
+            "final_hls_url": hls_url,
+        }, project_id)
+
+    async def _package_logged(self, project_id: str, video_url: str, **details) -> Optional[str]:
+        try:
+            with timed("hls_packaging", project_id, **details):
+                hls_url = await self.package(video_url)
+        except Exception as e:
+            self.failed += 1
+            print(f"HLS packaging of {video_url} failed: {e}")
+            return None
+        self.completed += 1
+        return hls_url
+
+    async def package(self, video_url: str) -> str:
+        """Write the HLS package of one clip. Returns the master playlist URL."""
+        source = media_path(video_url)
+        output = package_dir(source)
+        # Built in a hidden directory and renamed into place once complete
+        tmp = source.with_name(f".{output.name}.part")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        try:
+            variants = await asyncio.gather(*(self._rendition(source, tmp, name) for name in HLS_LADDER))
+            (tmp / MASTER_PLAYLIST).write_text(self._master_playlist(tmp, variants))
+            shutil.rmtree(output, ignore_errors=True)
+            os.replace(tmp, output)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return media_url(output / MASTER_PLAYLIST)
+
+    async def _rendition(self, source: Path, output: Path, name: str) -> List[str]:
+        """Transcode one rung. Returns its EXT-X-STREAM-INF tag and URI."""
+        short_side, bitrate = HLS_LADDER[name]
+        rendition_dir = output / name
+        rendition_dir.mkdir()
+        segment = settings.HLS_SEGMENT_SECONDS
+        # Scale the shorter side (Sora clips are often portrait), never up
+        scale = (
+            f"scale='if(gte(iw,ih),-2,min({short_side},iw))'"
+            f":'if(gte(iw,ih),min({short_side},ih),-2)'"
+        )
+        async with self._semaphore:
+            await run_ffmpeg([
+                "-i", str(source),
+                "-map", "0:v:0", "-map", "0:a:0?",
+                "-vf", scale,
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                "-b:v", f"{bitrate}k", "-maxrate", f"{int(bitrate * 1.1)}k", "-bufsize", f"{bitrate * 2}k",
+                # Keyframe at every segment boundary so all rungs switch cleanly
+                "-force_key_frames", f"expr:gte(t,n_forced*{segment})", "-sc_threshold", "0",
+                "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE_KBPS}k",
+                "-f", "hls", "-hls_time", str(segment), "-hls_playlist_type", "vod",
+                "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+                "-hls_segment_filename", str(rendition_dir / "seg_%03d.m4s"),
+                # ffmpeg measures bandwidth, resolution and codecs into this
+                "-master_pl_name", MASTER_PLAYLIST,
+                str(rendition_dir / "index.m3u8"),
+            ])
+        lines = (rendition_dir / MASTER_PLAYLIST).read_text().splitlines()
+        (rendition_dir / MASTER_PLAYLIST).unlink()
+        stream_inf = next(line for line in lines if line.startswith("#EXT-X-STREAM-INF:"))
+        return [stream_inf, f"{name}/index.m3u8"]
+
+    def _master_playlist(self, output: Path, variants: List[List[str]]) -> str:
+        # Players start with the first variant: lowest first for a fast start
+        lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        seen = set()
+        for (stream_inf, uri), name in reversed(list(zip(variants, HLS_LADDER))):
+            resolution = next((attr for attr in stream_inf.split(",") if attr.startswith("RESOLUTION=")), None)
+            if resolution in seen:
+                # Source smaller than this rung: same picture as a cheaper one
+                shutil.rmtree(output / name)
+                continue
+            seen.add(resolution)
+            lines.extend([stream_inf, uri])
+        return "\n".join(lines) + "\n"
+
+    def stats(self):
+        return {
+            "max_processes": self.max_processes,
+            "in_progress": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+packaging_service = PackagingService(concurrency())
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime
+from typing import Callable, Optional
+
+from pymongo import ASCENDING
+
+from ..core.config import get_settings
+from ..db.database import get_database
+
+settings = get_settings()
+
+Deliver = Callable[[str, dict], None]
+
+
+class InMemoryBroker:
+    """Default backend: publishers and subscribers share one process."""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, project_id: str, message: dict):
+        if self._deliver:
+            self._deliver(project_id, message)
+
+
+class MongoChangeStreamBroker:
+    """
+    Cross-process backend. Publishing inserts into the `broadcast_events`
+    collection, and every subscribing process tails inserts with a change
+    stream and fans them out to its own sockets. Old events expire through
+    a TTL index. Change streams require MongoDB to run as a replica set (a
+    single-node replica set is enough).
+    """
+
+    COLLECTION = "broadcast_events"
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _collection(self):
+        db = await get_database()
+        return db[self.COLLECTION]
+
+    async def start(self, deliver: Deliver):
+        events = await self._collection()
+        await events.create_index(
+            [("created_at", ASCENDING)], expireAfterSeconds=settings.BROADCAST_EVENT_TTL_SECONDS
+        )
+        self._deliver = deliver
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._deliver = None
+
+    async def publish(self, project_id: str, message: dict):
+        events = await self._collection()
+        await events.insert_one({
+            "project_id": project_id,
+            "message": message,
+            "created_at": datetime.utcnow(),
+        })
+
+    async def _listen(self):
+        events = await self._collection()
+        resume_token = None
+        while True:
+            try:
+                async with events.watch(
+                    [{"$match": {"operationType": "insert"}}], resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        event = change["fullDocument"]
+                        self._deliver(event["project_id"], event["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Broadcast change stream failed, reconnecting: {e}")
+                await asyncio.sleep(1.0)
+
+
+def create_broker(name: str):
+    if name == "memory":
+        return InMemoryBroker()
+    if name == "mongo":
+        return MongoChangeStreamBroker()
+    raise ValueError(f"Unknown BROADCAST_BACKEND: {name}")
@@ -0,0 +1,152 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from ..core.config import get_settings
+from ..core.metrics import summarize
+
+
+settings = get_settings()
+
+
+class _Ticket:
+    def __init__(self, project_id: str, priority: bool, enqueued_at: float):
+        self.project_id = project_id
+        self.priority = priority
+        self.enqueued_at = enqueued_at
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class GenerationScheduler:
+    """
+    Process-wide gate in front of the video provider.
+
+    Submissions are limited by a token bucket (`rate` per second, up to
+    `burst` at once) and by `max_concurrent` jobs in flight. Waiting scenes
+    are served round-robin across projects so one large project cannot
+    starve the others, and a priority lane (interactive regenerations) is
+    always served first.
+    """
+
+    MAX_TRACKED_PROJECTS = 200
+
+    def __init__(self, rate: float, burst: int, max_concurrent: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self._tokens = float(burst)
+        self._refilled_at: Optional[float] = None
+        self._active = 0
+        self._priority: Deque[_Ticket] = deque()
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+        self._waits: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self.granted = 0
+
+    @asynccontextmanager
+    async def slot(self, project_id: str, priority: bool = False):
+        """Hold one provider job slot for the duration of the block."""
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(project_id, priority, loop.time())
+        if priority:
+            self._priority.append(ticket)
+        else:
+            self._queues.setdefault(project_id, deque()).append(ticket)
+        self._dispatch()
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                self._release()
+            else:
+                self._discard(ticket)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def _discard(self, ticket: _Ticket):
+        queue = self._priority if ticket.priority else self._queues.get(ticket.project_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+        if not ticket.priority and not self._queues.get(ticket.project_id, True):
+            del self._queues[ticket.project_id]
+
+    def _refill(self, now: float):
+        if self._refilled_at is not None:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._active < self.max_concurrent and (self._priority or self._queues):
+            now = loop.time()
+            self._refill(now)
+            if self._tokens < 1:
+                if self._retry_handle is None:
+                    delay = (1 - self._tokens) / self.rate
+                    self._retry_handle = loop.call_later(delay, self._retry)
+                return
+
+            ticket = self._next_ticket()
+            if ticket.future.done():
+                continue
+            self._tokens -= 1
+            self._active += 1
+            self.granted += 1
+            self._record_wait(ticket.project_id, now - ticket.enqueued_at)
+            ticket.future.set_result(None)
+
+    def _retry(self):
+        self._retry_handle = None
+        self._dispatch()
+
+    def _next_ticket(self) -> _Ticket:
+        if self._priority:
+            return self._priority.popleft()
+        # Round-robin: take the head of the first project's queue, then move
+        # that project to the back of the rotation.
+        project_id, queue = next(iter(self._queues.items()))
+        ticket = queue.popleft()
+        if queue:
+            self._queues.move_to_end(project_id)
+        else:
+            del self._queues[project_id]
+        return ticket
+
+    def _record_wait(self, project_id: str, wait: float):
+        waits = self._waits.get(project_id)
+        if waits is None:
+            waits = self._waits[project_id] = deque(maxlen=100)
+            if len(self._waits) > self.MAX_TRACKED_PROJECTS:
+                self._waits.popitem(last=False)
+        else:
+            self._waits.move_to_end(project_id)
+        waits.append(wait)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "active_jobs": self._active,
+            "max_concurrent_jobs": self.max_concurrent,
+            "submit_rate_per_second": self.rate,
+            "queue_depth": len(self._priority) + sum(len(q) for q in self._queues.values()),
+            "priority_queue_depth": len(self._priority),
+            "queued_by_project": {pid: len(q) for pid, q in self._queues.items()},
+            "granted": self.granted,
+            "wait_seconds_by_project": {pid: summarize(w) for pid, w in self._waits.items()},
+        }
+
+
+scheduler = GenerationScheduler(
+    rate=settings.VIDEO_SUBMIT_RATE,
+    burst=settings.VIDEO_SUBMIT_BURST,
+    max_concurrent=settings.VIDEO_MAX_CONCURRENT_JOBS,
+)
@@ -1,25 +1,155 @@
-from typing import Dict, List
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import Dict, Hashable
+
 from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+
+from ..core.config import get_settings
+from ..core.metrics import BROADCAST_MESSAGES, timed
+from .pubsub import create_broker
+
+settings = get_settings()
+
+
+class _ClientQueue:
+    """
+    Bounded outbound queue plus writer task for one WebSocket.
+
+    Progress-only `scene_update` messages for the same scene (and
+    `queue_update` messages) replace each other while still queued, since
+    only the latest one matters to the UI.
+    """
+
+    _sequence = itertools.count()
+
+    def __init__(self, websocket: WebSocket, on_drop):
+        self.websocket = websocket
+        self._on_drop = on_drop
+        self._pending: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.coalesced = 0
+        self.task = asyncio.create_task(self._run())
+
+    @staticmethod
+    def _key(message: dict) -> Hashable:
+        if message.get("type") == "scene_update" and "progress_message" in message:
+            return ("progress", message.get("scene_id"))
+        if message.get("type") == "queue_update":
+            return ("queue",)
+        return next(_ClientQueue._sequence)
+
+    def offer(self, message: dict) -> bool:
+        """Queue a message. Returns False if the client has fallen too far behind."""
+        key = self._key(message)
+        if key in self._pending:
+            self.coalesced += 1
+        elif len(self._pending) >= settings.WS_MAX_PENDING_MESSAGES:
+            return False
+        self._pending[key] = message
+        # Keep the replacement behind anything queued since the superseded one
+        self._pending.move_to_end(key)
+        self._ready.set()
+        return True
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._pending:
+                    _, message = self._pending.popitem(last=False)
+                    await asyncio.wait_for(
+                        self.websocket.send_json(message), timeout=settings.WS_SEND_TIMEOUT
+                    )
+                self._ready.clear()
+        except Exception as e:
+            print(f"Dropping WebSocket client: {e!r}")
+            self._on_drop(self)
+
+    async def close(self):
+        self.task.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(), timeout=1.0)
+        except Exception:
+            pass
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    """
+    Tracks this process's WebSockets per project. Broadcasts go through a
+    pub/sub backend so a message published in any process (API or worker)
+    reaches every subscriber of the project, wherever it is connected.
+    """
+
+    def __init__(self, broker):
+        self.active_connections: Dict[str, Dict[WebSocket, _ClientQueue]] = {}
+        self.broker = broker
+        self.dropped = 0
+
+    async def start(self):
+        """Subscribe this process to the broker so its sockets receive events."""
+        await self.broker.start(self._deliver)
+
+    async def stop(self):
+        await self.broker.stop()
 
     async def connect(self, websocket: WebSocket, project_id: str):
         await websocket.accept()
-        if project_id not in self.active_connections:
-            self.active_connections[project_id] = []
-        self.active_connections[project_id].append(websocket)
+        clients = self.active_connections.setdefault(project_id, {})
+        clients[websocket] = _ClientQueue(
+            websocket, lambda client: self._drop(client, project_id)
+        )
+
+    def send(self, websocket: WebSocket, project_id: str, message: dict):
+        """Queue a message for one of this process's sockets only."""
+        client = self.active_connections.get(project_id, {}).get(websocket)
+        if client and not client.offer(jsonable_encoder(message)):
+            self._drop(client, project_id)
 
     def disconnect(self, websocket: WebSocket, project_id: str):
-        if project_id in self.active_connections:
-            if websocket in self.active_connections[project_id]:
-                self.active_connections[project_id].remove(websocket)
+        clients = self.active_connections.get(project_id)
+        if clients is None:
+            return
+        client = clients.pop(websocket, None)
+        if client:
+            client.task.cancel()
+        if not clients:
+            del self.active_connections[project_id]
+
+    def _drop(self, client: _ClientQueue, project_id: str):
+        clients = self.active_connections.get(project_id, {})
+        if clients.get(client.websocket) is client:
+            self.dropped += 1
+            self.disconnect(client.websocket, project_id)
+            asyncio.create_task(client.close())
 
     async def broadcast(self, message: dict, project_id: str):
-        if project_id in self.active_connections:
-            for connection in self.active_connections[project_id]:
-                await connection.send_json(message)
+        BROADCAST_MESSAGES.labels(message.get("type", "unknown")).inc()
+        with timed("broadcast"):
+            await self.broker.publish(project_id, jsonable_encoder(message))
+
+    def _deliver(self, project_id: str, message: dict):
+        # Only enqueues; each connection's writer task does the sending, so a
+        # slow client never holds up the caller.
+        for client in list(self.active_connections.get(project_id, {}).values()):
+            if not client.offer(message):
+                print(f"WebSocket client for project {project_id} is too slow, dropping it")
+                self._drop(client, project_id)
+
+    def stats(self) -> Dict[str, int]:
+        clients = [c for conns in self.active_connections.values() for c in conns.values()]
+        return {
+            "connections": len(clients),
+            "projects": len(self.active_connections),
+            "queued_messages": sum(c.queued for c in clients),
+            "coalesced": sum(c.coalesced for c in clients),
+            "dropped": self.dropped,
+        }
 
-manager = ConnectionManager()
 
+manager = ConnectionManager(create_broker(settings.BROADCAST_BACKEND))
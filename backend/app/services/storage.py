@@ -0,0 +1,26 @@
+from pathlib import Path
+
+from ..core.config import get_settings
+
+settings = get_settings()
+
+MEDIA_PREFIX = "/media/"
+
+
+def storage_root() -> Path:
+    return Path(settings.STORAGE_DIR).resolve()
+
+
+def media_path(url: str) -> Path:
+    """Map a `/media/...` URL back to its file under STORAGE_DIR."""
+    if not url.startswith(MEDIA_PREFIX):
+        raise ValueError(f"Not a media URL: {url}")
+    root = storage_root()
+    path = (root / url[len(MEDIA_PREFIX):]).resolve()
+    if root not in path.parents:
+        raise ValueError(f"Media URL escapes storage: {url}")
+    return path
+
+
+def media_url(path: Path) -> str:
+    return MEDIA_PREFIX + path.resolve().relative_to(storage_root()).as_posix()
@@ -0,0 +1,204 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ..core.config import get_settings
+from ..core.metrics import summarize
+
+
+settings = get_settings()
+
+StatusCallback = Callable[[object], Awaitable[None]]
+
+
+class VideoJobFailed(RuntimeError):
+    """The provider reports the job itself as failed; `code` is its error code."""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class _TrackedJob:
+    def __init__(self, video_id: str, now: float):
+        self.video_id = video_id
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.callbacks: List[StatusCallback] = []
+        self.waiters = 0
+        self.registered_at = now
+        self.next_poll_at = now
+        self.interval = settings.VIDEO_POLL_MIN_INTERVAL
+        self.status: Optional[str] = None
+        self.progress: Optional[int] = None
+        self.polls = 0
+        self.errors = 0
+
+
+class VideoJobTracker:
+    """
+    Owns every outstanding Sora job in this process and polls them from a
+    single loop. Each job gets its own adaptive schedule: queued jobs are
+    polled slowly, running jobs are polled based on their reported progress,
+    and unchanged responses back off exponentially with jitter. Waiters are
+    woken as soon as the poll that observes completion returns.
+    """
+
+    MAX_CONSECUTIVE_ERRORS = 5
+
+    def __init__(self, client):
+        self.client = client
+        self._jobs: Dict[str, _TrackedJob] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.total_polls = 0
+        self.completed = 0
+        self.failed = 0
+        self._finished_poll_rates = deque(maxlen=500)
+        self._detection_latencies = deque(maxlen=500)
+
+    async def wait(self, video_id: str, on_status: Optional[StatusCallback] = None):
+        """Block until `video_id` completes and return the final video object."""
+        loop = asyncio.get_running_loop()
+        job = self._jobs.get(video_id)
+        if job is None:
+            job = _TrackedJob(video_id, loop.time())
+            self._jobs[video_id] = job
+        if on_status:
+            job.callbacks.append(on_status)
+        job.waiters += 1
+        self._ensure_running()
+        self._wakeup.set()
+
+        try:
+            # Shield so one cancelled waiter doesn't cancel the shared future
+            return await asyncio.shield(job.future)
+        finally:
+            job.waiters -= 1
+            if on_status in job.callbacks:
+                job.callbacks.remove(on_status)
+            if job.waiters == 0 and not job.future.done():
+                self._jobs.pop(video_id, None)
+                job.future.cancel()
+
+    def _ensure_running(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(settings.VIDEO_POLL_MAX_CONCURRENCY)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._jobs:
+            now = loop.time()
+            due = [job for job in self._jobs.values() if job.next_poll_at <= now]
+            if due:
+                await asyncio.gather(*(self._poll(job) for job in due))
+                continue
+
+            next_at = min(job.next_poll_at for job in self._jobs.values())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_at - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, job: _TrackedJob):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaphore:
+                video = await self.client.videos.retrieve(job.video_id)
+        except Exception as e:
+            job.errors += 1
+            if job.errors >= self.MAX_CONSECUTIVE_ERRORS:
+                self._finish(job, error=e)
+            else:
+                job.interval = min(job.interval * settings.VIDEO_POLL_BACKOFF, settings.VIDEO_POLL_MAX_INTERVAL)
+                job.next_poll_at = loop.time() + self._jittered(job.interval)
+            return
+
+        job.errors = 0
+        job.polls += 1
+        self.total_polls += 1
+
+        if video.status == "completed":
+            completed_at = getattr(video, "completed_at", None)
+            if completed_at:
+                self._detection_latencies.append(max(0.0, time.time() - completed_at))
+            self._finish(job, video=video)
+            return
+        if video.status == "failed":
+            error = getattr(video, "error", None)
+            message = getattr(error, "message", "Unknown error")
+            self._finish(job, error=VideoJobFailed(
+                f"Video generation failed: {message}", code=getattr(error, "code", None)
+            ))
+            return
+
+        progress = getattr(video, "progress", None)
+        changed = video.status != job.status or progress != job.progress
+        job.status = video.status
+        job.progress = progress
+
+        job.interval = self._next_interval(job, changed, loop.time())
+        job.next_poll_at = loop.time() + self._jittered(job.interval)
+
+        if changed:
+            for callback in list(job.callbacks):
+                try:
+                    await callback(video)
+                except Exception as e:
+                    print(f"Video job status callback failed: {e}")
+
+    def _next_interval(self, job: _TrackedJob, changed: bool, now: float) -> float:
+        if job.status == "queued":
+            return settings.VIDEO_POLL_QUEUED_INTERVAL
+        if not changed:
+            return min(job.interval * settings.VIDEO_POLL_BACKOFF, settings.VIDEO_POLL_MAX_INTERVAL)
+
+        # Estimate the remaining time from the progress rate so far and poll
+        # at half of it; close to the end this converges on the minimum.
+        if job.progress:
+            elapsed = now - job.registered_at
+            remaining = elapsed / job.progress * (100 - job.progress)
+            interval = remaining / 2
+        else:
+            interval = settings.VIDEO_POLL_MIN_INTERVAL
+        return max(settings.VIDEO_POLL_MIN_INTERVAL, min(interval, settings.VIDEO_POLL_MAX_INTERVAL))
+
+    def _jittered(self, interval: float) -> float:
+        jitter = settings.VIDEO_POLL_JITTER
+        return interval * random.uniform(1 - jitter, 1 + jitter)
+
+    def _finish(self, job: _TrackedJob, video=None, error: Optional[Exception] = None):
+        self._jobs.pop(job.video_id, None)
+        lifetime = asyncio.get_running_loop().time() - job.registered_at
+        if lifetime > 0:
+            self._finished_poll_rates.append(job.polls / lifetime)
+        if job.future.done():
+            return
+        if error is not None:
+            self.failed += 1
+            job.future.set_exception(error)
+        else:
+            self.completed += 1
+            job.future.set_result(video)
+
+    def stats(self) -> Dict[str, object]:
+        # asyncio's default loop clock is time.monotonic()
+        now = time.monotonic()
+        active_rates = [
+            job.polls / max(now - job.registered_at, 1e-6) for job in self._jobs.values()
+        ]
+        return {
+            "outstanding_jobs": len(self._jobs),
+            "total_polls": self.total_polls,
+            "completed": self.completed,
+            "failed": self.failed,
+            "polls_per_second_per_job": summarize(list(self._finished_poll_rates) + active_rates),
+            "detection_latency_seconds": summarize(list(self._detection_latencies)),
+        }
+
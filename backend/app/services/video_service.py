@@ -1,27 +1,126 @@
 import asyncio
+import hashlib
+import os
+import re
+import time
 import uuid
+from functools import lru_cache
+from itertools import accumulate
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 
 import aiofiles
-from openai import AsyncOpenAI
 
 from ..core.config import get_settings
+from ..core.metrics import observe, timed
+from .compositor import compositor
+from .media_cache import MediaCache, content_key
+from .scheduler import scheduler
+from .storage import media_path
+from .video_jobs import VideoJobFailed, VideoJobTracker
 
 
 settings = get_settings()
 
+# Provider job error codes that resubmitting the same prompt will not fix
+PERMANENT_JOB_ERRORS = ("moderation", "policy", "invalid")
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether retrying can succeed: network trouble, rate limits, 5xx, failed jobs."""
+    import openai
+    try:
+        from httpx2 import TransportError
+    except ImportError:
+        from httpx import TransportError
+
+    if isinstance(error, VideoJobFailed):
+        code = (error.code or "").lower()
+        return not any(marker in code for marker in PERMANENT_JOB_ERRORS)
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return isinstance(error, (TransportError, OSError, asyncio.TimeoutError))
+
+
+def needs_new_job(error: BaseException) -> bool:
+    """Whether a retry must submit a new job rather than resume the current one."""
+    import openai
+
+    return isinstance(error, (VideoJobFailed, openai.NotFoundError))
+
+
+def clip_seconds(duration: Optional[float]) -> int:
+    """Round a duration up to a clip length Sora supports (4, 8 or 12 seconds)."""
+    if not duration or duration <= 4:
+        return 4
+    if duration <= 8:
+        return 8
+    return 12
+
+
+def segment_durations(duration: Optional[float]) -> List[int]:
+    """
+    Clip lengths for consecutive segments covering `duration`: full
+    SEGMENT_MAX_SECONDS clips, then one rounded-up clip for the rest.
+    """
+    longest = clip_seconds(settings.VIDEO_SEGMENT_MAX_SECONDS)
+    remaining = duration or 0
+    durations = []
+    while remaining > longest:
+        durations.append(longest)
+        remaining -= longest
+    durations.append(clip_seconds(remaining))
+    return durations
+
+
+def split_text(text: Optional[str], durations: List[int]) -> List[str]:
+    """
+    Split `text` into consecutive chunks, one per segment, sized in
+    proportion to the segment durations. Breaks at line boundaries when the
+    text has enough lines (step-by-step plans), otherwise at sentences.
+    """
+    text = (text or "").strip()
+    units = [line.strip() for line in text.splitlines() if line.strip()]
+    if len(units) < len(durations):
+        units = [u for u in re.split(r"(?<=[.!?])\s+", text) if u]
+    total_chars = sum(len(u) for u in units) or 1
+    bounds = list(accumulate(durations))
+
+    chunks = [[] for _ in durations]
+    position = 0
+    for unit in units:
+        # Place each unit by where its middle falls on the scene's timeline
+        at = (position + len(unit) / 2) / total_chars * bounds[-1]
+        segment = next((i for i, bound in enumerate(bounds) if at < bound), len(bounds) - 1)
+        chunks[segment].append(unit)
+        position += len(unit)
+    return ["\n".join(chunk) for chunk in chunks]
+
 
 class OpenAIVideoService:
     def __init__(self) -> None:
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY must be set")
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # The SDK is slow to import; only pay for it once the service is used
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
         self.model = settings.OPENAI_VIDEO_MODEL
         self.storage_path = Path(settings.STORAGE_DIR).resolve()
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        self.cache = MediaCache(
+            self.storage_path / "_cache" / "videos",
+            max_bytes=settings.VIDEO_CACHE_MAX_BYTES,
+        )
+        self.jobs = VideoJobTracker(self.client)
+
+    async def generate_video(self, *, project_id: str, scene_index: int, **kwargs) -> str:
+        with timed("generate_video", project_id, scene_index=scene_index):
+            return await self._generate_video(project_id=project_id, scene_index=scene_index, **kwargs)
 
-    async def generate_video(
+    async def _generate_video(
         self,
         *,
         project_id: str,
@@ -32,14 +131,37 @@ class OpenAIVideoService:
         voiceover: Optional[str] = None,
         target_duration_seconds: Optional[float] = None,
         on_progress: Optional[callable] = None,
+        use_cache: bool = True,
+        priority: bool = False,
+        video_id: Optional[str] = None,
+        on_submitted: Optional[callable] = None,
+        segment: Optional[tuple] = None,
     ) -> str:
+        """
+        Generate (or fetch from the cache) one scene clip and return its URL.
+        With `video_id`, resumes that already submitted job: polls it and
+        downloads the result without creating a new one. `on_submitted` is
+        awaited with the id of a newly created job so callers can persist it.
+        `segment` is (index, count) when the clip is one part of a split scene.
+        """
+        heading = f"Scene {scene_index + 1}: {title}"
+        if segment:
+            heading += f" (part {segment[0] + 1} of {segment[1]})"
         prompt_parts = [
-            f"Scene {scene_index + 1}: {title}",
+            heading,
             "",
             "Description:",
             description or "",
         ]
 
+        if segment:
+            prompt_parts.extend([
+                "",
+                "This clip is one consecutive part of a longer continuous scene. Show only "
+                "this part of the visual plan, and keep the style, palette and subjects "
+                "consistent with the other parts.",
+            ])
+
         if visual_plan:
             prompt_parts.extend(
                 ["", "Visual plan (step by step, what the camera shows):", visual_plan]
@@ -63,59 +185,173 @@ class OpenAIVideoService:
         print("prompt to OpenAI video:", prompt)
 
         # Map to supported durations (4, 8, 12 seconds) for Sora
-        if not target_duration_seconds or target_duration_seconds <= 4:
-            seconds = 4
-        elif target_duration_seconds <= 8:
-            seconds = 8
-        else:
-            seconds = 12
+        seconds = clip_seconds(target_duration_seconds)
+
+        output_dir = self.storage_path / project_id
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        part = f"_part{segment[0]}" if segment else ""
+        filename = f"scene_{scene_index}{part}_{uuid.uuid4().hex}.mp4"
+        output_path = output_dir / filename
+
+        # Whitespace-only differences in the prompt should still hit the cache
+        cache_key = content_key(" ".join(prompt.split()), self.model, str(seconds))
+        use_cache = use_cache and settings.VIDEO_CACHE_ENABLED
+        if use_cache and self.cache.get(cache_key, output_path):
+            if on_progress:
+                await on_progress("Reusing cached video...")
+            return f"/media/{project_id}/{output_path.name}"
 
         # Sora expects seconds as a string enum: "4", "8", or "12"
         # We use manual create + poll loop to support progress updates if callback provided
         if on_progress:
-            await on_progress("Submitting generation job...")
-            
-        video = await self.client.videos.create(
-            model=self.model,
-            prompt=prompt,
-            seconds=str(seconds),
-        )
-        
-        video_id = video.id
-        while True:
-            video = await self.client.videos.retrieve(video_id)
-            if video.status == "completed":
-                break
-            if video.status == "failed":
-                message = getattr(getattr(video, "error", None), "message", "Unknown error")
-                raise RuntimeError(f"Video generation failed: {message}")
-            
-            if on_progress:
-                await on_progress(f"Generating ({video.status})...")
-            
-            await asyncio.sleep(5)
+            await on_progress("Waiting for a generation slot...")
 
-        if on_progress:
-            await on_progress("Downloading video...")
+        queued_at = time.perf_counter()
+        async with scheduler.slot(project_id, priority=priority):
+            observe("video_queue", time.perf_counter() - queued_at, project_id, scene_index=scene_index)
+            if video_id is None:
+                if on_progress:
+                    await on_progress("Submitting generation job...")
+                with timed("video_submit", project_id, scene_index=scene_index):
+                    video = await self.client.videos.create(
+                        model=self.model,
+                        prompt=prompt,
+                        seconds=str(seconds),
+                    )
+                video_id = video.id
+                if on_submitted:
+                    await on_submitted(video_id)
 
-        content = await self.client.videos.download_content(video.id, variant="video")
+            async def on_status(current):
+                if current.progress:
+                    await on_progress(f"Generating ({current.status}, {current.progress}%)...")
+                else:
+                    await on_progress(f"Generating ({current.status})...")
 
-        output_dir = self.storage_path / project_id
-        output_dir.mkdir(parents=True, exist_ok=True)
+            with timed("video_poll", project_id, scene_index=scene_index, video_id=video_id):
+                video = await self.jobs.wait(video_id, on_status=on_status if on_progress else None)
 
-        filename = f"scene_{scene_index}_{uuid.uuid4().hex}.mp4"
-        output_path = output_dir / filename
+            if on_progress:
+                await on_progress("Downloading video...")
 
-        body = content.read()
-        if asyncio.iscoroutine(body):
-            body = await body
+            with timed("video_download", project_id, scene_index=scene_index):
+                digest = await self.download(video.id, output_path)
+            print(f"Downloaded {video.id} to {output_path.name} (sha256 {digest[:12]})")
 
-        async with aiofiles.open(output_path, "wb") as f:
-            await f.write(body)
+        if use_cache:
+            self.cache.put(cache_key, output_path)
 
         return f"/media/{project_id}/{output_path.name}"
 
+    async def generate_segmented_video(
+        self,
+        *,
+        project_id: str,
+        scene_index: int,
+        visual_plan: Optional[str] = None,
+        voiceover: Optional[str] = None,
+        target_duration_seconds: Optional[float] = None,
+        on_progress: Optional[callable] = None,
+        video_ids: Optional[Dict[str, str]] = None,
+        on_submitted: Optional[callable] = None,
+        finished: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> str:
+        """
+        Generate a scene longer than one clip as consecutive segments (see
+        `segment_durations`) that run concurrently, then join them into one
+        file with stream copy, so wall time follows the longest segment.
+
+        `video_ids` maps segment numbers (as strings) to submitted jobs to
+        resume, and `on_submitted(segment, video_id)` is awaited when a
+        segment's job changes (None once a failed job must be replaced).
+        Finished segment URLs are recorded in `finished`; passing the same
+        dict again after a failure only regenerates the missing segments.
+        """
+        durations = segment_durations(target_duration_seconds)
+        count = len(durations)
+        plans = split_text(visual_plan or kwargs.get("description"), durations)
+        voiceovers = split_text(voiceover, durations) if voiceover else [None] * count
+        video_ids = {} if video_ids is None else video_ids
+        finished = {} if finished is None else finished
+
+        async def generate_segment(i: int) -> str:
+            key = str(i)
+            if key in finished:
+                return finished[key]
+            job_id = video_ids.get(key)
+
+            async def progress(message: str):
+                await on_progress(f"Part {i + 1}/{count}: {message}")
+
+            async def submitted(video_id: Optional[str]):
+                nonlocal job_id
+                job_id = video_id
+                if on_submitted:
+                    await on_submitted(key, video_id)
+
+            try:
+                url = await self.generate_video(
+                    project_id=project_id,
+                    scene_index=scene_index,
+                    # Short plans can leave a later segment without text of its own
+                    visual_plan=plans[i] or "Continue the action of the previous part.",
+                    voiceover=voiceovers[i],
+                    target_duration_seconds=durations[i],
+                    on_progress=progress if on_progress else None,
+                    video_id=job_id,
+                    on_submitted=submitted,
+                    segment=(i, count),
+                    **kwargs,
+                )
+            except Exception as e:
+                if job_id and needs_new_job(e):
+                    await submitted(None)
+                raise
+            finished[key] = url
+            return url
+
+        # Let every segment run to completion so a retry keeps the good ones
+        results = await asyncio.gather(*(generate_segment(i) for i in range(count)), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+
+        if on_progress:
+            await on_progress(f"Joining {count} parts...")
+        with timed("video_stitch", project_id, scene_index=scene_index, segments=count):
+            video_url = await compositor.concat(project_id, results, name=f"scene_{scene_index}")
+        for url in results:
+            media_path(url).unlink(missing_ok=True)
+        return video_url
+
+    async def download(self, video_id: str, output_path: Path) -> str:
+        """
+        Streams the finished video to `output_path` in fixed-size chunks so
+        peak memory per download does not depend on the clip size. The data
+        goes to a temp file in the same directory, is hashed on the way, and
+        is renamed into place only once complete. Returns the sha256 digest.
+        """
+        tmp_path = output_path.with_name(f".{output_path.name}.{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        try:
+            async with self.client.videos.with_streaming_response.download_content(
+                video_id, variant="video"
+            ) as response:
+                async with aiofiles.open(tmp_path, "wb") as f:
+                    async for chunk in response.iter_bytes(settings.VIDEO_DOWNLOAD_CHUNK_BYTES):
+                        digest.update(chunk)
+                        await f.write(chunk)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return digest.hexdigest()
+
 
-video_service = OpenAIVideoService()
+@lru_cache
+def get_video_service() -> OpenAIVideoService:
+    return OpenAIVideoService()
 
 
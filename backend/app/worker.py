@@ -0,0 +1,174 @@
+"""
+Standalone generation worker.
+
+Claims jobs from the Mongo-backed queue and runs them, so the API process
+only enqueues work. Start one or more with:
+
+    python -m app.worker
+
+Set RUN_EMBEDDED_WORKER=false on the API when running dedicated workers.
+"""
+import asyncio
+import signal
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from .core.config import get_settings
+from .db.database import db
+from .db.job_queue import job_queue
+from .db.repository import scenes as scene_repository
+from .graph.runner import regenerate_scene, run_graph, warm_up
+from .services.admission import PROJECT_JOBS, admission
+
+settings = get_settings()
+
+
+async def _run_graph_job(job: dict):
+    await run_graph(job["project_id"], job["payload"]["prompt"])
+
+
+async def _replan_job(job: dict):
+    await run_graph(job["project_id"], job["payload"]["prompt"], replan=True)
+
+
+async def _regenerate_scene_job(job: dict):
+    await regenerate_scene(job["project_id"], job["payload"]["scene_id"])
+
+
+JOB_HANDLERS: Dict[str, Callable[[dict], Awaitable[None]]] = {
+    "run_graph": _run_graph_job,
+    "regenerate_scene": _regenerate_scene_job,
+    "replan": _replan_job,
+}
+
+
+class Worker:
+    def __init__(self, concurrency: int = None):
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping: Optional[asyncio.Event] = None
+        self._registered_at: Optional[float] = None
+
+    async def run(self):
+        self._stopping = asyncio.Event()
+        print(f"Worker {self.worker_id} started (concurrency {self.concurrency})")
+        try:
+            # Pay for the service imports now rather than inside the first job
+            await asyncio.to_thread(warm_up)
+        except Exception as e:
+            print(f"Service warm-up failed: {e}")
+        while not self._stopping.is_set():
+            await self._housekeeping()
+            job = None
+            if len(self._running) < self.concurrency:
+                try:
+                    # Project jobs only start while the cluster is under its caps
+                    exclude = () if await admission.can_start_project() else PROJECT_JOBS
+                    job = await job_queue.claim(self.worker_id, exclude)
+                except Exception as e:
+                    print(f"Failed to claim job: {e}")
+
+            if job:
+                job_id = str(job["_id"])
+                self._running[job_id] = asyncio.create_task(self._process(job))
+                continue
+
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.WORKER_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _housekeeping(self):
+        # Admission estimates count the capacity of all live workers; jobs
+        # that keep killing their workers are failed once out of attempts
+        now = time.monotonic()
+        if self._registered_at is not None and now - self._registered_at < settings.JOB_HEARTBEAT_INTERVAL:
+            return
+        try:
+            await job_queue.register_worker(self.worker_id, self.concurrency)
+            self._registered_at = now
+            failed = await job_queue.fail_exhausted()
+            if failed:
+                print(f"Failed {failed} jobs whose lease expired on their last attempt")
+        except Exception as e:
+            print(f"Worker housekeeping failed: {e}")
+
+    async def stop(self):
+        """Stop claiming and hand in-flight jobs back to the queue."""
+        if self._stopping:
+            self._stopping.set()
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await job_queue.unregister_worker(self.worker_id)
+        except Exception as e:
+            print(f"Failed to unregister worker: {e}")
+
+    async def _process(self, job: dict):
+        job_id = str(job["_id"])
+        handler = JOB_HANDLERS.get(job["kind"])
+        work = asyncio.create_task(handler(job)) if handler else None
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, work)) if work else None
+        try:
+            if work is None:
+                await job_queue.fail(job_id, self.worker_id, f"Unknown job kind: {job['kind']}")
+                return
+            print(f"Worker {self.worker_id} running {job['kind']} for project {job['project_id']} "
+                  f"(attempt {job['attempts']})")
+            await work
+            await job_queue.complete(job_id, self.worker_id)
+        except asyncio.CancelledError:
+            if work:
+                work.cancel()
+            if self._stopping.is_set():
+                await job_queue.release(job_id, self.worker_id)
+            raise
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            await job_queue.fail(job_id, self.worker_id, str(e))
+        finally:
+            if heartbeat:
+                heartbeat.cancel()
+            self._running.pop(job_id, None)
+
+    async def _heartbeat(self, job_id: str, work: asyncio.Task):
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            try:
+                owned = await job_queue.heartbeat(job_id, self.worker_id)
+            except Exception as e:
+                print(f"Heartbeat for job {job_id} failed: {e}")
+                continue
+            if not owned:
+                # Another worker reclaimed it after our lease lapsed
+                print(f"Lost lease on job {job_id}, abandoning it")
+                work.cancel()
+                return
+
+
+async def main():
+    db.connect()
+    await job_queue.ensure_indexes()
+    await scene_repository.ensure_indexes()
+    worker = Worker()
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = asyncio.create_task(worker.run())
+    await stop.wait()
+    print(f"Worker {worker.worker_id} shutting down")
+    await worker.stop()
+    await runner
+    db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
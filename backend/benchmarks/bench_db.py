@@ -0,0 +1,121 @@
+"""
+Compare the per-document Mongo access patterns the API used to have with
+the batched repository calls, for projects with many scenes.
+
+Needs a MongoDB at MONGODB_URL; everything is written to a throwaway
+`<DATABASE_NAME>_bench` database which is dropped at the end.
+
+    python -m benchmarks.bench_db --scenes 30 100 --repeat 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.db import database
+from app.db.models import Project, Scene
+from app.db.repository import SCENE_LIST_PROJECTION, projects, scenes
+
+settings = get_settings()
+
+
+def make_scenes(project_id: str, count: int):
+    return [
+        Scene(
+            project_id=project_id,
+            index=i,
+            title=f"Scene {i}",
+            description="x" * 200,
+            visual_plan="y" * 1000,
+            code="z" * 4000,
+            logs=["log line"] * 50,
+        )
+        for i in range(count)
+    ]
+
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def bench(count: int, repeat: int):
+    db = await database.get_database()
+    project_id = await projects.create(Project(user_prompt="bench"))
+
+    async def insert_one_each():
+        for s in make_scenes(project_id, count):
+            doc = s.model_dump(by_alias=True)
+            del doc["_id"]
+            await db.scenes.insert_one(doc)
+
+    async def insert_many():
+        await scenes.insert_many(make_scenes(project_id, count))
+
+    old_insert = await timed(insert_one_each, repeat)
+    await db.scenes.delete_many({"project_id": project_id})
+    new_insert = await timed(insert_many, repeat)
+    await db.scenes.delete_many({"project_id": project_id})
+    await scenes.insert_many(make_scenes(project_id, count))
+
+    scene_ids = [str(s["_id"]) for s in await scenes.list_for_project(project_id, {"_id": 1})]
+    reversed_ids = scene_ids[::-1]
+
+    async def reorder_update_one_each():
+        for index, scene_id in enumerate(reversed_ids):
+            await db.scenes.update_one({"_id": ObjectId(scene_id), "project_id": project_id}, {"$set": {"index": index}})
+        await db.scenes.find({"project_id": project_id}).to_list(length=100)
+
+    async def reorder_bulk():
+        await scenes.reorder(project_id, reversed_ids)
+        await scenes.list_for_project(project_id, SCENE_LIST_PROJECTION)
+
+    async def get_old():
+        project = await db.projects.find_one({"_id": project_id})
+        if not project:
+            project = await db.projects.find_one({"_id": ObjectId(project_id)})
+        await db.scenes.find({"project_id": project_id}).to_list(length=100)
+
+    async def get_new():
+        await projects.get(project_id)
+        await scenes.list_for_project(project_id, SCENE_LIST_PROJECTION, limit=100)
+
+    results = [
+        ("insert scenes", old_insert, new_insert),
+        ("reorder + re-read", await timed(reorder_update_one_each, repeat), await timed(reorder_bulk, repeat)),
+        ("get_project", await timed(get_old, repeat), await timed(get_new, repeat)),
+    ]
+
+    await db.projects.delete_one({"_id": ObjectId(project_id)})
+    await db.scenes.delete_many({"project_id": project_id})
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", type=int, nargs="+", default=[30, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.DATABASE_NAME = f"{settings.DATABASE_NAME}_bench"
+    database.db.connect()
+    await scenes.ensure_indexes()
+    try:
+        print(f"{'scenes':>6}  {'operation':<20} {'per-doc ms':>10} {'batched ms':>10} {'speedup':>8}")
+        for count in args.scenes:
+            for name, old, new in await bench(count, args.repeat):
+                print(f"{count:>6}  {name:<20} {old:>10.2f} {new:>10.2f} {old / new:>7.1f}x")
+    finally:
+        await database.db.client.drop_database(settings.DATABASE_NAME)
+        database.db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
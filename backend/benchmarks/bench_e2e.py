@@ -0,0 +1,228 @@
+"""
+End-to-end throughput of one API node: N concurrent projects, each watched
+by M WebSocket clients, driven through the real FastAPI routes, job queue
+worker and LangGraph workflow.
+
+OpenAI is replaced by benchmarks/fake_openai.py (in a child process, with
+configurable latency and failure rate). The app needs a local MongoDB at
+MONGODB_URL; it writes to a throwaway `<DATABASE_NAME>_bench_e2e` database,
+which is dropped at the end. ffmpeg must be on PATH. Nothing touches the
+network, so this can run in CI:
+
+    python -m benchmarks.bench_e2e --projects 8 --watchers 3 --scenes 4 \\
+        --video-latency 5 --failure-rate 0.05 --json bench_e2e.json
+
+Reports time-to-first-scene (POST /projects until a watcher sees the first
+READY scene), total project time, peak RSS and event-loop lag of the app's
+loop. The WebSocket watchers share that loop, so their (small) cost is
+included in the lag figures. Provider limits such as VIDEO_SUBMIT_RATE
+apply as configured; raise them through the environment to find the
+node's ceiling rather than the provider's.
+
+For long scenes, compare VIDEO_SPLIT_LONG_SCENES=true and false with e.g.
+`--scenes 2 --scene-seconds 30`.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import tempfile
+import time
+
+from benchmarks import fake_openai
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def current_rss_mib() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Nothing listening on port {port}")
+            await asyncio.sleep(0.1)
+
+
+async def monitor_loop_lag(samples: list, interval: float = 0.05):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def watch(ws_url: str, started: float, timeout: float) -> dict:
+    import websockets
+
+    result = {"first_scene": None, "total": None, "failed_scenes": 0}
+    async with websockets.connect(ws_url) as ws:
+        async with asyncio.timeout(timeout):
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "scene_update" and "progress_message" not in message:
+                    if message.get("status") == "ready" and result["first_scene"] is None:
+                        result["first_scene"] = time.perf_counter() - started
+                    elif message.get("status") == "error":
+                        result["failed_scenes"] += 1
+                elif message.get("type") == "project_complete":
+                    result["total"] = time.perf_counter() - started
+                    return result
+    return result
+
+
+async def run_project(http, base_url: str, ws_base: str, index: int, watchers: int, timeout: float) -> dict:
+    started = time.perf_counter()
+    response = await http.post(f"{base_url}/api/projects", json={"prompt": f"Benchmark project {index}"})
+    response.raise_for_status()
+    project_id = response.json()["project_id"]
+    try:
+        results = await asyncio.gather(*(
+            watch(f"{ws_base}/api/ws/{project_id}", started, timeout) for _ in range(watchers)
+        ))
+    except TimeoutError:
+        return {"project_id": project_id, "first_scene": None, "total": None, "failed_scenes": 0,
+                "timed_out": True, "incomplete": False}
+    # Every watcher sees the same events; report the earliest delivery. A
+    # watcher whose socket closed before project_complete has no total
+    first_scenes = [r["first_scene"] for r in results if r["first_scene"] is not None]
+    totals = [r["total"] for r in results if r["total"] is not None]
+    return {
+        "project_id": project_id,
+        "first_scene": min(first_scenes) if first_scenes else None,
+        "total": min(totals) if totals else None,
+        "failed_scenes": max(r["failed_scenes"] for r in results),
+        "timed_out": False,
+        # No watcher saw the project complete
+        "incomplete": not totals,
+    }
+
+
+def fmt(summary: dict, unit: str = "s", scale: float = 1.0) -> str:
+    if not summary["count"]:
+        return "n/a"
+    return (f"p50 {summary['p50'] * scale:.2f}{unit}  p99 {summary['p99'] * scale:.2f}{unit}  "
+            f"max {summary['max'] * scale:.2f}{unit}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=4, help="concurrent projects")
+    parser.add_argument("--watchers", type=int, default=2, help="WebSocket clients per project")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-project timeout (s)")
+    parser.add_argument("--json", help="also write the results to this file")
+    fake_openai.add_arguments(parser)
+    args = parser.parse_args()
+
+    fake_port, app_port = free_port(), free_port()
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["DATABASE_NAME"] = os.environ.get("DATABASE_NAME", "cursor_video") + "_bench_e2e"
+    os.environ["STORAGE_DIR"] = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ["RUN_EMBEDDED_WORKER"] = "true"
+    # Every project must really generate, not replay earlier projects' clips
+    os.environ["VIDEO_CACHE_ENABLED"] = "false"
+
+    fake = multiprocessing.get_context("spawn").Process(
+        target=fake_openai.serve,
+        args=(fake_port, args.scenes, args.chat_latency, args.video_latency, args.failure_rate,
+              args.scene_seconds),
+        daemon=True,
+    )
+    fake.start()
+
+    import httpx
+    import uvicorn
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.core.config import get_settings
+    from app.core.metrics import summarize
+    from app.main import app
+
+    settings = get_settings()
+    probe = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=2000)
+    try:
+        await probe.admin.command("ping")
+    except Exception as e:
+        fake.terminate()
+        raise SystemExit(f"MongoDB is not reachable at {settings.MONGODB_URL}: {e}")
+    await probe.drop_database(settings.DATABASE_NAME)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    await wait_for_port(fake_port)
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    lag_samples = []
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples))
+    baseline_rss = current_rss_mib()
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=30.0) as http:
+        projects = await asyncio.gather(*(
+            run_project(http, base_url, f"ws://127.0.0.1:{app_port}", i, args.watchers, args.timeout)
+            for i in range(args.projects)
+        ))
+    elapsed = time.perf_counter() - started
+
+    lag_task.cancel()
+    await probe.drop_database(settings.DATABASE_NAME)
+    probe.close()
+    server.should_exit = True
+    await serve_task
+    fake.terminate()
+    fake.join()
+
+    first_scene = summarize(p["first_scene"] for p in projects if p["first_scene"] is not None)
+    total = summarize(p["total"] for p in projects if p["total"] is not None)
+    lag = summarize(lag_samples)
+    results = {
+        "config": vars(args),
+        "elapsed_seconds": elapsed,
+        "projects_per_minute": len(projects) / elapsed * 60,
+        "timed_out": sum(p["timed_out"] for p in projects),
+        "incomplete": sum(p["incomplete"] for p in projects),
+        "failed_scenes": sum(p["failed_scenes"] for p in projects),
+        "time_to_first_scene": first_scene,
+        "project_time": total,
+        "loop_lag": lag,
+        "rss_baseline_mib": baseline_rss,
+        "rss_peak_mib": peak_rss_mib(),
+    }
+
+    print(f"{args.projects} projects x {args.watchers} watchers, {args.scenes} scenes each, "
+          f"{elapsed:.1f}s ({results['projects_per_minute']:.1f} projects/min)")
+    print(f"  time to first scene  {fmt(first_scene)}")
+    print(f"  project time         {fmt(total)}")
+    print(f"  event-loop lag       {fmt(lag, 'ms', 1000)}")
+    print(f"  rss                  {baseline_rss:.0f} MiB after startup, {results['rss_peak_mib']:.0f} MiB peak")
+    print(f"  failed scenes {results['failed_scenes']}, timed out projects {results['timed_out']}, "
+          f"incomplete projects {results['incomplete']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
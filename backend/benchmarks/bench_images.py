@@ -0,0 +1,120 @@
+"""
+Batch image generation against a local stub of the images API: a fresh
+client per image with a buffered download (the old path) against the
+pooled client, bounded batch API and streamed download.
+
+Reports wall time, TCP connections opened and peak Python heap. Runs
+entirely offline; output goes to a temporary STORAGE_DIR.
+
+    python -m benchmarks.bench_images --images 32 --duplicates 8 --image-kb 2048
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+PORT = 8765
+
+
+def stub_app(image_bytes: int, latency: float, connections: set):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def count_connections(request: Request, call_next):
+        connections.add((request.client.host, request.client.port))
+        return await call_next(request)
+
+    @app.post("/v1/images/generations")
+    async def generate(payload: dict):
+        await asyncio.sleep(latency)
+        return {"data": [{"url": f"http://127.0.0.1:{PORT}/files/{uuid.uuid4().hex}.png"}]}
+
+    @app.get("/files/{name}")
+    async def download(name: str):
+        async def body():
+            chunk = b"\0" * (64 * 1024)
+            for _ in range(image_bytes // len(chunk)):
+                yield chunk
+        return StreamingResponse(body(), media_type="image/png")
+
+    return app
+
+
+async def legacy_generate(prompt: str, path: str, api_url: str):
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post(api_url, json={"prompt": prompt}, timeout=60.0)
+        response.raise_for_status()
+        image_response = await client.get(response.json()["data"][0]["url"])
+        image_response.raise_for_status()
+        with open(path, "wb") as f:
+            f.write(image_response.content)
+
+
+async def measure(name: str, connections: set, batch):
+    connections.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    await batch()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<8} {elapsed:6.2f}s  {len(connections):4d} connections  peak heap {peak / 1024 ** 2:6.1f} MiB")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--duplicates", type=int, default=8, help="prompts repeated within the batch")
+    parser.add_argument("--image-kb", type=int, default=2048)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub generation latency (s)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="bench_images_"))
+    os.environ["IMAGE_API_URL"] = f"http://127.0.0.1:{PORT}/v1/images/generations"
+    import uvicorn
+    from app.services.image_gen import get_image_service
+
+    image_service = get_image_service()
+    connections: set = set()
+    server = uvicorn.Server(uvicorn.Config(
+        stub_app(args.image_kb * 1024, args.latency, connections),
+        port=PORT, log_level="warning",
+    ))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    unique = args.images - args.duplicates
+    prompts = [f"diagram {i % unique}" for i in range(args.images)]
+    out_dir = tempfile.mkdtemp(prefix="bench_images_legacy_")
+
+    async def legacy_batch():
+        await asyncio.gather(*(
+            legacy_generate(p, os.path.join(out_dir, f"{i}.png"), image_service.api_url)
+            for i, p in enumerate(prompts)
+        ))
+
+    async def pooled_batch():
+        paths = await image_service.generate_images(prompts, "bench")
+        assert all(paths), "some images failed"
+
+    await measure("legacy", connections, legacy_batch)
+    await measure("pooled", connections, pooled_batch)
+    # Second batch is served from the on-disk asset cache
+    await measure("cached", connections, pooled_batch)
+
+    await image_service.close()
+    server.should_exit = True
+    await serve_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
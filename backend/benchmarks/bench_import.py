@@ -0,0 +1,82 @@
+"""
+Cold import time of the API process (`import app.main, app.worker`), which
+is what a new replica or a reloading dev server pays before it can serve.
+
+Each run is a fresh interpreter with `-X importtime`, no OPENAI_API_KEY and
+a STORAGE_DIR that does not exist: importing must neither need credentials
+nor touch the filesystem. Prints the median wall time and the slowest
+imports.
+
+    python -m benchmarks.bench_import --runs 5 --max-seconds 2.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_once(storage_dir: Path):
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    env.update(STORAGE_DIR=str(storage_dir), PYTHONPATH=str(BACKEND_DIR))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main, app.worker"],
+        env=env, cwd=storage_dir.parent, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"import failed:\n{result.stderr[-2000:]}")
+
+    # "import time: self [us] | cumulative | imported package", indented two
+    # spaces per nesting level; keep top-level modules and their direct imports
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth <= 1:
+            modules[name.strip()] = int(cumulative) / 1e6
+    return elapsed, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--max-seconds", type=float, help="fail if the median exceeds this")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_import_"))
+    storage_dir = workdir / "storage"
+    times = []
+    totals = defaultdict(list)
+    for _ in range(args.runs):
+        elapsed, modules = import_once(storage_dir)
+        times.append(elapsed)
+        for name, seconds in modules.items():
+            totals[name].append(seconds)
+
+    median = statistics.median(times)
+    print(f"import app.main, app.worker: median {median:.2f}s over {args.runs} runs "
+          f"(min {min(times):.2f}s, max {max(times):.2f}s)")
+    slowest = sorted(totals.items(), key=lambda item: -statistics.median(item[1]))
+    for name, seconds in slowest[:args.top]:
+        print(f"  {statistics.median(seconds):6.3f}s  {name}")
+
+    created = [str(p.relative_to(workdir)) for p in workdir.rglob("*")]
+    if created:
+        raise SystemExit(f"importing created files: {created}")
+    if args.max_seconds is not None and median > args.max_seconds:
+        raise SystemExit(f"median import time {median:.2f}s exceeds {args.max_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
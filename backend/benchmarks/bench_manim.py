@@ -0,0 +1,69 @@
+"""
+Per-render latency and throughput of the warm manim worker pool against
+the one-CLI-process-per-render path.
+
+Needs manim installed. Output goes to a temporary STORAGE_DIR.
+
+    python -m benchmarks.bench_manim --renders 12 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+SCENE_CODE = '''from manim import *
+
+class Solution(Scene):
+    def construct(self):
+        circle = Circle(color=BLUE)
+        self.play(Create(circle), run_time=0.5)
+        self.play(circle.animate.shift(RIGHT), run_time=0.5)
+'''
+
+
+async def run(mode: str, renders: int, concurrency: int):
+    from app.core.config import get_settings
+    from app.core.metrics import summarize
+    from app.services.manim import get_manim_service
+    from app.services.manim_pool import manim_pool
+
+    get_settings().MANIM_RENDER_MODE = mode
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            # Unique code per render so the render cache doesn't short-circuit it
+            code = f"{SCENE_CODE}\n# {mode} {i}\n"
+            await get_manim_service().render_scene(code, f"bench_{mode}_{i}", "bench")
+            latencies.append(time.perf_counter() - start)
+
+    # Warm-up render so the pool's one-off process start isn't counted
+    await one(-1)
+    latencies.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(renders)))
+    elapsed = time.perf_counter() - start
+    manim_pool.shutdown()
+
+    summary = summarize(latencies)
+    print(f"{mode:<10} p50 {summary['p50']:.2f}s  p99 {summary['p99']:.2f}s  "
+          f"{renders / elapsed * 60:.1f} renders/min")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="bench_manim_"))
+    for mode in ("subprocess", "pool"):
+        await run(mode, args.renders, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
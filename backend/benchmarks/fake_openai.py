@@ -0,0 +1,178 @@
+"""
+Local stand-in for the parts of the OpenAI API the backend uses: chat
+completions (scene planning) and the Sora videos endpoints. Latency and
+failure rate are configurable, so benchmarks run offline and repeatably.
+
+Needs ffmpeg to synthesize the clip it serves for every video.
+
+    python -m benchmarks.fake_openai --port 8900 --scenes 4 --video-latency 5
+"""
+import argparse
+import asyncio
+import email
+import json
+import random
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+
+
+def make_clip(seconds: int = 1) -> Path:
+    path = Path(tempfile.mkdtemp(prefix="fake_openai_")) / "clip.mp4"
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=24:d={seconds}",
+         "-c:v", "libx264", "-pix_fmt", "yuv420p", str(path)],
+        check=True,
+    )
+    return path
+
+
+async def read_fields(request: Request) -> dict:
+    """JSON or multipart form body (the SDK posts videos as multipart)."""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/"):
+        return json.loads(body or b"{}")
+    message = email.message_from_bytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(decode=True).decode()
+        for part in message.get_payload()
+    }
+
+
+def create_app(scenes: int, chat_latency: float, video_latency: float, failure_rate: float,
+               scene_seconds: float = 4, seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    clip = make_clip()
+    rng = random.Random(seed)
+    jobs = {}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(payload: dict):
+        plan = [
+            {
+                "title": f"Scene {i + 1}",
+                "description": f"Benchmark scene {i + 1} ({uuid.uuid4().hex[:8]})",
+                "visual_plan": "A slow pan across a test pattern.",
+                "voiceover": "This is a benchmark.",
+                "duration": scene_seconds,
+            }
+            for i in range(scenes)
+        ]
+        content = json.dumps(plan, indent=2)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = payload.get("model", "gpt-4o")
+
+        if payload.get("stream"):
+            # Tokens arrive evenly over chat_latency, like a real completion
+            pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+
+            async def events():
+                for piece in pieces:
+                    await asyncio.sleep(chat_latency / len(pieces))
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(chat_latency)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def video_object(job: dict) -> dict:
+        elapsed = time.monotonic() - job["started"]
+        # Longer clips take proportionally longer, like the real service
+        latency = video_latency * int(job["seconds"]) / 4
+        if elapsed >= latency:
+            status, progress = ("failed" if job["fails"] else "completed"), 100
+        elif elapsed < latency * 0.1:
+            status, progress = "queued", 0
+        else:
+            status, progress = "in_progress", int(100 * elapsed / latency)
+        return {
+            "id": job["id"],
+            "object": "video",
+            "created_at": job["created_at"],
+            "model": job["model"],
+            "progress": progress,
+            "seconds": job["seconds"],
+            "size": "720x1280",
+            "status": status,
+            "error": {"code": "fake_failure", "message": "Injected failure"} if status == "failed" else None,
+        }
+
+    @app.post("/v1/videos")
+    async def create_video(request: Request):
+        payload = await read_fields(request)
+        job = {
+            "id": f"video_{uuid.uuid4().hex}",
+            "started": time.monotonic(),
+            "created_at": int(time.time()),
+            "model": payload.get("model", "sora-2"),
+            "seconds": str(payload.get("seconds", "4")),
+            "fails": rng.random() < failure_rate,
+        }
+        jobs[job["id"]] = job
+        return video_object(job)
+
+    @app.get("/v1/videos/{video_id}")
+    async def retrieve_video(video_id: str):
+        if video_id not in jobs:
+            raise HTTPException(status_code=404, detail="No such video")
+        return video_object(jobs[video_id])
+
+    @app.get("/v1/videos/{video_id}/content")
+    async def download_video(video_id: str):
+        if video_id not in jobs or video_object(jobs[video_id])["status"] != "completed":
+            raise HTTPException(status_code=404, detail="Video not ready")
+        return FileResponse(clip, media_type="video/mp4")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--scenes", type=int, default=4, help="scenes per planned project")
+    parser.add_argument("--chat-latency", type=float, default=1.0,
+                        help="seconds per chat completion (spread over the tokens when streaming)")
+    parser.add_argument("--scene-seconds", type=float, default=4, help="duration of each planned scene")
+    parser.add_argument("--video-latency", type=float, default=5.0,
+                        help="seconds until a 4s video job finishes (longer clips scale up)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of video jobs that fail")
+
+
+def serve(port: int, scenes: int, chat_latency: float, video_latency: float, failure_rate: float,
+          scene_seconds: float = 4):
+    import uvicorn
+
+    uvicorn.run(create_app(scenes, chat_latency, video_latency, failure_rate, scene_seconds),
+                host="127.0.0.1", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+    serve(args.port, args.scenes, args.chat_latency, args.video_latency, args.failure_rate, args.scene_seconds)
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import pytest
+
+# Settings are read once, at the first app import: point them at a scratch
+# storage dir and a dummy key (all OpenAI traffic in tests is mocked)
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="video-platform-tests-"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+# Tests that need MongoDB use a scratch database on this server and are
+# skipped when none is reachable
+MONGODB_URL = os.environ.get("TEST_MONGODB_URL", "mongodb://localhost:27017")
+
+
+@lru_cache
+def mongod_reachable() -> bool:
+    from pymongo import MongoClient
+
+    try:
+        client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=500)
+        client.admin.command("ping")
+        client.close()
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Returns run(test): runs the async `test` against a fresh database, dropped afterwards."""
+    if not mongod_reachable():
+        pytest.skip(f"no mongod reachable at {MONGODB_URL}")
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.db import database
+
+    name = f"video_platform_test_{uuid.uuid4().hex[:8]}"
+    monkeypatch.setattr(database.settings, "DATABASE_NAME", name)
+
+    def run(test):
+        async def main():
+            database.db.client = AsyncIOMotorClient(MONGODB_URL)
+            try:
+                return await test()
+            finally:
+                await database.db.client.drop_database(name)
+                database.db.client.close()
+                database.db.client = None
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.db.job_queue import job_queue
+from app.db.models import JobStatus
+from app.services import admission as admission_module
+from app.services.admission import ENQUEUE_LEASE, AdmissionController, Overloaded
+
+
+async def _admit_and_enqueue(controller, project_id, kind="run_graph"):
+    async with controller.admit():
+        # Give concurrent admissions every chance to interleave
+        await asyncio.sleep(0.01)
+        await job_queue.enqueue(kind, project_id)
+
+
+def test_concurrent_admissions_respect_the_queue_cap(mongo, monkeypatch):
+    monkeypatch.setattr(admission_module.settings, "ADMISSION_MAX_QUEUED_PROJECTS", 2)
+
+    async def test():
+        controller = AdmissionController()
+        results = await asyncio.gather(
+            *[_admit_and_enqueue(controller, f"project-{i}") for i in range(6)],
+            return_exceptions=True,
+        )
+        assert sum(result is None for result in results) == 2
+        assert all(isinstance(result, Overloaded) for result in results if result is not None)
+        assert await job_queue.count(["run_graph"], JobStatus.QUEUED) == 2
+
+    mongo(test)
+
+
+def test_every_project_job_kind_counts(mongo, monkeypatch):
+    monkeypatch.setattr(admission_module.settings, "ADMISSION_MAX_QUEUED_PROJECTS", 2)
+
+    async def test():
+        controller = AdmissionController()
+        await _admit_and_enqueue(controller, "a", "regenerate_scene")
+        await _admit_and_enqueue(controller, "b", "replan")
+        with pytest.raises(Overloaded):
+            await _admit_and_enqueue(controller, "c", "run_graph")
+        assert controller.load["queued_projects"] == 2
+
+    mongo(test)
+
+
+def test_lease_is_released_when_the_block_fails(mongo):
+    async def test():
+        controller = AdmissionController()
+        with pytest.raises(RuntimeError):
+            async with controller.admit():
+                raise RuntimeError("enqueue failed")
+        assert await job_queue.acquire_lease(ENQUEUE_LEASE, "someone-else", 1)
+
+    mongo(test)
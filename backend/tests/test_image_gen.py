@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+
+from app.services import image_gen
+from app.services.image_gen import ImageGenerationService
+
+API_URL = "http://fake-openai.test/v1/images/generations"
+MAX_CONCURRENCY = 2
+
+
+class StubImageAPI:
+    """Image generation endpoint plus the CDN its URLs point at."""
+
+    def __init__(self):
+        self.prompts = []
+        self.downloads = 0
+        self.active = 0
+        self.max_active = 0
+
+    def image(self, name: str) -> bytes:
+        return (name.encode() + b"-png-") * 500
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            prompt = httpx.Response(200, content=request.content).json()["prompt"]
+            self.prompts.append(prompt)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            try:
+                await asyncio.sleep(0.02)
+            finally:
+                self.active -= 1
+            return httpx.Response(200, json={"data": [{"url": f"http://cdn.test/{prompt}.png"}]})
+
+        self.downloads += 1
+        data = self.image(request.url.path.strip("/").removesuffix(".png"))
+
+        async def body():
+            # Several chunks, so the download is really streamed
+            for start in range(0, len(data), 700):
+                yield data[start:start + 700]
+
+        return httpx.Response(200, headers={"content-type": "image/png"}, content=body())
+
+
+def make_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_gen.settings, "STORAGE_DIR", str(tmp_path))
+    monkeypatch.setattr(image_gen.settings, "IMAGE_API_URL", API_URL)
+    monkeypatch.setattr(image_gen.settings, "IMAGE_MAX_CONCURRENCY", MAX_CONCURRENCY)
+    monkeypatch.setattr(image_gen.settings, "VIDEO_DOWNLOAD_CHUNK_BYTES", 512)
+    api = StubImageAPI()
+    service = ImageGenerationService()
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    return service, api
+
+
+def test_generate_images_dedups_caps_concurrency_and_streams(tmp_path, monkeypatch):
+    service, api = make_service(tmp_path, monkeypatch)
+    prompts = ["sun", "moon", "sun", "tree", "river", "moon", "hill"]
+
+    paths = asyncio.run(service.generate_images(prompts, "project1"))
+
+    # One generation per distinct prompt, never more than the cap at once
+    assert sorted(api.prompts) == sorted(set(prompts))
+    assert api.max_active == MAX_CONCURRENCY
+    # One path per prompt, in order, with the streamed image on disk
+    assert len(paths) == len(prompts)
+    for prompt, path in zip(prompts, paths):
+        assert path is not None
+        assert open(path, "rb").read() == api.image(prompt)
+    assert paths[0] == paths[2] and paths[1] == paths[5]
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_second_call_reuses_disk_cache(tmp_path, monkeypatch):
+    service, api = make_service(tmp_path, monkeypatch)
+    asyncio.run(service.generate_images(["sun", "moon"], "project1"))
+    assert len(api.prompts) == 2
+
+    # A fresh service (as after a restart) finds the images in the disk cache
+    service, api = make_service(tmp_path, monkeypatch)
+    paths = asyncio.run(service.generate_images(["moon", "sun"], "project2"))
+
+    assert api.prompts == [] and api.downloads == 0
+    assert [open(p, "rb").read() for p in paths] == [api.image("moon"), api.image("sun")]
+    assert all("project2" in p for p in paths)
+    assert service.cache.hits == 2
@@ -0,0 +1,102 @@
+import asyncio
+
+from app.db import job_queue as job_queue_module
+from app.db.job_queue import job_queue
+from app.db.models import JobStatus
+
+
+def short_leases(monkeypatch, max_attempts=3):
+    monkeypatch.setattr(job_queue_module.settings, "JOB_VISIBILITY_TIMEOUT", 0.05)
+    monkeypatch.setattr(job_queue_module.settings, "JOB_MAX_ATTEMPTS", max_attempts)
+
+
+def test_claim_takes_oldest_job_once(mongo):
+    async def test():
+        await job_queue.ensure_indexes()
+        first = await job_queue.enqueue("run_graph", "p1", {"prompt": "a"})
+        await job_queue.enqueue("run_graph", "p2", {"prompt": "b"})
+
+        job = await job_queue.claim("w1")
+        assert str(job["_id"]) == first
+        assert job["status"] == JobStatus.RUNNING
+        assert job["worker_id"] == "w1" and job["attempts"] == 1
+        assert job["started_at"] is not None
+
+        other = await job_queue.claim("w2")
+        assert other["project_id"] == "p2"
+        assert await job_queue.claim("w3") is None
+
+    mongo(test)
+
+
+def test_claim_skips_excluded_kinds(mongo):
+    async def test():
+        await job_queue.enqueue("run_graph", "p1", {})
+        await job_queue.enqueue("regenerate_scene", "p2", {"scene_id": "s"})
+
+        job = await job_queue.claim("w1", exclude_kinds=("run_graph",))
+        assert job["kind"] == "regenerate_scene"
+        assert await job_queue.claim("w1", exclude_kinds=("run_graph",)) is None
+
+    mongo(test)
+
+
+def test_expired_lease_is_reclaimed(mongo, monkeypatch):
+    short_leases(monkeypatch)
+
+    async def test():
+        job_id = await job_queue.enqueue("run_graph", "p1", {})
+        await job_queue.claim("w1")
+        # Still leased: nobody else gets it
+        assert await job_queue.claim("w2") is None
+
+        await asyncio.sleep(0.1)
+        job = await job_queue.claim("w2")
+        assert str(job["_id"]) == job_id
+        assert job["worker_id"] == "w2" and job["attempts"] == 2
+        # The first worker finds out on its next heartbeat
+        assert not await job_queue.heartbeat(job_id, "w1")
+        assert await job_queue.heartbeat(job_id, "w2")
+
+    mongo(test)
+
+
+def test_job_out_of_attempts_is_not_reclaimed_and_fails(mongo, monkeypatch):
+    short_leases(monkeypatch, max_attempts=2)
+
+    async def test():
+        job_id = await job_queue.enqueue("run_graph", "p1", {})
+        for worker in ("w1", "w2"):
+            assert await job_queue.claim(worker) is not None
+            # The worker dies without completing or failing the job
+            await asyncio.sleep(0.1)
+
+        assert await job_queue.claim("w3") is None
+        assert await job_queue.fail_exhausted() == 1
+        jobs = await job_queue._collection()
+        job = await jobs.find_one({})
+        assert str(job["_id"]) == job_id
+        assert job["status"] == JobStatus.FAILED and job["attempts"] == 2
+        assert await job_queue.fail_exhausted() == 0
+
+    mongo(test)
+
+
+def test_failed_job_is_retried_until_max_attempts(mongo, monkeypatch):
+    short_leases(monkeypatch, max_attempts=2)
+    monkeypatch.setattr(job_queue_module.settings, "JOB_RETRY_DELAY", 0)
+
+    async def test():
+        job_id = await job_queue.enqueue("run_graph", "p1", {})
+        await job_queue.claim("w1")
+        await job_queue.fail(job_id, "w1", "boom")
+        job = await job_queue.claim("w1")
+        assert job["status"] == JobStatus.RUNNING and job["attempts"] == 2
+
+        await job_queue.fail(job_id, "w1", "boom again")
+        assert await job_queue.claim("w1") is None
+        jobs = await job_queue._collection()
+        job = await jobs.find_one({})
+        assert job["status"] == JobStatus.FAILED and job["last_error"] == "boom again"
+
+    mongo(test)
@@ -0,0 +1,116 @@
+from app.db.models import Project, ProjectStatus, Scene, SceneStatus
+from app.db.repository import projects, scenes
+from app.graph import nodes, runner
+from app.services.storage import media_path
+
+
+class FailingVideoService:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_video(self, **kwargs):
+        self.calls += 1
+        # Not transient: no retries
+        raise ValueError("invalid prompt")
+
+
+class VideoService:
+    async def generate_video(self, project_id, scene_index, **kwargs):
+        return f"/media/{project_id}/scene_{scene_index}_v2.mp4"
+
+
+def test_failed_regenerate_keeps_clip_and_final_video(mongo, monkeypatch):
+    broadcasts = []
+    concats = []
+
+    async def broadcast(message, project_id):
+        broadcasts.append(message)
+
+    async def concat(*args, **kwargs):
+        concats.append(args)
+        return "/media/should-not-be-used.mp4"
+
+    video_service = FailingVideoService()
+    monkeypatch.setattr(nodes, "get_video_service", lambda: video_service)
+    monkeypatch.setattr(nodes.manager, "broadcast", broadcast)
+    monkeypatch.setattr(nodes.compositor, "concat", concat)
+
+    async def test():
+        project_id = await projects.create(Project(user_prompt="p", target_duration=8))
+        final_url = f"/media/{project_id}/final.mp4"
+        final_file = media_path(final_url)
+        final_file.parent.mkdir(parents=True, exist_ok=True)
+        final_file.write_bytes(b"final video")
+        await projects.update(project_id, {
+            "status": ProjectStatus.READY,
+            "final_video_url": final_url,
+            "final_hls_url": f"/media/{project_id}/final_hls/master.m3u8",
+        })
+        scene_ids = await scenes.insert_many([
+            Scene(project_id=project_id, index=i, title=f"T{i}", description="d", status=SceneStatus.READY,
+                  video_url=f"/media/{project_id}/scene_{i}.mp4", hls_url=f"/media/{project_id}/scene_{i}_hls/master.m3u8",
+                  duration=4)
+            for i in range(2)
+        ])
+
+        await runner.regenerate_scene(project_id, scene_ids[0])
+
+        assert video_service.calls == 1
+        scene = await scenes.get(scene_ids[0])
+        assert scene["status"] == SceneStatus.READY
+        assert scene["video_url"] == f"/media/{project_id}/scene_0.mp4"
+        assert scene["hls_url"] == f"/media/{project_id}/scene_0_hls/master.m3u8"
+        assert scene["regenerate_error"] == "invalid prompt"
+
+        # Nothing changed, so the project is not recombined
+        assert concats == []
+        project = await projects.get(project_id)
+        assert project["status"] == ProjectStatus.READY
+        assert project["final_video_url"] == final_url
+        assert project["final_hls_url"] == f"/media/{project_id}/final_hls/master.m3u8"
+        assert final_file.read_bytes() == b"final video"
+
+        update = [m for m in broadcasts if m["type"] == "scene_update" and "progress_message" not in m][-1]
+        assert update["status"] == SceneStatus.READY
+        assert update["video_url"] == f"/media/{project_id}/scene_0.mp4"
+        assert update["regenerate_error"] == "invalid prompt"
+
+    mongo(test)
+
+
+def test_regenerate_clears_renditions_of_the_old_clip(mongo, monkeypatch):
+    broadcasts = []
+    scheduled = []
+
+    async def broadcast(message, project_id):
+        broadcasts.append(message)
+
+    monkeypatch.setattr(nodes, "get_video_service", lambda: VideoService())
+    monkeypatch.setattr(nodes.manager, "broadcast", broadcast)
+    monkeypatch.setattr(nodes.derivative_service, "schedule", lambda *args: scheduled.append(args))
+    monkeypatch.setattr(nodes.packaging_service, "schedule_scene", lambda *args: scheduled.append(args))
+
+    async def test():
+        project_id = await projects.create(Project(user_prompt="p", target_duration=4))
+        old_url = f"/media/{project_id}/scene_0.mp4"
+        [scene_id] = await scenes.insert_many([
+            Scene(project_id=project_id, index=0, title="T0", description="d", status=SceneStatus.READY,
+                  video_url=old_url, thumbnail_url=old_url + ".jpg", preview_url=old_url + ".gif",
+                  proxy_url=old_url + ".proxy.mp4", hls_url=old_url + ".m3u8", duration=4)
+        ])
+
+        doc = await scenes.get(scene_id)
+        await nodes.generate_and_render_scene({**nodes.scene_spec_from_doc(doc), "regenerate": True})
+
+        new_url = f"/media/{project_id}/scene_0_v2.mp4"
+        scene = await scenes.get(scene_id)
+        assert scene["video_url"] == new_url
+        for field in ("thumbnail_url", "preview_url", "proxy_url", "hls_url"):
+            assert scene[field] is None
+        assert scheduled == [(project_id, scene_id, new_url)] * 2
+
+        update = [m for m in broadcasts if m["type"] == "scene_update" and "progress_message" not in m][-1]
+        assert update["video_url"] == new_url
+        assert update["thumbnail_url"] is None and update["proxy_url"] is None
+
+    mongo(test)
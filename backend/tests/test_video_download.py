@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app.services import video_service
+from app.services.video_service import OpenAIVideoService
+
+CHUNK_BYTES = 1024
+VIDEO = bytes(range(256)) * 37  # 9472 bytes: several chunks, the last one short
+
+
+def make_service(tmp_path, monkeypatch, body):
+    """A video service whose content endpoint streams `body` (an async iterator factory)."""
+    monkeypatch.setattr(video_service.settings, "STORAGE_DIR", str(tmp_path))
+    monkeypatch.setattr(video_service.settings, "VIDEO_DOWNLOAD_CHUNK_BYTES", CHUNK_BYTES)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, headers={"content-type": "video/mp4"}, content=body())
+
+    service = OpenAIVideoService()
+    service.client = AsyncOpenAI(
+        api_key="test-key",
+        base_url="http://fake-openai.test/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        max_retries=0,
+    )
+    return service, requests
+
+
+def record_writes(monkeypatch):
+    """Wrap aiofiles.open in video_service to record the size of each write."""
+    writes = []
+    real_open = video_service.aiofiles.open
+
+    class Recorder:
+        def __init__(self, *args, **kwargs):
+            self._context = real_open(*args, **kwargs)
+
+        async def __aenter__(self):
+            file = await self._context.__aenter__()
+            real_write = file.write
+
+            async def write(data):
+                writes.append(len(data))
+                return await real_write(data)
+
+            file.write = write
+            return file
+
+        async def __aexit__(self, *exc):
+            return await self._context.__aexit__(*exc)
+
+    monkeypatch.setattr(video_service.aiofiles, "open", Recorder)
+    return writes
+
+
+def test_download_streams_chunks_and_renames_into_place(tmp_path, monkeypatch):
+    output = tmp_path / "scene_0.mp4"
+    seen_during_stream = []
+
+    async def body():
+        for start in range(0, len(VIDEO), 1000):
+            yield VIDEO[start:start + 1000]
+            # Mid-stream the data is only in the hidden temp file
+            seen_during_stream.append((output.exists(), [p.name for p in tmp_path.glob(".*.part")]))
+
+    service, requests = make_service(tmp_path, monkeypatch, body)
+    writes = record_writes(monkeypatch)
+
+    digest = asyncio.run(service.download("video_123", output))
+
+    assert requests[0].url.path == "/v1/videos/video_123/content"
+    assert requests[0].url.params["variant"] == "video"
+    assert digest == hashlib.sha256(VIDEO).hexdigest()
+    assert output.read_bytes() == VIDEO
+    assert sum(writes) == len(VIDEO)
+    assert len(writes) > 1 and max(writes) <= CHUNK_BYTES
+    assert all(not final_exists for final_exists, _ in seen_during_stream)
+    assert all(parts and parts[0].startswith(".scene_0.mp4.") for _, parts in seen_during_stream)
+    assert not list(tmp_path.glob("*.part")) and not list(tmp_path.glob(".*.part"))
+
+
+def test_download_failure_midway_removes_part_file(tmp_path, monkeypatch):
+    output = tmp_path / "scene_1.mp4"
+
+    async def body():
+        yield VIDEO[:3000]
+        raise httpx.ReadError("connection reset")
+
+    service, _ = make_service(tmp_path, monkeypatch, body)
+    writes = record_writes(monkeypatch)
+
+    with pytest.raises(httpx.ReadError):
+        asyncio.run(service.download("video_456", output))
+
+    assert writes, "some data should have been written before the failure"
+    assert not output.exists()
+    assert not list(tmp_path.glob(".*.part"))
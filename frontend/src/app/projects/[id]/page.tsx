@@ -2,12 +2,13 @@
 
 import { useEffect } from 'react';
 import { useParams } from 'next/navigation';
-import { getProject } from '@/lib/api';
+import { getChat, getProject } from '@/lib/api';
 import { useProjectStore } from '@/lib/store';
 import { useProjectSocket } from '@/hooks/use-project-socket';
 // Use the wrapper to provide ReactFlow context
 import WorkflowVisualizer from '@/components/WorkflowVisualizerWrapper';
 import VideoPlayer from '@/components/VideoPlayer';
+import ChatPanel from '@/components/ChatPanel';
 import { Badge } from '@/components/ui/badge';
 import { Separator } from '@/components/ui/separator';
 import { Loader2 } from 'lucide-react';
@@ -23,10 +24,10 @@ const STATUS_LABELS: Record<string, string> = {
 export default function ProjectWorkspace() {
   const params = useParams();
   const projectId = params.id as string;
-  const { setProject, setScenes, project, scenes } = useProjectStore();
+  const { setProject, setScenes, setMessages, project, scenes } = useProjectStore();
   
   // Connect Socket
-  useProjectSocket(projectId);
+  const send = useProjectSocket(projectId);
 
   // Initial Fetch
   useEffect(() => {
@@ -35,8 +36,9 @@ export default function ProjectWorkspace() {
         setProject(data.project);
         setScenes(data.scenes);
       });
+      getChat(projectId).then(data => setMessages(data.messages)).catch(() => {});
     }
-  }, [projectId, setProject, setScenes]);
+  }, [projectId, setProject, setScenes, setMessages]);
 
   if (!project) {
       return (
@@ -119,6 +121,11 @@ export default function ProjectWorkspace() {
                                     </Badge>
                                 </div>
                                 <p className="text-xs text-muted-foreground line-clamp-2">{s.description}</p>
+                                {s.regenerate_error && (
+                                    <p className="mt-1 text-[10px] text-red-600 line-clamp-2" title={s.regenerate_error}>
+                                        Regenerate failed, keeping the previous clip: {s.regenerate_error}
+                                    </p>
+                                )}
                                 {(s.status === 'rendering' || s.status === 'generating_assets') && s.progress_message && (
                                     <div className="mt-2 text-[10px] text-blue-600 animate-pulse font-medium bg-blue-50 px-2 py-1 rounded">
                                         {s.progress_message}
@@ -129,6 +136,13 @@ export default function ProjectWorkspace() {
                     ))}
                 </div>
             </div>
+
+            <div className="h-80 border-t p-4 bg-card flex flex-col">
+                <h2 className="font-semibold mb-3 text-sm text-muted-foreground uppercase tracking-wider">Chat</h2>
+                <div className="flex-1 min-h-0">
+                    <ChatPanel send={send} />
+                </div>
+            </div>
         </div>
       </div>
     </div>
@@ -0,0 +1,96 @@
+"use client";
+
+import { useEffect, useRef, useState } from 'react';
+import { useProjectStore } from '@/lib/store';
+import type { ChatMessage } from '@/lib/api';
+import { Button } from '@/components/ui/button';
+import { Textarea } from '@/components/ui/textarea';
+import { Send, Check, X } from 'lucide-react';
+
+interface ChatPanelProps {
+  // Sends a message over the project WebSocket; false if it is not connected
+  send: (message: Record<string, unknown>) => boolean;
+}
+
+function EditProposal({ message, send }: { message: ChatMessage } & ChatPanelProps) {
+  const edit = message.edit;
+  if (!edit) return null;
+
+  return (
+      <div className="mt-2 border rounded-md bg-white p-2 text-xs space-y-1">
+          <div className="font-medium">Change to scene {edit.scene_index + 1}</div>
+          {Object.entries(edit.fields).map(([field, value]) => (
+              <div key={field}>
+                  <span className="text-muted-foreground">{field.replace('_', ' ')}: </span>{value}
+              </div>
+          ))}
+          {message.edit_status === 'proposed' ? (
+              <div className="flex gap-2 pt-1">
+                  <Button size="sm" className="h-7" onClick={() => send({ type: 'confirm_edit', message_id: message.id })}>
+                      <Check className="w-3 h-3 mr-1" /> Apply &amp; regenerate
+                  </Button>
+                  <Button size="sm" variant="ghost" className="h-7" onClick={() => send({ type: 'dismiss_edit', message_id: message.id })}>
+                      <X className="w-3 h-3 mr-1" /> Dismiss
+                  </Button>
+              </div>
+          ) : (
+              <div className="text-muted-foreground italic">
+                  {message.edit_status === 'applied' ? 'Applied, scene is regenerating' : 'Dismissed'}
+              </div>
+          )}
+      </div>
+  );
+}
+
+export default function ChatPanel({ send }: ChatPanelProps) {
+  const { messages, chatError } = useProjectStore();
+  const [draft, setDraft] = useState('');
+  const bottomRef = useRef<HTMLDivElement>(null);
+
+  useEffect(() => {
+      bottomRef.current?.scrollIntoView({ block: 'end' });
+  }, [messages]);
+
+  const submit = () => {
+      const content = draft.trim();
+      if (!content) return;
+      if (send({ type: 'chat_message', content })) setDraft('');
+  };
+
+  return (
+      <div className="flex flex-col h-full">
+          <div className="flex-1 overflow-y-auto space-y-2 text-sm">
+              {messages.length === 0 && (
+                  <p className="text-xs text-muted-foreground">Ask for changes, e.g. "make scene 2 take place at night".</p>
+              )}
+              {messages.map((m) => (
+                  <div key={m.id} className={`rounded-lg px-3 py-2 ${m.role === 'user' ? 'bg-blue-50 ml-6' : 'bg-muted/60 mr-6'}`}>
+                      <div className="whitespace-pre-wrap">
+                          {m.content || (m.streaming ? <span className="text-muted-foreground animate-pulse">Thinking...</span> : null)}
+                      </div>
+                      <EditProposal message={m} send={send} />
+                  </div>
+              ))}
+              <div ref={bottomRef} />
+          </div>
+          {chatError && <p className="text-xs text-red-600 mt-2">{chatError}</p>}
+          <div className="flex gap-2 mt-2">
+              <Textarea
+                  value={draft}
+                  onChange={(e) => setDraft(e.target.value)}
+                  onKeyDown={(e) => {
+                      if (e.key === 'Enter' && !e.shiftKey) {
+                          e.preventDefault();
+                          submit();
+                      }
+                  }}
+                  placeholder="Describe a change..."
+                  className="min-h-10 text-sm"
+              />
+              <Button size="icon" onClick={submit} disabled={!draft.trim()}>
+                  <Send className="w-4 h-4" />
+              </Button>
+          </div>
+      </div>
+  );
+}
@@ -18,16 +18,19 @@ const STARTER_PROMPTS = [
 export default function ProjectWizard() {
   const [prompt, setPrompt] = useState('');
   const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
   const router = useRouter();
 
   const handleSubmit = async (text: string) => {
     if (!text.trim()) return;
     setLoading(true);
+    setError(null);
     try {
       const { project_id } = await createProject(text);
       router.push(`/projects/${project_id}`);
     } catch (e) {
       console.error(e);
+      setError(e instanceof Error ? e.message : "Failed to create project");
       setLoading(false);
     }
   };
@@ -63,6 +66,7 @@ export default function ProjectWizard() {
             </>
           ) : "Generate Video"}
         </Button>
+        {error && <p className="text-sm text-red-600 text-center">{error}</p>}
       </div>
 
       <div className="space-y-3">
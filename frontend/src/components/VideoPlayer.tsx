@@ -2,12 +2,13 @@
 
 import { useState, useEffect, useRef, useMemo } from 'react';
 import { useProjectStore } from '@/lib/store';
+import type { Scene } from '@/lib/api';
 import { Play, Pause, SkipForward, SkipBack, Maximize2, Minimize2 } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { Slider } from '@/components/ui/slider';
 
 export default function VideoPlayer() {
-  const { scenes } = useProjectStore();
+  const { scenes, project } = useProjectStore();
   const sortedScenes = [...scenes].sort((a, b) => a.index - b.index);
 
   const [isPlaying, setIsPlaying] = useState(false);
@@ -60,13 +61,29 @@ export default function VideoPlayer() {
   
   const API_BASE = process.env.NEXT_PUBLIC_API_URL?.replace("/api", "") || "http://localhost:8000";
 
+  // Prefer the HLS package where the browser plays HLS natively: playback
+  // starts after the first segment instead of after buffering the MP4.
+  // Only use it if it was packaged from the current clip.
+  const canPlayHls = useMemo(
+      () => typeof document !== 'undefined' &&
+          document.createElement('video').canPlayType('application/vnd.apple.mpegurl') !== '',
+      []
+  );
+  const sourceUrl = (scene: Scene) => {
+      const packagedFrom = scene.video_url?.replace(/\.mp4$/, '_hls/');
+      if (canPlayHls && scene.hls_url && packagedFrom && scene.hls_url.startsWith(packagedFrom)) {
+          return scene.hls_url;
+      }
+      return scene.video_url;
+  };
+
   // Sync Video Element with Global State
   useEffect(() => {
       if (videoRef.current && currentScene && currentScene.video_url) {
           const video = videoRef.current;
           
           const currentSrc = video.getAttribute('src');
-          const newSrc = `${API_BASE}${currentScene.video_url}`;
+          const newSrc = `${API_BASE}${sourceUrl(currentScene)}`;
           
           if (currentSrc !== newSrc) {
               video.src = newSrc;
@@ -80,7 +97,7 @@ export default function VideoPlayer() {
               }
           }
       }
-  }, [currentScene, localTime, isPlaying, API_BASE]); // Add API_BASE dependency
+  }, [currentScene, localTime, isPlaying, API_BASE, canPlayHls]); // Add API_BASE dependency
 
   // Handle Time Update from Video
   const handleTimeUpdate = () => {
@@ -159,7 +176,9 @@ export default function VideoPlayer() {
                   />
               ) : (
                   <div className="text-white text-sm text-center px-4">
-                      {sortedScenes.length > 0 ? "Waiting for renders..." : "No scenes"}
+                      {project?.queue_position
+                          ? `Queued for generation (position ${project.queue_position})`
+                          : sortedScenes.length > 0 ? "Waiting for renders..." : "No scenes"}
                   </div>
               )}
           </div>
@@ -1,4 +1,4 @@
-import { useEffect } from 'react';
+import { useCallback, useEffect, useRef } from 'react';
 import { io, Socket } from 'socket.io-client';
 import { useProjectStore } from '../lib/store';
 
@@ -10,12 +10,14 @@ import { useProjectStore } from '../lib/store';
 const WS_BASE_URL = process.env.NEXT_PUBLIC_WS_URL || "ws://localhost:8000/api/ws";
 
 export function useProjectSocket(projectId: string | null) {
-  const { updateScene, setScenes, setProject } = useProjectStore();
+  const { updateScene, setScenes, addScenes, setProject, upsertMessage, appendToMessage, updateMessage, setChatError } = useProjectStore();
+  const wsRef = useRef<WebSocket | null>(null);
 
   useEffect(() => {
     if (!projectId) return;
 
     const ws = new WebSocket(`${WS_BASE_URL}/${projectId}`);
+    wsRef.current = ws;
 
     ws.onopen = () => {
       console.log("Connected to WebSocket");
@@ -27,13 +29,20 @@ export function useProjectSocket(projectId: string | null) {
         console.log("WS Message:", data);
 
         switch (data.type) {
+          case "scene_planned":
+             // Sent per scene while the plan streams; generation of a scene
+             // may start right after, so add it before its updates arrive
+             addScenes([{ ...data.scene, id: data.scene.scene_id }]);
+             break;
+
           case "scenes_planned":
              // Backend sends "scenes" which are Scene objects
              // We need to map them if keys differ, but they look compatible
              // The backend sends: { "scene_id", "project_id", "index", "title", "description", "status" }
              // Frontend Scene expects: { id, ... }
              // Check backend nodes.py: it sends `scene_specs` with `scene_id`.
-             // I should map `scene_id` to `id`.
+             // I should map `scene_id` to `id`. Each scene carries its current
+             // status and video_url, since some may have finished already.
              const scenes = data.scenes.map((s: any) => ({
                ...s,
                id: s.scene_id, 
@@ -42,15 +51,57 @@ export function useProjectSocket(projectId: string | null) {
              break;
              
           case "scene_update":
-             // { scene_id, status, code?, video_url?, progress_message? }
+             // { scene_id, status, code?, video_url?, progress_message?,
+             //   thumbnail_url?, preview_url?, proxy_url?, hls_url? }
              updateScene(data.scene_id, {
+               // Scene fields change when a chat edit is applied
+               ...(data.title && { title: data.title }),
+               ...(data.description && { description: data.description }),
                status: data.status,
                code: data.code,
                video_url: data.video_url,
-               progress_message: data.progress_message
+               progress_message: data.progress_message,
+               ...(data.regenerate_error !== undefined && { regenerate_error: data.regenerate_error }),
+               // Derivatives arrive in a later update and are null when a new
+               // clip replaces the one they were made from; others omit them
+               ...(data.thumbnail_url !== undefined && { thumbnail_url: data.thumbnail_url }),
+               ...(data.preview_url !== undefined && { preview_url: data.preview_url }),
+               ...(data.proxy_url !== undefined && { proxy_url: data.proxy_url }),
+               ...(data.hls_url !== undefined && { hls_url: data.hls_url }),
              });
              break;
              
+          case "queue_update": {
+             // { queue_position, estimated_start_at? }; position 0 once started
+             const project = useProjectStore.getState().project;
+             if (project) {
+               setProject({
+                 ...project,
+                 queue_position: data.queue_position || undefined,
+                 estimated_start_at: data.estimated_start_at,
+               });
+             }
+             break;
+          }
+
+          case "chat_message":
+             // Sent when a message is stored and again when a reply completes
+             upsertMessage(data.message);
+             setChatError(null);
+             break;
+
+          case "chat_token":
+             appendToMessage(data.message_id, data.delta);
+             break;
+
+          case "edit_status":
+             updateMessage(data.message_id, { edit_status: data.edit_status });
+             break;
+
+          case "chat_error":
+             setChatError(data.detail);
+             break;
+
           case "project_complete":
              // Optional: Refetch project or just notify
              break;
@@ -65,8 +116,19 @@ export function useProjectSocket(projectId: string | null) {
     };
 
     return () => {
+      wsRef.current = null;
       ws.close();
     };
-  }, [projectId, updateScene, setScenes]);
+  }, [projectId, updateScene, setScenes, addScenes]);
+
+  // Chat and edit confirmations go over the same socket
+  const send = useCallback((message: Record<string, unknown>) => {
+    const ws = wsRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN) return false;
+    ws.send(JSON.stringify(message));
+    return true;
+  }, []);
+
+  return send;
 }
 
@@ -6,6 +6,10 @@ export interface Project {
   status: string;
   target_duration: number;
   final_video_url?: string;
+  final_hls_url?: string;
+  // Set while the project waits for capacity (pushed as `queue_update`)
+  queue_position?: number;
+  estimated_start_at?: string;
 }
 
 export interface Scene {
@@ -18,7 +22,31 @@ export interface Scene {
   progress_message?: string;
   code?: string;
   video_url?: string;
-  thumbnail_url?: string;
+  thumbnail_url?: string | null;
+  preview_url?: string | null;
+  proxy_url?: string | null;
+  hls_url?: string | null;
+  // Set when the last regenerate failed; the scene keeps its previous clip
+  regenerate_error?: string | null;
+}
+
+export interface SceneEdit {
+  scene_id: string;
+  scene_index: number;
+  // New values of title, description, visual_plan and/or voiceover
+  fields: Record<string, string>;
+}
+
+export interface ChatMessage {
+  id: string;
+  project_id: string;
+  role: "user" | "assistant" | "system";
+  content: string;
+  created_at: string;
+  edit?: SceneEdit | null;
+  edit_status?: "proposed" | "applied" | "dismissed" | null;
+  // Set while the reply is still being streamed
+  streaming?: boolean;
 }
 
 export async function createProject(prompt: string): Promise<{ project_id: string }> {
@@ -27,6 +55,10 @@ export async function createProject(prompt: string): Promise<{ project_id: strin
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ prompt }),
   });
+  if (res.status === 429) {
+    const retryAfter = res.headers.get("Retry-After");
+    throw new Error(`The server is busy. Please try again in ${retryAfter ?? "a few"} seconds.`);
+  }
   if (!res.ok) throw new Error("Failed to create project");
   return res.json();
 }
@@ -37,6 +69,19 @@ export async function getProject(projectId: string): Promise<{ project: Project;
   return res.json();
 }
 
+export async function replanProject(projectId: string, prompt: string): Promise<{ status: string; job_id: string }> {
+  const res = await fetch(`${API_BASE_URL}/projects/${projectId}/replan`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ prompt }),
+  });
+  if (res.status === 409) throw new Error("The project is still generating");
+  if (!res.ok) throw new Error("Failed to re-plan project");
+  return res.json();
+}
 
-
-
+export async function getChat(projectId: string): Promise<{ messages: ChatMessage[] }> {
+  const res = await fetch(`${API_BASE_URL}/projects/${projectId}/chat`);
+  if (!res.ok) throw new Error("Failed to fetch chat");
+  return res.json();
+}
@@ -1,21 +1,30 @@
 import { create } from 'zustand';
-import { Project, Scene } from './api';
+import { ChatMessage, Project, Scene } from './api';
 
 interface ProjectState {
   project: Project | null;
   scenes: Scene[];
   isLoading: boolean;
+  messages: ChatMessage[];
+  chatError: string | null;
   setProject: (project: Project) => void;
   setScenes: (scenes: Scene[]) => void;
   updateScene: (sceneId: string, update: Partial<Scene>) => void;
   addScenes: (newScenes: Scene[]) => void;
   setLoading: (loading: boolean) => void;
+  setMessages: (messages: ChatMessage[]) => void;
+  upsertMessage: (message: ChatMessage) => void;
+  appendToMessage: (messageId: string, delta: string) => void;
+  updateMessage: (messageId: string, update: Partial<ChatMessage>) => void;
+  setChatError: (error: string | null) => void;
 }
 
 export const useProjectStore = create<ProjectState>((set) => ({
   project: null,
   scenes: [],
   isLoading: false,
+  messages: [],
+  chatError: null,
   setProject: (project) => set({ project }),
   setScenes: (scenes) => set({ scenes }),
   updateScene: (sceneId, update) =>
@@ -26,9 +35,33 @@ export const useProjectStore = create<ProjectState>((set) => ({
     })),
   addScenes: (newScenes) =>
     set((state) => ({
-      scenes: [...state.scenes, ...newScenes],
+      // Skip scenes already in the store (e.g. after a reconnect)
+      scenes: [
+        ...state.scenes,
+        ...newScenes.filter((n) => !state.scenes.some((s) => s.id === n.id)),
+      ],
     })),
   setLoading: (loading) => set({ isLoading: loading }),
+  setMessages: (messages) => set({ messages }),
+  upsertMessage: (message) =>
+    set((state) => ({
+      messages: state.messages.some((m) => m.id === message.id)
+        ? state.messages.map((m) => (m.id === message.id ? message : m))
+        : [...state.messages, message],
+    })),
+  appendToMessage: (messageId, delta) =>
+    set((state) => ({
+      messages: state.messages.map((m) =>
+        m.id === messageId ? { ...m, content: m.content + delta } : m
+      ),
+    })),
+  updateMessage: (messageId, update) =>
+    set((state) => ({
+      messages: state.messages.map((m) =>
+        m.id === messageId ? { ...m, ...update } : m
+      ),
+    })),
+  setChatError: (error) => set({ chatError: error }),
 }));
 
 